@@ -0,0 +1,82 @@
+"""Add shared literature documents
+
+Revision ID: 8a1f5c3e9d27
+Revises: 3d9c2e71a5b4
+Create Date: 2026-10-18 14:05:12.640193
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1f5c3e9d27'
+down_revision: Union[str, None] = '3d9c2e71a5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+literature_documents = sa.table(
+    'literature_documents',
+    sa.column('id', sa.Integer()),
+    sa.column('content_hash', sa.String()),
+    sa.column('content', sa.Text()),
+)
+literature_reviews = sa.table(
+    'literature_reviews',
+    sa.column('id', sa.Integer()),
+    sa.column('document_id', sa.Integer()),
+    sa.column('content', sa.Text()),
+)
+
+
+def upgrade() -> None:
+    op.create_table('literature_documents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_literature_documents_id'), 'literature_documents', ['id'], unique=False)
+    op.create_index(op.f('ix_literature_documents_content_hash'), 'literature_documents', ['content_hash'], unique=True)
+    op.add_column('literature_reviews', sa.Column('document_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('literature_reviews_document_id_fkey', 'literature_reviews', 'literature_documents', ['document_id'], ['id'])
+    op.create_index(op.f('ix_literature_reviews_document_id'), 'literature_reviews', ['document_id'], unique=False)
+
+    # Reviews with identical content share one document.
+    connection = op.get_bind()
+    document_ids = {}
+    for review_id, content in connection.execute(sa.select(literature_reviews.c.id, literature_reviews.c.content)).all():
+        content = content or ''
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if content_hash not in document_ids:
+            document_ids[content_hash] = connection.execute(
+                literature_documents.insert()
+                .values(content_hash=content_hash, content=content)
+                .returning(literature_documents.c.id)
+            ).scalar_one()
+        connection.execute(
+            literature_reviews.update()
+            .where(literature_reviews.c.id == review_id)
+            .values(document_id=document_ids[content_hash])
+        )
+
+    op.drop_column('literature_reviews', 'content')
+
+
+def downgrade() -> None:
+    op.add_column('literature_reviews', sa.Column('content', sa.Text(), nullable=True))
+    op.execute(
+        literature_reviews.update()
+        .where(literature_reviews.c.document_id == literature_documents.c.id)
+        .values(content=literature_documents.c.content)
+    )
+    op.drop_index(op.f('ix_literature_reviews_document_id'), table_name='literature_reviews')
+    op.drop_constraint('literature_reviews_document_id_fkey', 'literature_reviews', type_='foreignkey')
+    op.drop_column('literature_reviews', 'document_id')
+    op.drop_index(op.f('ix_literature_documents_content_hash'), table_name='literature_documents')
+    op.drop_index(op.f('ix_literature_documents_id'), table_name='literature_documents')
+    op.drop_table('literature_documents')
@@ -0,0 +1,52 @@
+"""Add ingest job documents table
+
+Revision ID: 9c3d5e7f1a2b
+Revises: e7b4f2c81d06
+Create Date: 2026-10-18 21:04:12.381560
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3d5e7f1a2b'
+down_revision: Union[str, None] = 'e7b4f2c81d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ingest_job_documents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['literature_documents.id'], ),
+    sa.ForeignKeyConstraint(['job_id'], ['ingest_jobs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_id', 'document_id')
+    )
+    op.create_index(op.f('ix_ingest_job_documents_id'), 'ingest_job_documents', ['id'], unique=False)
+    op.add_column('ingest_jobs', sa.Column('documents_total', sa.Integer(), nullable=False, server_default='0'))
+
+    # Move each job's document list into the link table, keeping its order.
+    bind = op.get_bind()
+    links = sa.table('ingest_job_documents', sa.column('job_id', sa.Integer()), sa.column('document_id', sa.Integer()))
+    for job_id, document_ids in bind.execute(sa.text("SELECT id, document_ids FROM ingest_jobs")).fetchall():
+        if isinstance(document_ids, str):
+            document_ids = json.loads(document_ids)
+        document_ids = list(dict.fromkeys(document_ids or []))
+        if document_ids:
+            op.bulk_insert(links, [{'job_id': job_id, 'document_id': document_id} for document_id in document_ids])
+        bind.execute(sa.text("UPDATE ingest_jobs SET documents_total = :total WHERE id = :id"), {'total': len(document_ids), 'id': job_id})
+    op.drop_column('ingest_jobs', 'document_ids')
+
+
+def downgrade() -> None:
+    op.add_column('ingest_jobs', sa.Column('document_ids', sa.JSON(), nullable=True))
+    op.drop_column('ingest_jobs', 'documents_total')
+    op.drop_index(op.f('ix_ingest_job_documents_id'), table_name='ingest_job_documents')
+    op.drop_table('ingest_job_documents')
@@ -0,0 +1,28 @@
+"""Add previous job to analysis jobs
+
+Revision ID: c5e1d4a9b3f0
+Revises: 8a1f5c3e9d27
+Create Date: 2026-10-18 16:48:03.912775
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1d4a9b3f0'
+down_revision: Union[str, None] = '8a1f5c3e9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('analysis_jobs', sa.Column('previous_job_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('analysis_jobs_previous_job_id_fkey', 'analysis_jobs', 'analysis_jobs', ['previous_job_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('analysis_jobs_previous_job_id_fkey', 'analysis_jobs', type_='foreignkey')
+    op.drop_column('analysis_jobs', 'previous_job_id')
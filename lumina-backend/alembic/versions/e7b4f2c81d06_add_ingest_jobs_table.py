@@ -0,0 +1,44 @@
+"""Add ingest jobs table
+
+Revision ID: e7b4f2c81d06
+Revises: c5e1d4a9b3f0
+Create Date: 2026-10-18 18:20:37.504219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b4f2c81d06'
+down_revision: Union[str, None] = 'c5e1d4a9b3f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ingest_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('rows_received', sa.Integer(), nullable=False),
+    sa.Column('rows_inserted', sa.Integer(), nullable=False),
+    sa.Column('rows_failed', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('document_ids', sa.JSON(), nullable=True),
+    sa.Column('documents_embedded', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingest_jobs_id'), 'ingest_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_ingest_jobs_status'), 'ingest_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ingest_jobs_status'), table_name='ingest_jobs')
+    op.drop_index(op.f('ix_ingest_jobs_id'), table_name='ingest_jobs')
+    op.drop_table('ingest_jobs')
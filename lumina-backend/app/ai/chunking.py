@@ -0,0 +1,226 @@
+import hashlib
+import json
+import re
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+_WORD = re.compile(r"\w+")
+# A prime just above 2**32, so hashed shingles permute without collisions.
+_PRIME = np.uint64(4294967311)
+
+
+class Duplicate(NamedTuple):
+    kind: str  # "exact" or "near"
+    chunk_id: str  # the kept chunk it duplicates
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _pieces(text: str, size: int, length: Callable[[str], int]) -> Iterator[Tuple[str, int]]:
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group().strip()
+        if not sentence:
+            continue
+        sentence_length = length(sentence)
+        if sentence_length <= size:
+            yield sentence, sentence_length
+        else:
+            # A sentence longer than a chunk is split between words.
+            for word in sentence.split():
+                yield word, length(word)
+
+
+def iter_chunks(text: str, size: int, overlap: int = 0, length: Callable[[str], int] = _word_count) -> Iterator[str]:
+    """Yield chunks of at most ``size`` units of ``length``, split on sentence boundaries.
+
+    Sentences are read one at a time, so a long review is never held as a
+    list of chunks. Consecutive chunks share up to ``overlap`` units of
+    trailing sentences. ``length`` counts words unless a tokenizer is given.
+    """
+    window: List[Tuple[str, int]] = []
+    total = 0
+    for piece, piece_length in _pieces(text, size, length):
+        if total + piece_length > size and window:
+            yield " ".join(p for p, _ in window)
+            # Carry trailing pieces into the next chunk as overlap.
+            carried: List[Tuple[str, int]] = []
+            carried_total = 0
+            for previous, previous_length in reversed(window):
+                if carried_total + previous_length > overlap or carried_total + previous_length + piece_length > size:
+                    break
+                carried.insert(0, (previous, previous_length))
+                carried_total += previous_length
+            window, total = carried, carried_total
+        window.append((piece, piece_length))
+        total += piece_length
+    if window:
+        yield " ".join(p for p, _ in window)
+
+
+def normalise_text(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, computed with NumPy.
+
+    Shingles are hashed with CRC32, so signatures are stable across processes
+    and can be persisted alongside the index.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_words: int = 5, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self._a = rng.randint(1, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+
+    def signature(self, normalised: str) -> np.ndarray:
+        words = normalised.split()
+        k = self.shingle_words
+        shingles = {" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # a < 2**31 and hashes < 2**32, so the products fit in 64 bits.
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+
+class ChunkDeduplicator:
+    """Drops exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are caught by a hash of the normalised text; near
+    duplicates by MinHash with LSH banding, confirmed when the estimated
+    Jaccard similarity reaches ``threshold``. Near duplicates are only dropped
+    within one document: a near duplicate from another document says something
+    different, and that document's readers must not see the kept text in its
+    place. When a document is removed, the
+    documents that had chunks dropped in favour of its chunks are returned so
+    they can be ingested again.
+    """
+
+    def __init__(self, hasher: MinHasher, bands: int = 32, threshold: float = 0.85):
+        if hasher.num_perm % bands:
+            raise ValueError("MinHash permutations must divide evenly into bands")
+        self.hasher = hasher
+        self.bands = bands
+        self.rows = hasher.num_perm // bands
+        self.threshold = threshold
+        self._exact: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._chunk_hash: Dict[str, str] = {}
+        self._chunk_doc: Dict[str, str] = {}
+        self._doc_chunks: Dict[str, List[str]] = defaultdict(list)
+        self._buckets: Dict[bytes, Set[str]] = defaultdict(set)
+        self._dependents: Dict[str, Set[str]] = defaultdict(set)
+        self._aliases: Dict[str, Set[str]] = defaultdict(set)
+        self.kept = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _near_duplicate(self, doc_id: str, signature: np.ndarray) -> Optional[str]:
+        candidates: Set[str] = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        for chunk_id in candidates:
+            if self._chunk_doc[chunk_id] != doc_id:
+                continue
+            if np.mean(self._signatures[chunk_id] == signature) >= self.threshold:
+                return chunk_id
+        return None
+
+    def admit(self, doc_id: str, chunk_id: str, text: str) -> Optional[Duplicate]:
+        """Register the chunk and return None, or describe the kept chunk it duplicates."""
+        normalised = normalise_text(text)
+        exact_hash = hashlib.sha1(normalised.encode("utf-8")).hexdigest()
+        original = self._exact.get(exact_hash)
+        if original is not None:
+            self._depend(doc_id, original)
+            self.exact_duplicates += 1
+            return Duplicate("exact", original)
+        signature = self.hasher.signature(normalised)
+        original = self._near_duplicate(doc_id, signature)
+        if original is not None:
+            self._depend(doc_id, original)
+            self.near_duplicates += 1
+            return Duplicate("near", original)
+        self._register(doc_id, chunk_id, exact_hash, signature)
+        self.kept += 1
+        return None
+
+    def _register(self, doc_id: str, chunk_id: str, exact_hash: str, signature: np.ndarray) -> None:
+        self._exact[exact_hash] = chunk_id
+        self._chunk_hash[chunk_id] = exact_hash
+        self._signatures[chunk_id] = signature
+        self._chunk_doc[chunk_id] = doc_id
+        self._doc_chunks[doc_id].append(chunk_id)
+        for key in self._band_keys(signature):
+            self._buckets[key].add(chunk_id)
+
+    def _depend(self, doc_id: str, original_chunk: str) -> None:
+        original_doc = self._chunk_doc[original_chunk]
+        if original_doc != doc_id:
+            self._dependents[original_doc].add(doc_id)
+            self._aliases[doc_id].add(original_chunk)
+
+    def aliases(self, doc_id: str) -> Set[str]:
+        """Kept chunks of other documents that ``doc_id``'s duplicates were dropped in favour of."""
+        return set(self._aliases.get(doc_id, ()))
+
+    def remove_doc(self, doc_id: str) -> Set[str]:
+        """Forget ``doc_id``'s chunks and return the documents that relied on them."""
+        for chunk_id in self._doc_chunks.pop(doc_id, []):
+            signature = self._signatures.pop(chunk_id)
+            for key in self._band_keys(signature):
+                self._buckets[key].discard(chunk_id)
+                if not self._buckets[key]:
+                    del self._buckets[key]
+            self._exact.pop(self._chunk_hash.pop(chunk_id), None)
+            del self._chunk_doc[chunk_id]
+        for dependents in self._dependents.values():
+            dependents.discard(doc_id)
+        self._aliases.pop(doc_id, None)
+        return self._dependents.pop(doc_id, set())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "chunks_kept": self.kept,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+        }
+
+    def save(self, path: str) -> None:
+        chunk_ids = list(self._signatures)
+        signatures = np.array([self._signatures[c] for c in chunk_ids], dtype=np.uint64).reshape(len(chunk_ids), self.hasher.num_perm)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                chunk_ids=np.array(chunk_ids, dtype=np.str_),
+                doc_ids=np.array([self._chunk_doc[c] for c in chunk_ids], dtype=np.str_),
+                hashes=np.array([self._chunk_hash[c] for c in chunk_ids], dtype=np.str_),
+                signatures=signatures,
+                dependents=np.array(json.dumps({doc: sorted(deps) for doc, deps in self._dependents.items() if deps})),
+                aliases=np.array(json.dumps({doc: sorted(chunks) for doc, chunks in self._aliases.items() if chunks})),
+            )
+
+    def load(self, path: str) -> None:
+        with np.load(path) as data:
+            if data["signatures"].shape[1:] != (self.hasher.num_perm,):
+                # Signatures from a different configuration cannot be compared.
+                return
+            for chunk_id, doc_id, exact_hash, signature in zip(
+                data["chunk_ids"].tolist(), data["doc_ids"].tolist(), data["hashes"].tolist(), data["signatures"]
+            ):
+                self._register(doc_id, chunk_id, exact_hash, signature)
+            for doc_id, dependents in json.loads(data["dependents"].item()).items():
+                self._dependents[doc_id].update(dependents)
+            if "aliases" in data.files:
+                for doc_id, chunks in json.loads(data["aliases"].item()).items():
+                    self._aliases[doc_id].update(chunks)
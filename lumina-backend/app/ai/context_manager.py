@@ -1,28 +1,238 @@
 import json
 import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.schema import TextNode
+
+from app.ai.context_store import ContextState, ContextStore, StoredContext
+from app.ai.llm_executor import llm_executor
+from app.ai.vector_store import NumpyVectorStore
+from app.core.config import settings
+
+LEAF_SUMMARY_PROMPT = """Summarise the following analysis segments in at most {max_words} words.
+Keep key findings, decisions, critical assumptions and open questions.
+
+Segments:
+{segments}
+
+Summary:"""
+
+ROOT_SUMMARY_PROMPT = """Merge the existing summary with the newer summaries below into one summary of at most {max_words} words.
+Prefer newer information where they conflict, and keep key findings, decisions, critical assumptions and open questions.
+
+Existing summary:
+{root}
+
+Newer summaries:
+{leaves}
+
+Merged summary:"""
 
 class ContextManager:
-    # ... existing code ...
+    """Running memory of an analysis session.
+
+    Segment outputs are summarised hierarchically: pending segments are folded
+    into a leaf summary ``batch_size`` at a time with a single LLM call, and once
+    more than ``max_leaf_summaries`` leaves exist the oldest are rolled up into a
+    word-bounded root summary. Every prompt therefore stays the same size no
+    matter how many segments the session accumulates.
+
+    Key findings are buffered too and inserted into ``memory_index`` as one
+    batched embedding call once ``findings_flush_size`` are pending; anything
+    that reads the memory flushes first, so queries always see every finding.
+
+    Sessions persist to a ``ContextStore`` directory. Loading only maps the
+    stored vectors; they are copied into ``memory_index``'s matrix, as one
+    array, the first time the memory is read or extended.
+    """
+
+    def __init__(
+        self,
+        service_context,
+        batch_size: Optional[int] = None,
+        max_leaf_summaries: Optional[int] = None,
+        summary_max_words: Optional[int] = None,
+        findings_flush_size: Optional[int] = None,
+        embed_model=None,
+    ):
+        self.service_context = service_context
+        self.embed_model = embed_model
+        self.memory_index = self._new_memory_index()
+        self.batch_size = batch_size or settings.CONTEXT_SUMMARY_BATCH_SIZE
+        self.max_leaf_summaries = max_leaf_summaries or settings.CONTEXT_MAX_LEAF_SUMMARIES
+        self.summary_max_words = summary_max_words or settings.CONTEXT_SUMMARY_MAX_WORDS
+        self.findings_flush_size = findings_flush_size or settings.CONTEXT_FINDINGS_FLUSH_SIZE
+        self.root_summary = ""
+        self.leaf_summaries: List[str] = []
+        # Pending segments are kept as their JSON so they can be saved as-is.
+        self._pending: List[str] = []
+        self._pending_findings: List[str] = []
+        # Memory node ids in insertion order, which is also their row order on disk.
+        self._memory_node_ids: List[str] = []
+        self._unloaded: Optional[StoredContext] = None
+        self._store: Optional[ContextStore] = None
+
+    def _new_memory_index(self) -> VectorStoreIndex:
+        # Resolved now rather than from global Settings, which may not be configured yet.
+        return VectorStoreIndex(
+            [],
+            service_context=self.service_context,
+            embed_model=self.embed_model,
+            storage_context=StorageContext.from_defaults(vector_store=NumpyVectorStore()),
+        )
+
+    def _hydrate(self):
+        """Insert the nodes of a loaded session into ``memory_index``."""
+        if self._unloaded is None:
+            return
+        stored, self._unloaded = self._unloaded, None
+        # The vectors go into the store as one array, never as per-node lists;
+        # the rest mirrors what VectorStoreIndex does for a store without text.
+        self.memory_index.vector_store.add_vectors(stored.node_ids, stored.vectors)
+        nodes = [TextNode(id_=node_id, text=text) for node_id, text in zip(stored.node_ids, stored.texts)]
+        for node in nodes:
+            self.memory_index.index_struct.add_node(node, text_id=node.node_id)
+        self.memory_index.docstore.add_documents(nodes, allow_update=True)
+        self.memory_index.storage_context.index_store.add_index_struct(self.memory_index.index_struct)
+
+    @property
+    def running_summary(self) -> str:
+        return "\n\n".join(summary for summary in [self.root_summary, *self.leaf_summaries] if summary)
+
+    async def aupdate_context(self, segment_output, flush_findings: bool = True):
+        await self.aupdate_context_batch([segment_output], flush_findings=flush_findings)
+
+    async def aupdate_context_batch(self, segment_outputs: List, flush_findings: bool = True):
+        """Buffer segment outputs, summarising once a full batch is pending.
+
+        With ``flush_findings=False`` findings stay buffered whatever
+        ``findings_flush_size`` is, for callers that feed segments one at a
+        time and flush once at the end.
+        """
+        for segment_output in segment_outputs:
+            self._pending.append(segment_output.json())
+            self._pending_findings.extend(segment_output.key_findings)
+        if flush_findings and len(self._pending_findings) >= self.findings_flush_size:
+            await self.aflush_findings()
+        await self._asummarise_pending(drain=False)
+
+    async def aflush(self):
+        """Insert pending findings and summarise pending segments."""
+        await self.aflush_findings()
+        await self._asummarise_pending(drain=True)
+
+    async def aflush_findings(self):
+        if not self._pending_findings:
+            return
+        # insert_nodes embeds the whole batch together instead of one request per finding.
+        self._hydrate()
+        nodes = [TextNode(text=finding) for finding in self._pending_findings]
+        self._pending_findings = []
+        await self.memory_index.ainsert_nodes(nodes)
+        self._memory_node_ids.extend(node.node_id for node in nodes)
+
+    async def _acomplete(self, prompt: str) -> str:
+        return str(await llm_executor.acomplete(self.service_context.llm, prompt))
+
+    async def _asummarise_pending(self, drain: bool):
+        while len(self._pending) >= (1 if drain else self.batch_size):
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            prompt = LEAF_SUMMARY_PROMPT.format(max_words=self.summary_max_words, segments="\n".join(batch))
+            self.leaf_summaries.append(await self._acomplete(prompt))
+        if len(self.leaf_summaries) > self.max_leaf_summaries:
+            await self._aroll_up()
+
+    async def _aroll_up(self):
+        # Keep the newest leaf verbatim so the most recent detail survives a roll-up.
+        rolled, self.leaf_summaries = self.leaf_summaries[:-1], self.leaf_summaries[-1:]
+        prompt = ROOT_SUMMARY_PROMPT.format(
+            max_words=self.summary_max_words,
+            root=self.root_summary or "(none)",
+            leaves="\n\n".join(rolled),
+        )
+        self.root_summary = await self._acomplete(prompt)
+
+    async def aget_relevant_context(self, query: str) -> str:
+        await self.aflush()
+        self._hydrate()
+        relevant_docs = await self.memory_index.as_query_engine().aquery(query)
+        return f"Running summary: {self.running_summary}\n\nRelevant past findings: {relevant_docs}"
+
+    def _state(self) -> ContextState:
+        return ContextState(self.root_summary, list(self.leaf_summaries), list(self._pending), list(self._pending_findings))
+
+    def _memory_rows(self, start: int) -> Tuple[List[str], List[str], Optional[np.ndarray]]:
+        """Ids, texts and embeddings of the memory nodes from ``start`` on."""
+        node_ids = self._memory_node_ids[start:]
+        if not node_ids:
+            return [], [], None
+        if self._unloaded is not None:
+            stored = self._unloaded
+            return stored.node_ids[start:], stored.texts[start:], stored.vectors[start:]
+        docstore = self.memory_index.docstore
+        texts = [docstore.get_node(node_id).get_content() for node_id in node_ids]
+        return node_ids, texts, self.memory_index.vector_store.get_vectors(node_ids)
+
+    def save_context(self, path: str):
+        """Persist the session to the directory ``path``.
+
+        Saving again to the path last saved to or loaded from appends only the
+        memory nodes added since, and the summary state if it changed. A path
+        holding anything other than a saved session raises ValueError.
+        """
+        if self._store is None or self._store.path != path or not self._store.exists():
+            store = ContextStore(path)
+            store.clear()
+        else:
+            store = self._store
+        node_ids, texts, vectors = self._memory_rows(store.node_count)
+        store.append(node_ids, texts, vectors, self._state())
+        self._store = store
 
-    def save_context(self, filename: str):
-        context_data = {
-            "running_summary": self.running_summary,
-            "memory_index": self.memory_index.storage_context.to_dict()
-        }
-        with open(filename, 'w') as f:
-            json.dump(context_data, f)
+    def load_context(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Context file {path} not found")
+        if os.path.isfile(path):
+            self._load_json_context(path)
+            return
 
-    def load_context(self, filename: str):
-        if not os.path.exists(filename):
-            raise FileNotFoundError(f"Context file {filename} not found")
+        store = ContextStore(path)
+        stored = store.load()
+        state = stored.state or ContextState("", [], [], [])
+        self.root_summary = state.root_summary
+        self.leaf_summaries = list(state.leaf_summaries)
+        self._pending = list(state.pending_segments)
+        self._pending_findings = list(state.pending_findings)
+        self.memory_index = self._new_memory_index()
+        self._memory_node_ids = list(stored.node_ids)
+        self._unloaded = stored if stored.node_ids else None
+        self._store = store
 
+    def _load_json_context(self, filename: str):
+        """Read a session saved as one JSON document, the format before ``ContextStore``."""
         with open(filename, 'r') as f:
             context_data = json.load(f)
 
-        self.running_summary = context_data["running_summary"]
-        self.memory_index = VectorStoreIndex.from_dict(context_data["memory_index"])
+        # Files written before hierarchical summaries only carry a flat summary.
+        self.root_summary = context_data.get("root_summary", context_data.get("running_summary", ""))
+        self.leaf_summaries = context_data.get("leaf_summaries", [])
+        self._pending = context_data.get("pending_segments", [])
+        self._pending_findings = context_data.get("pending_findings", [])
+        storage_context = StorageContext.from_dict(context_data["memory_index"])
+        storage_context = StorageContext.from_defaults(
+            docstore=storage_context.docstore,
+            index_store=storage_context.index_store,
+            vector_store=NumpyVectorStore.from_simple(storage_context.vector_store),
+        )
+        self.memory_index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+        self._memory_node_ids = list(self.memory_index.index_struct.nodes_dict.values())
+        self._unloaded = None
+        self._store = None
 
-    def generate_session_summary(self) -> str:
+    async def agenerate_session_summary(self) -> str:
+        await self.aflush()
         prompt = f"""
         Based on the following running summary, generate a concise session summary:
 
@@ -33,4 +243,4 @@ class ContextManager:
         2. Major decisions made
         3. Open questions or areas requiring further investigation
         """
-        return self.service_context.llm.complete(prompt)
\ No newline at end of file
+        return await self._acomplete(prompt)
@@ -0,0 +1,272 @@
+import json
+import os
+import struct
+import zlib
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOG_FILE = "records.log"
+VECTOR_FILE = "vectors.f32"
+LOG_MAGIC = b"LCTXLOG1"
+# Everything a store writes; clear() removes nothing else.
+STORE_FILES = (LOG_FILE, VECTOR_FILE, LOG_FILE + ".tmp")
+# Magic and embedding dimension, padded so the float rows start 16-byte aligned.
+VECTOR_HEADER = struct.Struct("<8sI4x")
+VECTOR_MAGIC = b"LCTXVEC1"
+# Record type, payload length and CRC32 of the payload.
+RECORD_HEADER = struct.Struct("<BII")
+NODE_RECORD = 1
+STATE_RECORD = 2
+LENGTH = struct.Struct("<I")
+
+
+class ContextState(NamedTuple):
+    root_summary: str
+    leaf_summaries: List[str]
+    pending_segments: List[str]
+    pending_findings: List[str]
+
+
+class StoredContext(NamedTuple):
+    state: Optional[ContextState]
+    node_ids: List[str]
+    texts: List[str]
+    # Read-only memory map, one float32 row per node; None when there are no nodes.
+    vectors: Optional[np.ndarray]
+
+
+def _pack_strings(values: Sequence[str]) -> bytes:
+    parts = [LENGTH.pack(len(values))]
+    for value in values:
+        encoded = value.encode("utf-8")
+        parts.append(LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def _unpack_strings(buffer: bytes, offset: int) -> Tuple[List[str], int]:
+    (count,) = LENGTH.unpack_from(buffer, offset)
+    offset += LENGTH.size
+    values = []
+    for _ in range(count):
+        (length,) = LENGTH.unpack_from(buffer, offset)
+        offset += LENGTH.size
+        values.append(buffer[offset:offset + length].decode("utf-8"))
+        offset += length
+    return values, offset
+
+
+def _pack_state(state: ContextState) -> bytes:
+    return b"".join(_pack_strings(values) for values in ([state.root_summary], state.leaf_summaries, state.pending_segments, state.pending_findings))
+
+
+def _unpack_state(payload: bytes) -> ContextState:
+    sections = []
+    offset = 0
+    for _ in range(4):
+        values, offset = _unpack_strings(payload, offset)
+        sections.append(values)
+    return ContextState(sections[0][0], sections[1], sections[2], sections[3])
+
+
+def _record(record_type: int, payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(record_type, len(payload), zlib.crc32(payload)) + payload
+
+
+def _is_json_context(path: str) -> bool:
+    # A session saved as one JSON document, the format before ContextStore.
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, UnicodeDecodeError, ValueError):
+        return False
+    return isinstance(data, dict) and "memory_index" in data
+
+
+class ContextStore:
+    """Append-only on-disk format for a ``ContextManager`` session.
+
+    A directory holding ``vectors.f32``, the embeddings as raw float32 rows
+    behind a small header, which is memory-mapped on load, and ``records.log``,
+    a sequence of length-prefixed, checksummed binary records: one per memory
+    node (id and text, in row order) and one per saved summary state, the last
+    of which wins. Saves append only new nodes and a changed state. Vectors are
+    synced before the records that refer to them, so a torn write at the tail is
+    detected on load and cut off. The log is rewritten once
+    ``compact_after`` superseded states have piled up.
+    """
+
+    def __init__(self, path: str, compact_after: int = 64):
+        self.path = path
+        self.compact_after = compact_after
+        self.node_count = 0
+        self.dim = 0
+        self.state: Optional[ContextState] = None
+        self.stale_states = 0
+        self._log_end = 0
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.path, LOG_FILE)
+
+    @property
+    def vector_path(self) -> str:
+        return os.path.join(self.path, VECTOR_FILE)
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.log_path)
+
+    def clear(self) -> None:
+        """Start an empty store at ``path``, removing only a previous store's files.
+
+        A directory holding anything else, or a file other than a session saved
+        in the older JSON format, raises ValueError and is left untouched.
+        """
+        if os.path.isdir(self.path):
+            foreign = sorted(set(os.listdir(self.path)) - set(STORE_FILES))
+            if foreign:
+                raise ValueError(f"{self.path} is not a context store (it holds {', '.join(foreign[:3])}); refusing to clear it")
+            for name in STORE_FILES:
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+        elif os.path.exists(self.path):
+            if not _is_json_context(self.path):
+                raise ValueError(f"{self.path} is not a context store; refusing to replace it")
+            os.remove(self.path)
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.log_path, "wb") as f:
+            f.write(LOG_MAGIC)
+        self.node_count = 0
+        self.dim = 0
+        self.state = None
+        self.stale_states = 0
+        self._log_end = len(LOG_MAGIC)
+
+    def load(self) -> StoredContext:
+        with open(self.log_path, "rb") as f:
+            buffer = f.read()
+        if not buffer.startswith(LOG_MAGIC):
+            raise ValueError(f"{self.log_path} is not a context log")
+
+        node_ids: List[str] = []
+        texts: List[str] = []
+        state = None
+        states = 0
+        offset = len(LOG_MAGIC)
+        while offset + RECORD_HEADER.size <= len(buffer):
+            record_type, length, crc = RECORD_HEADER.unpack_from(buffer, offset)
+            start = offset + RECORD_HEADER.size
+            payload = buffer[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            if record_type == NODE_RECORD:
+                (node_id, text), _ = _unpack_strings(payload, 0)
+                node_ids.append(node_id)
+                texts.append(text)
+            elif record_type == STATE_RECORD:
+                state = _unpack_state(payload)
+                states += 1
+            offset = start + length
+
+        vectors = self._map_vectors(len(node_ids))
+        rows = 0 if vectors is None else len(vectors)
+        orphaned = rows < len(node_ids)
+        # Records whose vectors never reached the disk cannot be used.
+        node_ids, texts = node_ids[:rows], texts[:rows]
+        self.node_count = len(node_ids)
+        self.state = state
+        self.stale_states = max(states - 1, 0)
+        self._log_end = offset
+        if orphaned:
+            self.compact()
+        elif offset < len(buffer):
+            self._truncate(self.log_path, offset)
+        return StoredContext(state, node_ids, texts, vectors)
+
+    def _map_vectors(self, rows: int) -> Optional[np.ndarray]:
+        if not rows or not os.path.isfile(self.vector_path):
+            return None
+        size = os.path.getsize(self.vector_path)
+        if size < VECTOR_HEADER.size:
+            return None
+        with open(self.vector_path, "rb") as f:
+            magic, dim = VECTOR_HEADER.unpack(f.read(VECTOR_HEADER.size))
+        if magic != VECTOR_MAGIC:
+            raise ValueError(f"{self.vector_path} is not a context vector file")
+        self.dim = dim
+        rows = min(rows, (size - VECTOR_HEADER.size) // (4 * dim))
+        if not rows:
+            return None
+        return np.memmap(self.vector_path, dtype="<f4", mode="r", offset=VECTOR_HEADER.size, shape=(rows, dim))
+
+    @staticmethod
+    def _truncate(path: str, size: int) -> None:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+    def append(self, node_ids: Sequence[str], texts: Sequence[str], vectors: Optional[np.ndarray], state: Optional[ContextState]) -> None:
+        """Append nodes with their embedding rows, and ``state`` if it changed."""
+        records = []
+        if len(node_ids):
+            self._append_vectors(np.ascontiguousarray(vectors, dtype="<f4"))
+            records.extend(_record(NODE_RECORD, _pack_strings([node_id, text])) for node_id, text in zip(node_ids, texts))
+        if state is not None and state != self.state:
+            records.append(_record(STATE_RECORD, _pack_state(state)))
+            self.stale_states += int(self.state is not None)
+        if not records:
+            return
+        with open(self.log_path, "r+b") as f:
+            f.seek(self._log_end)
+            f.write(b"".join(records))
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_end = f.tell()
+        self.node_count += len(node_ids)
+        if state is not None:
+            self.state = state
+        if self.stale_states >= self.compact_after:
+            self.compact()
+
+    def _append_vectors(self, vectors: np.ndarray) -> None:
+        if vectors.ndim != 2:
+            raise ValueError("vectors must be a 2-D array")
+        if self.node_count == 0:
+            self.dim = vectors.shape[1]
+            with open(self.vector_path, "wb") as f:
+                f.write(VECTOR_HEADER.pack(VECTOR_MAGIC, self.dim))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match stored dimension {self.dim}")
+        with open(self.vector_path, "r+b") as f:
+            # Rows past node_count belong to a save that never wrote its records.
+            f.seek(VECTOR_HEADER.size + self.node_count * self.dim * 4)
+            f.write(vectors.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self) -> None:
+        """Rewrite the log with the stored node records and only the latest state."""
+        with open(self.log_path, "rb") as f:
+            buffer = f.read(self._log_end)
+        kept = [LOG_MAGIC]
+        nodes = 0
+        offset = len(LOG_MAGIC)
+        while offset < len(buffer):
+            record_type, length, _ = RECORD_HEADER.unpack_from(buffer, offset)
+            end = offset + RECORD_HEADER.size + length
+            if record_type == NODE_RECORD and nodes < self.node_count:
+                kept.append(buffer[offset:end])
+                nodes += 1
+            offset = end
+        if self.state is not None:
+            kept.append(_record(STATE_RECORD, _pack_state(self.state)))
+        temp_path = self.log_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(kept))
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_end = f.tell()
+        os.replace(temp_path, self.log_path)
+        self.stale_states = 0
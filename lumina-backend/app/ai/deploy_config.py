@@ -2,6 +2,7 @@ from llama_deploy import (
     deploy_workflow,
     WorkflowServiceConfig,
     ControlPlaneConfig,
+    LlamaDeployClient,
 )
 from app.ai.multi_step_engine import ConsultingWorkflow
 from app.models.consulting import Problem
@@ -17,6 +18,14 @@ async def deploy_consulting_workflow(problem: Problem):
         control_plane_config=ControlPlaneConfig(),
     )
 
+async def run_consulting_workflow(problem: Problem, query: str):
+    client = LlamaDeployClient(ControlPlaneConfig())
+    session = client.create_session()
+    workflow = ConsultingWorkflow(problem)
+    await workflow.setup_engines()  # Ensure engines are set up
+    result = await session.arun(workflow, query=query)
+    return result
+
 # This function can be called to deploy the workflow
 async def setup_workflow_deployment():
     # You might want to load a default problem or handle this differently
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import PrivateAttr
+
+from app.core.config import settings
+from app.core.tracing import tracer
+
+
+class EmbeddingCache:
+    """SQLite-backed, content-addressed store of embedding vectors.
+
+    Entries are keyed by a hash of the embedding model name and the exact text,
+    so edited text is a new key and unchanged text is never re-embedded. The
+    least recently used entries are evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # A logical clock rather than wall time keeps LRU ordering strict.
+        (self._clock,) = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM embeddings").fetchone()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Embedding]:
+        if not keys:
+            return {}
+        found: Dict[str, Embedding] = {}
+        with self._lock:
+            # SQLite caps the number of bound parameters, so look keys up in slices.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = self._tick()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, Embedding]) -> None:
+        if not items:
+            return
+        with self._lock:
+            now = self._tick()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that only sends cache misses to the backend."""
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _key(self, kind: str, text: str) -> str:
+        return EmbeddingCache.make_key(f"{self.model_name}:{kind}", text)
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        cached = self._cache.get_many(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        tracer.record_cache("embedding", hits=len(keys) - len(missing), misses=len(missing))
+        return keys, cached, missing
+
+    def _lookup_query(self, query: str):
+        key = self._key("query", query)
+        cached = self._cache.get_many([key])
+        tracer.record_cache("embedding", hits=int(key in cached), misses=int(key not in cached))
+        return key, cached
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, cached, missing = self._lookup("text", texts)
+        if missing:
+            with tracer.span("embed_batch", "embedding", texts=len(missing)):
+                vectors = self._embed_model.get_text_embedding_batch(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._cache.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, cached, missing = self._lookup("text", texts)
+        if missing:
+            with tracer.span("embed_batch", "embedding", texts=len(missing)):
+                vectors = await self._embed_model.aget_text_embedding_batch(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._cache.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        key, cached = self._lookup_query(query)
+        if key not in cached:
+            with tracer.span("embed_query", "embedding", texts=1):
+                cached[key] = self._embed_model.get_query_embedding(query)
+            self._cache.put_many({key: cached[key]})
+        return cached[key]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        key, cached = self._lookup_query(query)
+        if key not in cached:
+            with tracer.span("embed_query", "embedding", texts=1):
+                cached[key] = await self._embed_model.aget_query_embedding(query)
+            self._cache.put_many({key: cached[key]})
+        return cached[key]
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache shared by all workflows."""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                settings.EMBEDDING_CACHE_PATH,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            )
+    return _embedding_cache
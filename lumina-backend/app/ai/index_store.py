@@ -0,0 +1,379 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+
+from app.ai.chunking import ChunkDeduplicator, MinHasher, iter_chunks
+from app.ai.embedding_cache import CachedEmbedding, get_embedding_cache
+from app.ai.model_factory import AIModelFactory
+from app.ai.retrieval import BM25Index, HybridRetriever
+from app.ai.tracing_callbacks import count_tokens
+from app.ai.vector_store import NumpyVectorStore
+from app.core.config import settings
+from app.models.consulting import LiteratureDocument, Problem
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+DEDUP_FILE = "dedup.npz"
+# Persist directory name of the index shared by every problem.
+CORPUS = "corpus"
+# Node metadata listing the documents a chunk belongs to.
+ACCESS_KEY = "document_ids"
+
+
+PROBLEM_PREFIX = "problem-"
+
+
+def problem_doc_id(problem_id: int) -> str:
+    return f"{PROBLEM_PREFIX}{problem_id}"
+
+
+def document_doc_id(document_id: int) -> str:
+    return f"document-{document_id}"
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ProblemIndex:
+    """The slice of the shared index one problem may search: its description and its documents."""
+
+    def __init__(self, index: VectorStoreIndex, bm25: BM25Index, doc_ids: Sequence[str], version: str = ""):
+        self.index = index
+        self.bm25 = bm25
+        self.doc_ids = sorted(doc_ids)
+        # Hash of every indexed document's content hash; changes whenever the
+        # problem's description or literature does.
+        self.version = version
+        # Chunks list every document that contains them, so a chunk kept for
+        # another problem's copy of a passage is still found.
+        self.filters = MetadataFilters(filters=[MetadataFilter(key=ACCESS_KEY, value=self.doc_ids, operator=FilterOperator.ANY)])
+
+    def as_retriever(self, similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K) -> BaseRetriever:
+        if not settings.HYBRID_RETRIEVAL_ENABLED:
+            return self.index.as_retriever(similarity_top_k=similarity_top_k, filters=self.filters)
+        return HybridRetriever(
+            self.bm25,
+            self.index.docstore,
+            self.index.as_retriever(similarity_top_k=max(settings.HYBRID_CANDIDATES, similarity_top_k), filters=self.filters),
+            allowed=set(self.doc_ids),
+            similarity_top_k=similarity_top_k,
+            candidates=settings.HYBRID_CANDIDATES,
+            rrf_k=settings.RRF_K,
+            lexical_max_terms=settings.LEXICAL_FAST_PATH_MAX_TERMS,
+        )
+
+    def as_query_engine(self, similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K, **kwargs) -> RetrieverQueryEngine:
+        return RetrieverQueryEngine.from_args(self.as_retriever(similarity_top_k), **kwargs)
+
+
+class ProblemIndexStore:
+    """Persistent, incrementally maintained vector index shared by all problems.
+
+    Problem descriptions and content-addressed literature documents live in one
+    corpus, so a paper attached to several problems is embedded once, and each
+    problem searches it through a :class:`ProblemIndex` access filter. The
+    persist directory holds the llama_index storage context and a manifest of
+    ``doc_id -> content hash``. Literature-review CRUD keeps the corpus current
+    through :meth:`add_document` and :meth:`delete_document`; :meth:`load`
+    reconciles any remaining drift against the database, embedding only
+    documents whose hash changed.
+
+    Documents are chunked as they stream in, and chunks that duplicate or
+    nearly duplicate one already in the index are dropped before embedding;
+    the kept chunk records the duplicate's document so access filters still
+    match it. A document that lost chunks to another one is re-ingested when
+    that other document is removed or changed.
+
+    Writing an index rewrites its whole storage context, so changes are
+    persisted in batches: the first change starts a ``persist_delay`` timer,
+    and everything changed before it fires is written once. Changes not yet
+    written when the process dies are recovered by :meth:`load`, which
+    re-syncs against the database. :meth:`flush` writes pending changes now.
+    Persists are not locked across processes, so only one process may write
+    a persist directory.
+    """
+
+    def __init__(self, root_dir: str, embed_model: Optional[BaseEmbedding] = None, persist_delay: Optional[float] = None):
+        self.root_dir = root_dir
+        self._embed_model = embed_model
+        self.persist_delay = settings.INDEX_PERSIST_DELAY_SECONDS if persist_delay is None else persist_delay
+        self._dirty: Set[str] = set()
+        self._persist_timer: Optional[threading.Timer] = None
+        self._indexes: Dict[str, VectorStoreIndex] = {}
+        self._manifests: Dict[str, Dict[str, str]] = {}
+        self._dedups: Dict[str, ChunkDeduplicator] = {}
+        self._bm25s: Dict[str, BM25Index] = {}
+        self._hasher = MinHasher(num_perm=settings.MINHASH_PERMUTATIONS)
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        if self._embed_model is None:
+            self._embed_model = CachedEmbedding(
+                AIModelFactory.get_embedding_model(settings.EMBEDDING_MODEL), cache=get_embedding_cache()
+            )
+        return self._embed_model
+
+    def _lock(self, name: str) -> threading.RLock:
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.RLock())
+
+    def _persist_dir(self, name: str) -> str:
+        return os.path.join(self.root_dir, name)
+
+    def _open(self, name: str) -> VectorStoreIndex:
+        if name in self._indexes:
+            return self._indexes[name]
+
+        persist_dir = self._persist_dir(name)
+        manifest_path = os.path.join(persist_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            storage_context = StorageContext.from_defaults(
+                persist_dir=persist_dir, vector_store=NumpyVectorStore.from_persist_dir(persist_dir)
+            )
+            index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        else:
+            storage_context = StorageContext.from_defaults(vector_store=NumpyVectorStore())
+            index = VectorStoreIndex([], embed_model=self.embed_model, storage_context=storage_context)
+            manifest = {}
+
+        dedup = ChunkDeduplicator(self._hasher, bands=settings.MINHASH_BANDS, threshold=settings.DEDUP_SIMILARITY_THRESHOLD)
+        dedup_path = os.path.join(persist_dir, DEDUP_FILE)
+        if os.path.exists(dedup_path):
+            dedup.load(dedup_path)
+
+        # The lexical index is cheap to rebuild from the stored chunks, so it is
+        # kept in memory only.
+        bm25 = BM25Index()
+        for node in index.docstore.docs.values():
+            bm25.add(node.node_id, node.get_content(), node.metadata.get(ACCESS_KEY, ()))
+
+        self._indexes[name] = index
+        self._manifests[name] = manifest
+        self._dedups[name] = dedup
+        self._bm25s[name] = bm25
+        return index
+
+    def _persist(self, name: str) -> None:
+        persist_dir = self._persist_dir(name)
+        self._indexes[name].storage_context.persist(persist_dir=persist_dir)
+        with open(os.path.join(persist_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(self._manifests[name], f)
+        self._dedups[name].save(os.path.join(persist_dir, DEDUP_FILE))
+
+    def _schedule_persist(self, name: str) -> None:
+        if self.persist_delay <= 0:
+            self._persist(name)
+            return
+        with self._locks_guard:
+            self._dirty.add(name)
+            if self._persist_timer is None:
+                self._persist_timer = threading.Timer(self.persist_delay, self.flush)
+                self._persist_timer.daemon = True
+                self._persist_timer.start()
+
+    def flush(self) -> None:
+        """Persist every index changed since it was last written."""
+        with self._locks_guard:
+            names, self._dirty = self._dirty, set()
+            timer, self._persist_timer = self._persist_timer, None
+        if timer is not None:
+            timer.cancel()
+        for name in names:
+            with self._lock(name):
+                self._persist(name)
+
+    def _alias(self, name: str, chunk_id: str, doc_id: str, pending: Dict[str, TextNode]) -> None:
+        # The kept chunk now stands in for ``doc_id`` too; record that where
+        # access filters will see it.
+        node = pending.get(chunk_id)
+        if node is None:
+            index = self._indexes[name]
+            node = index.docstore.get_node(chunk_id)
+            if doc_id in node.metadata[ACCESS_KEY]:
+                return
+            node.metadata[ACCESS_KEY].append(doc_id)
+            index.docstore.add_documents([node], allow_update=True)
+            index.vector_store.update_metadata(chunk_id, node.metadata)
+            self._bm25s[name].set_access(chunk_id, node.metadata[ACCESS_KEY])
+        elif doc_id not in node.metadata[ACCESS_KEY]:
+            node.metadata[ACCESS_KEY].append(doc_id)
+
+    def _unalias(self, name: str, doc_id: str) -> None:
+        index = self._indexes[name]
+        for chunk_id in self._dedups[name].aliases(doc_id):
+            node = index.docstore.get_node(chunk_id, raise_error=False)
+            if node is None or doc_id not in node.metadata.get(ACCESS_KEY, []):
+                continue
+            node.metadata[ACCESS_KEY].remove(doc_id)
+            index.docstore.add_documents([node], allow_update=True)
+            index.vector_store.update_metadata(chunk_id, node.metadata)
+            self._bm25s[name].set_access(chunk_id, node.metadata[ACCESS_KEY])
+
+    def _chunk_nodes(self, name: str, documents: Dict[str, str], pending: Dict[str, TextNode]) -> Iterator[TextNode]:
+        dedup = self._dedups[name]
+        for doc_id, text in documents.items():
+            chunks = iter_chunks(text, settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS, length=count_tokens)
+            # A problem's description is private to it: its chunks are never
+            # dropped in favour of another document's, nor kept in place of one.
+            private = doc_id.startswith(PROBLEM_PREFIX)
+            for position, chunk in enumerate(chunks):
+                node_id = f"{doc_id}-chunk-{position}"
+                duplicate = None if private else dedup.admit(doc_id, node_id, chunk)
+                if duplicate is not None:
+                    self._alias(name, duplicate.chunk_id, doc_id, pending)
+                    continue
+                node = TextNode(
+                    id_=node_id,
+                    text=chunk,
+                    metadata={ACCESS_KEY: [doc_id]},
+                    excluded_embed_metadata_keys=[ACCESS_KEY],
+                    excluded_llm_metadata_keys=[ACCESS_KEY],
+                    relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+                )
+                pending[node_id] = node
+                yield node
+
+    def _insert(self, name: str, batch: Dict[str, TextNode]) -> None:
+        self._indexes[name].insert_nodes(list(batch.values()))
+        bm25 = self._bm25s[name]
+        for node in batch.values():
+            bm25.add(node.node_id, node.get_content(), node.metadata[ACCESS_KEY])
+        batch.clear()
+
+    def _apply(self, name: str, upserts: Dict[str, str], deletes: List[str]) -> bool:
+        index = self._open(name)
+        manifest = self._manifests[name]
+
+        stale = [doc_id for doc_id in deletes if doc_id in manifest]
+        changed = {
+            doc_id: text for doc_id, text in upserts.items()
+            if manifest.get(doc_id) != _content_hash(text)
+        }
+        if not stale and not changed:
+            return False
+
+        # Removing a document orphans the documents whose chunks were dropped
+        # as duplicates of its chunks, so they are removed too and re-ingested.
+        dedup = self._dedups[name]
+        removed = stale + [doc_id for doc_id in changed if doc_id in manifest]
+        pending = list(removed)
+        while pending:
+            doc_id = pending.pop()
+            self._unalias(name, doc_id)
+            for dependent in dedup.remove_doc(doc_id):
+                if dependent in manifest and dependent not in removed:
+                    removed.append(dependent)
+                    pending.append(dependent)
+        bm25 = self._bm25s[name]
+        for doc_id in removed:
+            ref_doc_info = index.docstore.get_ref_doc_info(doc_id)
+            for node_id in ref_doc_info.node_ids if ref_doc_info else ():
+                bm25.remove(node_id)
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+            manifest.pop(doc_id, None)
+
+        changed = {
+            doc_id: text for doc_id, text in upserts.items()
+            if manifest.get(doc_id) != _content_hash(text)
+        }
+        orphaned = [doc_id for doc_id in removed if doc_id not in upserts and doc_id not in stale]
+        if orphaned:
+            logger.info(f"Index {name}: {len(orphaned)} documents will be re-ingested on the next sync")
+
+        before = dedup.stats()
+        batch: Dict[str, TextNode] = {}
+        for node in self._chunk_nodes(name, changed, batch):
+            # Embed in batches so chunks of several documents share requests
+            # without materialising every chunk at once.
+            if len(batch) >= settings.INGEST_BATCH_SIZE:
+                self._insert(name, batch)
+        if batch:
+            self._insert(name, batch)
+        for doc_id, text in changed.items():
+            manifest[doc_id] = _content_hash(text)
+
+        after = dedup.stats()
+        dropped = {key: after[key] - before[key] for key in after}
+        if dropped["exact_duplicates"] or dropped["near_duplicates"]:
+            logger.info(
+                f"Index {name}: kept {dropped['chunks_kept']} chunks, dropped "
+                f"{dropped['exact_duplicates']} exact and {dropped['near_duplicates']} near duplicates"
+            )
+
+        self._schedule_persist(name)
+        return True
+
+    def load(self, problem: Problem) -> ProblemIndex:
+        """Return the problem's view of the index, first syncing its documents with the database rows.
+
+        Literature is indexed by document content alone, without the review
+        title. A document is shared by every review with the same content,
+        and each review may give it a different title. Folding titles in
+        would split the shared document into one copy per title, and would
+        show one problem's titles to another.
+        """
+        expected = {problem_doc_id(problem.id): problem.description}
+        for review in problem.literature_reviews:
+            if review.document_id is not None:
+                expected[document_doc_id(review.document_id)] = review.content
+
+        with self._lock(CORPUS):
+            self._open(CORPUS)
+            if self._apply(CORPUS, expected, []):
+                logger.info(f"Synchronised vector index for problem {problem.id}")
+            version = _content_hash("\n".join(f"{doc_id}:{_content_hash(text)}" for doc_id, text in sorted(expected.items())))
+            return ProblemIndex(self._indexes[CORPUS], self._bm25s[CORPUS], list(expected), version)
+
+    def stats(self) -> Dict[str, int]:
+        totals = {"chunks_kept": 0, "exact_duplicates": 0, "near_duplicates": 0}
+        for dedup in list(self._dedups.values()):
+            for key, value in dedup.stats().items():
+                totals[key] += value
+        return totals
+
+    def add_document(self, document: LiteratureDocument) -> None:
+        self.add_documents([document])
+
+    def add_documents(self, documents: Sequence[LiteratureDocument]) -> None:
+        """Index ``documents`` with one embedding pass."""
+        with self._lock(CORPUS):
+            self._apply(CORPUS, {document_doc_id(document.id): document.content for document in documents}, [])
+
+    def delete_document(self, document_id: int) -> None:
+        with self._lock(CORPUS):
+            self._apply(CORPUS, {}, [document_doc_id(document_id)])
+
+    def delete_problem(self, problem_id: int) -> None:
+        """Drop a deleted problem's description; its literature goes with its last review."""
+        with self._lock(CORPUS):
+            self._apply(CORPUS, {}, [problem_doc_id(problem_id)])
+
+
+_problem_index_store: Optional[ProblemIndexStore] = None
+_problem_index_store_lock = threading.Lock()
+
+
+def get_problem_index_store() -> ProblemIndexStore:
+    """Return the process-wide shared index store."""
+    global _problem_index_store
+    with _problem_index_store_lock:
+        if _problem_index_store is None:
+            _problem_index_store = ProblemIndexStore(settings.INDEX_STORAGE_DIR)
+    return _problem_index_store
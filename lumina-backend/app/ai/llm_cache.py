@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class LLMResponseCache:
+    """Exact-match cache of LLM completions.
+
+    Keys are a hash of model, temperature and prompt. Lookups go to an
+    in-memory LRU first and fall back to a SQLite store shared across
+    restarts; entries older than ``ttl_seconds`` are treated as misses.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86_400, memory_entries: int = 256):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{temperature}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, response: str) -> None:
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry[1]
+
+            row = self._conn.execute(
+                "SELECT created_at, response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[0]):
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                return row[1]
+
+            if entry is not None or row is not None:
+                self._memory.pop(key, None)
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, response)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, created_at) VALUES (?, ?, ?)",
+                (key, response, created_at),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cutoff = time.time() - self.ttl_seconds
+            self._memory = OrderedDict(
+                (key, entry) for key, entry in self._memory.items() if entry[0] >= cutoff
+            )
+            deleted = self._conn.execute("DELETE FROM completions WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.hits - self.memory_hits,
+            "misses": self.misses,
+        }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache(
+                settings.LLM_CACHE_PATH,
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+            )
+    return _llm_cache
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import Any, Optional, Sequence
+
+from llama_index.core.base.llms.generic_utils import completion_response_to_chat_response
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms.custom import CustomLLM
+from pydantic import Field
+
+from app.ai.tracing_callbacks import model_name_of, token_usage
+from app.core.config import settings
+from app.core.deadline import bounded
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text; good enough for
+    # pacing requests against a provider's tokens-per-minute quota.
+    return len(text) // 4 + 1
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute`` tokens per minute.
+
+    Callers reserve tokens up front and sleep off any deficit, so waiting
+    requests are served in arrival order. The bucket is guarded by a thread
+    lock and is safe to share between event loops.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self, amount: float = 1) -> None:
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class LLMExecutor:
+    """Single path for workflow LLM calls.
+
+    Calls are async-native; clients without a real async implementation run in
+    a worker thread so they never block the event loop. Every call is bounded by
+    a concurrency limit and by request and token buckets sized to the provider
+    quota, and 429 responses are retried with exponential backoff. Waiting
+    and retrying stop at the current analysis' deadline.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 5,
+        retry_base_delay: float = 1.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        # asyncio primitives belong to one event loop, so keep a semaphore per loop.
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    @staticmethod
+    def _has_native_async(llm: Any) -> bool:
+        if not hasattr(llm, "acomplete"):
+            return False
+        # CustomLLM's default acomplete just calls complete() on the loop thread.
+        return not (isinstance(llm, CustomLLM) and type(llm).acomplete is CustomLLM.acomplete)
+
+    async def _call(self, llm: Any, prompt: str, **kwargs: Any) -> Any:
+        if self._has_native_async(llm):
+            return await llm.acomplete(prompt, **kwargs)
+        return await asyncio.to_thread(llm.complete, prompt, **kwargs)
+
+    async def acomplete(self, llm: Any, prompt: str, **kwargs: Any) -> Any:
+        if isinstance(llm, ExecutorLLM):
+            # Already routed here (e.g. Settings.llm); don't queue the call twice.
+            llm = llm.llm
+        return await bounded(self._acomplete(llm, prompt, **kwargs))
+
+    async def _acomplete(self, llm: Any, prompt: str, **kwargs: Any) -> Any:
+        model = model_name_of(llm)
+        with tracer.span("complete", "llm", model=model) as span:
+            async with self._semaphore():
+                for attempt in range(self.max_retries + 1):
+                    if self.request_bucket is not None:
+                        await self.request_bucket.acquire(1)
+                    if self.token_bucket is not None:
+                        await self.token_bucket.acquire(estimate_tokens(prompt))
+                    try:
+                        response = await self._call(llm, prompt, **kwargs)
+                    except Exception as e:
+                        if not is_rate_limit_error(e) or attempt == self.max_retries:
+                            raise
+                        delay = _retry_after(e) or self.retry_base_delay * (2 ** attempt) * (1 + random.random())
+                        logger.warning(f"LLM rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                        span.set(retries=attempt + 1)
+                        await asyncio.sleep(delay)
+                        continue
+                    tracer.record_tokens(model, *token_usage(response, prompt))
+                    return response
+
+    def wrap(self, llm: Any) -> "ExecutorLLM":
+        """``llm`` as an LLM whose async calls go through this executor."""
+        return ExecutorLLM(llm=llm, executor=self)
+
+
+class ExecutorLLM(CustomLLM):
+    """An LLM for llama_index components that sends their async calls through an executor.
+
+    Question generation, the per-tool query engines and synthesis call their
+    LLM inside llama_index. Wrapping it puts those calls under the executor's
+    concurrency limit, rate limits, retries and deadline, like the calls the
+    workflow makes itself. Prompts are formatted here and sent as completions;
+    the wrapped LLM's own acomplete handles chat models. Sync calls go
+    straight to the wrapped LLM.
+    """
+
+    llm: Any = Field(description="The wrapped LLM.")
+    executor: Any = Field(description="The LLMExecutor async calls go through.")
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self.llm.metadata.model_copy(update={"is_chat_model": False, "is_function_calling_model": False})
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self.llm.complete(prompt, formatted=formatted, **kwargs)
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        return self.llm.stream_complete(prompt, formatted=formatted, **kwargs)
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        # Not wrapped in llm_completion_callback: the wrapped LLM's callback
+        # fires inside the executor's span instead.
+        return await self.executor.acomplete(self.llm, prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return completion_response_to_chat_response(
+            await self.acomplete(self.messages_to_prompt(messages), formatted=True, **kwargs)
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "executor_llm"
+
+
+llm_executor = LLMExecutor(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_base_delay=settings.LLM_RETRY_BASE_DELAY,
+)
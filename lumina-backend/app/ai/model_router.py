@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.ai.model_factory import AIModelFactory
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ModelHealth:
+    """Latency and error samples for one model over a sliding time window."""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float, bool]] = deque()
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+            self._prune()
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            self._prune()
+            latencies = sorted(latency for _, latency, _ in self._samples)
+            errors = sum(1 for _, _, ok in self._samples if not ok)
+        if not latencies:
+            return {"samples": 0, "p95_seconds": 0.0, "error_rate": 0.0}
+        return {
+            "samples": len(latencies),
+            "p95_seconds": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+            "error_rate": errors / len(latencies),
+        }
+
+
+class ModelRouter:
+    """Picks the model for each workflow stage.
+
+    Every stage maps to a tier and every tier to a model name. When a tier's
+    model has enough recent samples and its p95 latency or error rate is over
+    threshold, the stage falls back along ``fallback_tiers`` to a faster tier.
+    Samples age out of the window, so a degraded model is tried again once it
+    has been quiet for a while.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, str],
+        stage_tiers: Dict[str, str],
+        fallback_tiers: Dict[str, str],
+        window_seconds: float = 300.0,
+        min_samples: int = 10,
+        max_p95_seconds: float = 30.0,
+        max_error_rate: float = 0.25,
+    ):
+        self.tiers = tiers
+        self.stage_tiers = stage_tiers
+        self.fallback_tiers = fallback_tiers
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_p95_seconds = max_p95_seconds
+        self.max_error_rate = max_error_rate
+        self._health: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def health(self, model_name: str) -> ModelHealth:
+        with self._lock:
+            if model_name not in self._health:
+                self._health[model_name] = ModelHealth(self.window_seconds)
+            return self._health[model_name]
+
+    def is_healthy(self, model_name: str) -> bool:
+        snapshot = self.health(model_name).snapshot()
+        if snapshot["samples"] < self.min_samples:
+            return True
+        return snapshot["p95_seconds"] <= self.max_p95_seconds and snapshot["error_rate"] <= self.max_error_rate
+
+    def select(self, stage: str) -> str:
+        """Return the model name to use for ``stage``."""
+        if stage not in self.stage_tiers:
+            raise ValueError(f"Unknown workflow stage: {stage}")
+        tier = self.stage_tiers[stage]
+        seen = {tier}
+        model_name = self.tiers[tier]
+        while not self.is_healthy(model_name):
+            fallback = self.fallback_tiers.get(tier)
+            if fallback is None or fallback in seen:
+                break
+            logger.warning(f"Model {model_name} is degraded, routing {stage} to the {fallback} tier")
+            tier = fallback
+            seen.add(tier)
+            model_name = self.tiers[tier]
+        return model_name
+
+    def get_llm(self, stage: str) -> Tuple[str, Any]:
+        model_name = self.select(stage)
+        return model_name, AIModelFactory.get_model(model_name)
+
+    @asynccontextmanager
+    async def track(self, model_name: Optional[str]) -> AsyncIterator[None]:
+        """Record the latency and outcome of the calls made inside the block."""
+        if model_name is None:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.health(model_name).record(time.monotonic() - start, ok=False)
+            raise
+        self.health(model_name).record(time.monotonic() - start, ok=True)
+
+
+model_router = ModelRouter(
+    tiers=settings.MODEL_TIERS,
+    stage_tiers=settings.STAGE_MODEL_TIERS,
+    fallback_tiers=settings.MODEL_FALLBACK_TIERS,
+    window_seconds=settings.MODEL_HEALTH_WINDOW_SECONDS,
+    min_samples=settings.MODEL_HEALTH_MIN_SAMPLES,
+    max_p95_seconds=settings.MODEL_FALLBACK_P95_SECONDS,
+    max_error_rate=settings.MODEL_FALLBACK_ERROR_RATE,
+)
@@ -7,23 +7,69 @@ from llama_index.core import (
 from llama_index.core.tools import QueryEngineTool
 from llama_index.core.base.base_query_engine import BaseQueryEngine
 from llama_index.core.question_gen.types import BaseQuestionGenerator, SubQuestion
+from llama_index.core.base.response.schema import RESPONSE_TYPE
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.callbacks import CallbackManager
+from llama_index.core.prompts.mixin import PromptMixinType
+from llama_index.core.schema import NodeWithScore, TextNode
 from llama_index.core.question_gen import LLMQuestionGenerator
 from llama_index.core.response_synthesizers import get_response_synthesizer
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core.response_synthesizers import (
     BaseSynthesizer,
     get_response_synthesizer,)
 from llama_index.core.workflow import Workflow, StartEvent, StopEvent, step, Event
-from typing import List, Dict, Any, Optional, Sequence
-import json
+from typing import List, Dict, Any, AsyncIterator, Optional, Sequence, Tuple, Type, TypeVar
+import asyncio
+import contextvars
+import hashlib
+import logging
 from pydantic import BaseModel, Field
 from app.models.consulting import Segment, Problem
-import os
-from llama_deploy import LlamaDeployClient, ControlPlaneConfig
+from app.ai.context_manager import ContextManager
+from app.ai.embedding_cache import CachedEmbedding, get_embedding_cache
+from app.ai.index_store import get_problem_index_store
+from app.ai.llm_cache import LLMResponseCache, get_llm_cache
+from app.ai.llm_executor import llm_executor
+from app.ai.model_factory import AIModelFactory
+from app.ai.model_router import model_router
+from app.ai.prompt_packing import prompt_packer
+from app.ai.retrieval import HybridRetriever
+from app.ai.sub_question_memo import SubQuestionMemo, get_sub_question_memo
+from app.ai.structured_output import (
+    fields_prompt,
+    fields_schema,
+    merge_fields,
+    parse_structured,
+    response_format_kwargs,
+    structured_output_stats,
+)
+from app.ai.tracing_callbacks import tracing_callback_handler
+from app.ai.workflow_pool import workflow_pool
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, bounded, current_deadline, interruption_stats, time_left
+from app.core.tracing import tracer
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+OutputT = TypeVar("OutputT", bound=BaseModel)
+
+# Whether the sub-question memo may answer sub-questions for the current run;
+# set per analysis so requests with use_cache=False re-run every sub-question.
+_use_memo: contextvars.ContextVar[bool] = contextvars.ContextVar("use_sub_question_memo", default=True)
+
+META_ANALYSIS_PROMPT = """Evaluate the following multi-step analysis for coherence, consistency, and overall quality.
+Provide scores between 0 and 1 for each aspect, suggest improvements, and identify the critical path activities.
+
+Steps:
+{steps}
+
+Final Response:
+{final_response}
+
+Output your evaluation as a JSON object matching the MetaAnalysis schema."""
+
 class SegmentOutput(BaseModel):
     key_findings: List[str] = Field(..., description="Main insights or discoveries from this segment")
     relevant_data: Dict[str, Any] = Field(..., description="Structured data relevant to the segment's analysis")
@@ -33,10 +79,18 @@ class SegmentOutput(BaseModel):
     required_data: List[str] = Field(..., description="Data required to validate or refine the analysis")
     external_review_required: bool = Field(..., description="Whether external review is required for this segment")
 
+class SourceNode(BaseModel):
+    node_id: str
+    content_hash: str
+
 class AnalysisStep(BaseModel):
     query: str
     response: str
     structured_output: SegmentOutput
+    tool_name: Optional[str] = None
+    # Nodes the sub question's retrieval returned; a re-analysis re-runs the
+    # step only when retrieving again returns something different.
+    sources: List[SourceNode] = Field(default_factory=list)
 
 class MetaAnalysis(BaseModel):
     coherence_score: float = Field(..., ge=0, le=1, description="Score for overall coherence of the analysis")
@@ -45,22 +99,42 @@ class MetaAnalysis(BaseModel):
     improvement_suggestions: List[str] = Field(..., description="Suggestions for improving the analysis")
     critical_path: List[str] = Field(..., description="Identified critical path activities")
 
-class ContextManager:
-    def __init__(self, service_context):
-        self.service_context = service_context
-        self.memory_index = VectorStoreIndex([], service_context=service_context)
-        self.running_summary = ""
+SOURCES_KEY = "sources"
+TOOL_NAME_KEY = "tool_name"
+# Step fields re-analysis needs from a stored result; opaque to models and
+# clients, so they stay out of prompts and streamed events.
+BOOKKEEPING_STEP_FIELDS = {SOURCES_KEY, TOOL_NAME_KEY}
 
-    def update_context(self, segment_output: SegmentOutput):
-        summary_prompt = f"Current summary: {self.running_summary}\n\nNew information: {segment_output.json()}\n\nProvide an updated summary incorporating the new information:"
-        self.running_summary = self.service_context.llm.complete(summary_prompt)
+def _split_sub_question_text(text: str) -> Tuple[str, str]:
+    query, _, answer = text.partition("\nResponse: ")
+    return query.replace("Sub question: ", ""), answer
 
-        for finding in segment_output.key_findings:
-            self.memory_index.insert(Document(text=finding))
+def _source_nodes(nodes: Sequence[NodeWithScore]) -> List[SourceNode]:
+    sources = {
+        node.node.node_id: hashlib.sha256(node.node.get_content().encode("utf-8")).hexdigest()
+        for node in nodes
+    }
+    return [SourceNode(node_id=node_id, content_hash=sources[node_id]) for node_id in sorted(sources)]
 
-    def get_relevant_context(self, query: str) -> str:
-        relevant_docs = self.memory_index.as_query_engine().query(query)
-        return f"Running summary: {self.running_summary}\n\nRelevant past findings: {relevant_docs}"
+def _sub_question_node(sub_q: SubQuestion, answer: str, sources: Sequence[SourceNode]) -> NodeWithScore:
+    node = TextNode(
+        text=f"Sub question: {sub_q.sub_question}\nResponse: {answer}",
+        metadata={TOOL_NAME_KEY: sub_q.tool_name, SOURCES_KEY: [source.dict() for source in sources]},
+        excluded_embed_metadata_keys=[TOOL_NAME_KEY, SOURCES_KEY],
+        excluded_llm_metadata_keys=[TOOL_NAME_KEY, SOURCES_KEY],
+    )
+    return NodeWithScore(node=node)
+
+def _analysis_step(node: NodeWithScore, structured_output: SegmentOutput) -> AnalysisStep:
+    query, answer = _split_sub_question_text(node.node.text)
+    metadata = node.node.metadata
+    return AnalysisStep(
+        query=query,
+        response=answer,
+        structured_output=structured_output,
+        tool_name=metadata.get(TOOL_NAME_KEY),
+        sources=[SourceNode(**source) for source in metadata.get(SOURCES_KEY, [])],
+    )
 
 class SubQuestionQueryEngine(BaseQueryEngine):
     """Sub question query engine.
@@ -81,6 +155,18 @@ class SubQuestionQueryEngine(BaseQueryEngine):
             Defaults to True
         use_async (bool): whether to execute the sub questions with asyncio.
             Defaults to True
+        question_gen_model (Optional[str]): model behind ``question_gen``; its
+            latency and errors are reported to the model router.
+        synthesis_model (Optional[str]): model behind ``response_synthesizer``;
+            reported to the model router the same way.
+        memo (Optional[SubQuestionMemo]): answers reused across queries while
+            the problem at ``version`` is unchanged.
+        problem_id (Optional[int]): problem the memo entries belong to.
+        version (str): version hash of the problem's indexed content.
+        embed_model (Optional[BaseEmbedding]): embeds sub-questions so that
+            near-identical ones can be answered from the memo.
+        synthesis_budget (Optional[int]): prompt token budget of the synthesis
+            model; sub-question answers are packed to fit it in one call.
     """
 
     def __init__(
@@ -91,8 +177,17 @@ class SubQuestionQueryEngine(BaseQueryEngine):
         callback_manager: Optional[CallbackManager] = None,
         verbose: bool = True,
         use_async: bool = False,
+        question_gen_model: Optional[str] = None,
+        synthesis_model: Optional[str] = None,
+        memo: Optional[SubQuestionMemo] = None,
+        problem_id: Optional[int] = None,
+        version: str = "",
+        embed_model: Optional[BaseEmbedding] = None,
+        synthesis_budget: Optional[int] = None,
     ) -> None:
         self._question_gen = question_gen
+        self._question_gen_model = question_gen_model
+        self._synthesis_model = synthesis_model
         self._response_synthesizer = response_synthesizer
         self._metadatas = [x.metadata for x in query_engine_tools]
         self._query_engines = {
@@ -100,84 +195,528 @@ class SubQuestionQueryEngine(BaseQueryEngine):
         }
         self._verbose = verbose
         self._use_async = use_async
+        self._memo = memo if problem_id is not None else None
+        self._problem_id = problem_id
+        self._version = version
+        self._embed_model = embed_model
+        self._synthesis_budget = synthesis_budget
         super().__init__(callback_manager)
 
-    # ... (implement other methods as needed)
+    def _get_prompt_modules(self) -> PromptMixinType:
+        return {
+            "question_gen": self._question_gen,
+            "response_synthesizer": self._response_synthesizer,
+        }
+
+    async def agenerate_sub_questions(self, query_bundle: QueryBundle) -> List[SubQuestion]:
+        with tracer.span("sub_questions", "step", model=self._question_gen_model) as span:
+            async with model_router.track(self._question_gen_model):
+                sub_questions = await bounded(self._question_gen.agenerate(self._metadatas, query_bundle))
+            span.set(sub_questions=len(sub_questions))
+        if self._verbose:
+            logger.info(f"Generated {len(sub_questions)} sub questions.")
+        return sub_questions
+
+    async def _embed_sub_question(self, sub_q: SubQuestion) -> Optional[List[float]]:
+        if self._embed_model is None:
+            return None
+        try:
+            return await self._embed_model.aget_query_embedding(sub_q.sub_question)
+        except Exception:
+            logger.warning(f"[{sub_q.tool_name}] Failed to embed {sub_q.sub_question}", exc_info=True)
+            return None
+
+    def _retrieves_densely(self, sub_q: SubQuestion) -> bool:
+        retriever = getattr(self._query_engines.get(sub_q.tool_name), "retriever", None)
+        return not (isinstance(retriever, HybridRetriever) and retriever.answers_lexically(sub_q.sub_question))
+
+    async def _recall(self, sub_q: SubQuestion) -> Tuple[Optional[str], Optional[List[float]]]:
+        """A memoised answer to ``sub_q``, and its embedding when one was needed.
+
+        The sub question is only embedded for the similarity lookup when
+        answering it would embed it anyway; the embedding is then reused by
+        retrieval. Keyword questions answered lexically are never embedded.
+        """
+        answer = self._memo.get(self._problem_id, self._version, sub_q.tool_name, sub_q.sub_question)
+        if answer is not None:
+            return answer, None
+        embedding = await self._embed_sub_question(sub_q) if self._retrieves_densely(sub_q) else None
+        if embedding is None:
+            self._memo.record_miss()
+            return None, None
+        return self._memo.get_similar(self._problem_id, self._version, sub_q.tool_name, embedding), embedding
+
+    async def aretrieve_sources(self, sub_q: SubQuestion) -> List[SourceNode]:
+        """The nodes ``sub_q``'s tool would retrieve now, without answering it."""
+        query_engine = self._query_engines[sub_q.tool_name]
+        if not hasattr(query_engine, "aretrieve"):
+            return []
+        with tracer.span("retrieve_sources", "step", tool=sub_q.tool_name):
+            return _source_nodes(await bounded(query_engine.aretrieve(QueryBundle(sub_q.sub_question))))
+
+    async def aanswer_sub_question(self, sub_q: SubQuestion, use_cache: Optional[bool] = None) -> Optional[NodeWithScore]:
+        """Answer one sub question, returning None if its query engine fails.
+
+        Raises DeadlineExceeded if the analysis' deadline passes first.
+
+        With a memo, answers already given for the same problem version are
+        reused unless ``use_cache`` (default: the current analysis' setting)
+        is False. The returned node's metadata records the tool and the
+        source nodes its retrieval returned.
+        """
+        use_memo = self._memo is not None and (_use_memo.get() if use_cache is None else use_cache)
+        answer, embedding = await self._recall(sub_q) if use_memo else (None, None)
+        if use_memo:
+            tracer.record_cache("sub_question", hits=int(answer is not None), misses=int(answer is None))
+        try:
+            if answer is None:
+                query_engine = self._query_engines[sub_q.tool_name]
+                with tracer.span("answer_sub_question", "step", tool=sub_q.tool_name):
+                    response = await bounded(query_engine.aquery(QueryBundle(sub_q.sub_question, embedding=embedding)))
+                answer = str(response)
+                sources = _source_nodes(getattr(response, "source_nodes", None) or [])
+                if use_memo:
+                    self._memo.put(self._problem_id, self._version, sub_q.tool_name, sub_q.sub_question, answer, embedding)
+            else:
+                # A memoised answer skips the LLM, not the (cheap) retrieval
+                # that records what the step depends on.
+                sources = await self.aretrieve_sources(sub_q)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            logger.warning(f"[{sub_q.tool_name}] Failed to run {sub_q.sub_question}", exc_info=True)
+            return None
+        if self._verbose:
+            logger.info(f"[{sub_q.tool_name}] Q: {sub_q.sub_question}\nA: {answer}")
+        return _sub_question_node(sub_q, answer, sources)
+
+    def _pack_synthesis_nodes(self, query_bundle: QueryBundle, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        # Without packing, answers over the context window are split across
+        # several refine calls.
+        template = self._response_synthesizer.get_prompts().get("text_qa_template")
+        if self._synthesis_budget is None or template is None or not nodes:
+            return nodes
+        overhead = prompt_packer.count_tokens(template.format(context_str="", query_str=query_bundle.query_str))
+        # Leave room for the separators between passages.
+        budget = max(self._synthesis_budget - overhead - 2 * len(nodes), len(nodes))
+        texts = prompt_packer.pack_texts([node.node.get_content() for node in nodes], budget)
+        packed = []
+        for node, text in zip(nodes, texts):
+            if text != node.node.get_content():
+                node = NodeWithScore(node=node.node.model_copy(), score=node.score)
+                node.node.set_content(text)
+            packed.append(node)
+        return packed
+
+    async def asynthesize(self, query_bundle: QueryBundle, nodes: List[NodeWithScore]) -> RESPONSE_TYPE:
+        with tracer.span("synthesis", "step", model=self._synthesis_model, nodes=len(nodes)):
+            async with model_router.track(self._synthesis_model):
+                packed = self._pack_synthesis_nodes(query_bundle, nodes)
+                response = await bounded(self._response_synthesizer.asynthesize(query=query_bundle, nodes=packed))
+        # Callers read the full answers from the response's source nodes.
+        response.source_nodes = nodes
+        return response
+
+    async def _aquery(self, query_bundle: QueryBundle) -> RESPONSE_TYPE:
+        sub_questions = await self.agenerate_sub_questions(query_bundle)
+        nodes = await asyncio.gather(*(self.aanswer_sub_question(sub_q) for sub_q in sub_questions))
+        # Only the sub question nodes are synthesised, so the response's
+        # source_nodes are exactly the answered sub questions.
+        return await self.asynthesize(query_bundle, [node for node in nodes if node is not None])
+
+    def _query(self, query_bundle: QueryBundle) -> RESPONSE_TYPE:
+        return asyncio_run(self._aquery(query_bundle))
 
 class ConsultingWorkflow(Workflow):
-    def __init__(self, problem: Problem):
+    def __init__(self, problem: Problem, sub_question_concurrency: Optional[int] = None):
         super().__init__()
         self.problem = problem
-        self.llm = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4", temperature=0.7)
-        self.embed_model = OpenAIEmbedding()
-        self.context_manager = ContextManager(Settings)
+        self.sub_question_concurrency = sub_question_concurrency or settings.SUB_QUESTION_CONCURRENCY
+        self.embed_model = CachedEmbedding(
+            AIModelFactory.get_embedding_model(settings.EMBEDDING_MODEL), cache=get_embedding_cache()
+        )
+        self.reset_context()
+
+    def reset_context(self):
+        """Start the next analysis with no findings or summaries from earlier ones."""
+        self.context_manager = ContextManager(Settings, embed_model=self.embed_model)
 
     async def setup_engines(self):
-        Settings.llm = self.llm
         Settings.embed_model = self.embed_model
-        Settings.callback_manager = CallbackManager([])
+        Settings.callback_manager = CallbackManager([tracing_callback_handler])
 
-        self.index = self._create_index()
+        with tracer.span("setup_engines", "step", problem_id=self.problem.id):
+            # Loading may read from disk and embed changed documents; keep that
+            # off the event loop shared with streams and job workers.
+            self.index = await asyncio.to_thread(self._create_index)
+            self.route_models()
+
+    def route_models(self):
+        """Build the query engines on the models currently routed for each stage.
+
+        Sub-question generation and synthesis run inside llama_index, so their
+        models are picked here and wrapped to call through ``llm_executor``;
+        structured output and meta-analysis are routed per call. Only the index
+        is expensive, so this is cheap to repeat.
+        """
+        question_gen_model, question_gen_llm = model_router.get_llm("sub_questions")
+        synthesis_model, synthesis_llm = model_router.get_llm("synthesis")
+        question_gen_llm = llm_executor.wrap(question_gen_llm)
+        synthesis_llm = llm_executor.wrap(synthesis_llm)
+        Settings.llm = synthesis_llm
 
         self.query_engine_tools = [
             QueryEngineTool.from_defaults(
-                query_engine=self.index.as_query_engine(),
+                query_engine=self.index.as_query_engine(llm=synthesis_llm),
                 name="problem_context",
                 description="Provides context about the consulting problem"
             ),
         ]
 
-        self.question_generator = LLMQuestionGenerator.from_defaults()
-        self.response_synthesizer = get_response_synthesizer(response_mode="compact")
+        self.question_generator = LLMQuestionGenerator.from_defaults(llm=question_gen_llm)
+        self.response_synthesizer = get_response_synthesizer(llm=synthesis_llm, response_mode="compact")
 
         self.sub_question_engine = SubQuestionQueryEngine(
             question_gen=self.question_generator,
             response_synthesizer=self.response_synthesizer,
             query_engine_tools=self.query_engine_tools,
             verbose=True,
-            use_async=True
+            use_async=True,
+            question_gen_model=question_gen_model,
+            synthesis_model=synthesis_model,
+            memo=get_sub_question_memo() if settings.SUB_QUESTION_MEMO_ENABLED else None,
+            problem_id=self.problem.id,
+            version=getattr(self.index, "version", ""),
+            embed_model=self.embed_model,
+            synthesis_budget=prompt_packer.budget_for(synthesis_llm),
         )
 
     def _create_index(self):
-        documents = [Document(text=self.problem.description)]
-        for review in self.problem.literature_reviews:
-            documents.append(Document(text=f"Literature Review: {review.title}\n\n{review.content}"))
-        return VectorStoreIndex.from_documents(documents)
+        # The per-problem index is maintained by literature-review CRUD; loading
+        # it only embeds whatever changed since it was last persisted.
+        return get_problem_index_store().load(self.problem)
 
     @step()
+    async def analyze(self, ev: StartEvent) -> StopEvent:
+        """The workflow's single step, for runs started through ``Workflow.run`` (e.g. llama_deploy)."""
+        return StopEvent(result=await self.arun_analysis(ev.get("query"), use_cache=ev.get("use_cache", True)))
+
+    # The step-by-step stages below predate the pipelined ``astream_analysis``;
+    # they are kept for callers that drive one stage at a time.
     async def generate_sub_questions(self, ev: Event) -> Dict[str, Any]:
         query_str = ev.payload.get("query")
         query_bundle = QueryBundle(query_str)
-        response = await self.sub_question_engine.aquery(query_bundle)
+        token = _use_memo.set(ev.payload.get("use_cache", True))
+        try:
+            response = await self.sub_question_engine.aquery(query_bundle)
+        finally:
+            _use_memo.reset(token)
         return {"response": response, "query": query_str}
 
-    @step()
     async def process_sub_questions(self, ev: Event) -> Dict[str, Any]:
         response = ev.payload["response"]
+        use_cache = ev.payload.get("use_cache", True)
+        semaphore = asyncio.Semaphore(self.sub_question_concurrency)
+
+        async def generate(text: str) -> SegmentOutput:
+            async with semaphore:
+                return await self.generate_structured_output_async(text, use_cache=use_cache)
+
+        nodes = response.source_nodes
+        # return_exceptions keeps one failed sub-question from discarding the rest;
+        # gather preserves the original sub-question order.
+        results = await asyncio.gather(*(generate(node.node.text) for node in nodes), return_exceptions=True)
+
         structured_steps = []
-        for sq in response.source_nodes:
-            structured_output = await self.generate_structured_output_async(sq.node.text)
-            step = AnalysisStep(
-                query=sq.node.text.split("\n")[0].replace("Sub question: ", ""),
-                response=sq.node.text.split("\n")[1].replace("Response: ", ""),
-                structured_output=structured_output
-            )
-            structured_steps.append(step)
-            self.context_manager.update_context(structured_output)
-        return {"structured_steps": structured_steps, "final_response": str(response)}
+        failed_sub_questions = []
+        for node, structured_output in zip(nodes, results):
+            if isinstance(structured_output, Exception):
+                query, _ = _split_sub_question_text(node.node.text)
+                logger.error(f"Structured output failed for sub question '{query}': {str(structured_output)}")
+                failed_sub_questions.append({"query": query, "error": str(structured_output)})
+                continue
+            structured_steps.append(_analysis_step(node, structured_output))
+        await self.context_manager.aupdate_context_batch([step.structured_output for step in structured_steps])
+        return {
+            "structured_steps": structured_steps,
+            "final_response": str(response),
+            "failed_sub_questions": failed_sub_questions,
+        }
 
-    @step()
-    def perform_meta_analysis(self, ev: Event) -> Dict[str, Any]:
+    async def perform_meta_analysis(self, ev: Event) -> Dict[str, Any]:
         structured_steps = ev.payload["structured_steps"]
         final_response = ev.payload["final_response"]
-        meta_analysis = self.perform_meta_analysis_internal(structured_steps, final_response)
+        meta_analysis = await self.perform_meta_analysis_internal(
+            structured_steps, final_response, use_cache=ev.payload.get("use_cache", True)
+        )
         return {
             "steps": [step.dict() for step in structured_steps],
             "final_response": final_response,
             "meta_analysis": meta_analysis.dict()
         }
 
-    async def generate_structured_output_async(self, response: str) -> SegmentOutput:
+    async def arun_analysis(self, query: str, use_cache: bool = True, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Run the pipelined analysis in-process and return the combined result.
+
+        If ``deadline`` passes first, the result holds the steps finished by
+        then and ``truncated`` is True.
+        """
+        steps: Dict[int, Dict[str, Any]] = {}
+        final_response = ""
+        meta_analysis = None
+        truncated = False
+        with tracer.span("analysis", "workflow", problem_id=self.problem.id) as span:
+            async for event in self.astream_analysis(query, use_cache=use_cache, deadline=deadline):
+                data = event["data"]
+                if event["event"] == "step":
+                    steps[data["index"]] = {key: value for key, value in data.items() if key != "index"}
+                elif event["event"] == "final_response":
+                    final_response = data["final_response"]
+                elif event["event"] == "meta_analysis":
+                    meta_analysis = data
+                elif event["event"] == "truncated":
+                    truncated = True
+            span.set(truncated=truncated)
+        return {
+            "steps": [steps[index] for index in sorted(steps)],
+            "final_response": final_response,
+            "meta_analysis": meta_analysis,
+            "truncated": truncated,
+        }
+
+    async def astream_analysis(self, query: str, use_cache: bool = True, deadline: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run the analysis as a pipeline, yielding each result as soon as it is available.
+
+        Each sub question goes through answering and structured extraction on
+        its own, so a step is parsed while other sub questions are still being
+        answered. Synthesis starts once every sub question is answered and
+        overlaps the remaining extractions; only the meta-analysis waits for
+        both.
+
+        Yields ``{"event": ..., "data": ...}`` dicts: one ``sub_question`` per
+        generated sub question first, then one ``step`` (or ``step_failed``)
+        per sub question as its structured output is parsed, interleaved with
+        ``final_response`` once synthesis finishes, and ``meta_analysis`` last.
+
+        Every step observes ``deadline`` (an absolute ``time.monotonic()``
+        time; default: the caller's current deadline). When it passes, work
+        still in flight is cancelled and a final ``truncated`` event replaces
+        whatever had not been yielded yet.
+        """
+        deadline = current_deadline() if deadline is None else deadline
+        query_bundle = QueryBundle(query)
+        try:
+            sub_questions = await bounded(self.sub_question_engine.agenerate_sub_questions(query_bundle), deadline)
+        except DeadlineExceeded:
+            yield self._truncated_event(0, None)
+            return
+        for index, sub_q in enumerate(sub_questions):
+            yield {"event": "sub_question", "data": {"index": index, "sub_question": sub_q.sub_question, "tool_name": sub_q.tool_name}}
+
+        answers = [
+            asyncio.ensure_future(bounded(self.sub_question_engine.aanswer_sub_question(sub_q, use_cache=use_cache), deadline))
+            for sub_q in sub_questions
+        ]
+        semaphore = asyncio.Semaphore(self.sub_question_concurrency)
+
+        async def extract(index: int) -> Tuple[int, Optional[NodeWithScore], Any]:
+            node = await answers[index]
+            if node is None:
+                return index, None, None
+            async with semaphore:
+                try:
+                    return index, node, await bounded(self.generate_structured_output_async(node.node.text, use_cache=use_cache), deadline)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    return index, node, e
+
+        async def synthesise() -> str:
+            # gather preserves the sub-question order of the synthesised nodes.
+            nodes = [node for node in await asyncio.gather(*answers) if node is not None]
+            return str(await bounded(self.sub_question_engine.asynthesize(query_bundle, nodes), deadline))
+
+        synthesis = asyncio.ensure_future(synthesise())
+        pending = {asyncio.ensure_future(extract(index)) for index in range(len(sub_questions))}
+        pending.add(synthesis)
+        structured_steps: Dict[int, AnalysisStep] = {}
+        final_response = ""
+        truncated = False
+        try:
+            while pending and not truncated:
+                done, pending = await asyncio.wait(pending, timeout=time_left(deadline), return_when=asyncio.FIRST_COMPLETED)
+                # Nothing finished before the deadline, or something ran into it.
+                truncated = not done or any(isinstance(task.exception(), DeadlineExceeded) for task in done)
+                for task in done:
+                    if task.exception() is not None and truncated:
+                        continue
+                    if task is synthesis:
+                        final_response = task.result()
+                        yield {"event": "final_response", "data": {"final_response": final_response}}
+                        continue
+                    index, node, structured_output = task.result()
+                    if node is None:
+                        continue
+                    if isinstance(structured_output, Exception):
+                        query_text, _ = _split_sub_question_text(node.node.text)
+                        logger.error(f"Structured output failed for sub question '{query_text}': {str(structured_output)}")
+                        yield {"event": "step_failed", "data": {"index": index, "query": query_text, "error": str(structured_output)}}
+                        continue
+                    step = _analysis_step(node, structured_output)
+                    structured_steps[index] = step
+                    try:
+                        # Findings are embedded in one request once every step is in.
+                        await bounded(self.context_manager.aupdate_context(structured_output, flush_findings=False), deadline)
+                    except DeadlineExceeded:
+                        truncated = True
+                    yield {"event": "step", "data": {"index": index, **step.dict(exclude=BOOKKEEPING_STEP_FIELDS)}}
+        finally:
+            # A consumer that stops early (or a client that disconnected) must
+            # not leave answers running.
+            for task in [*answers, *pending]:
+                task.cancel()
+        if truncated:
+            yield self._truncated_event(len(structured_steps), len(sub_questions))
+            return
+
+        ordered_steps = [structured_steps[index] for index in sorted(structured_steps)]
+        try:
+            meta_analysis, _ = await bounded(asyncio.gather(
+                self.perform_meta_analysis_internal(ordered_steps, final_response, use_cache=use_cache),
+                self.context_manager.aflush_findings(),
+            ), deadline)
+        except DeadlineExceeded:
+            yield self._truncated_event(len(structured_steps), len(sub_questions))
+            return
+        yield {"event": "meta_analysis", "data": meta_analysis.dict()}
+
+    def _truncated_event(self, completed_steps: int, sub_questions: Optional[int]) -> Dict[str, Any]:
+        logger.warning(
+            f"Analysis of problem {self.problem.id} hit its deadline after {completed_steps} of {sub_questions or 0} steps"
+        )
+        interruption_stats.record(truncated=True)
+        return {"event": "truncated", "data": {"completed_steps": completed_steps, "sub_questions": sub_questions}}
+
+    async def _refresh_step(self, step: AnalysisStep, use_cache: bool) -> Tuple[AnalysisStep, bool]:
+        """``step`` itself if its retrieval is unchanged, else a re-run of it.
+
+        Returns the step and whether it was re-run. A step whose re-run fails
+        is kept as it was, so the merged analysis never loses a step. Steps
+        recorded without a tool (older results) have nothing to compare, so
+        they are re-run on the default tool.
+        """
+        tool_name = step.tool_name or self.query_engine_tools[0].metadata.name
+        sub_q = SubQuestion(sub_question=step.query, tool_name=tool_name)
+        try:
+            if step.sources and await self.sub_question_engine.aretrieve_sources(sub_q) == step.sources:
+                return step, False
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to re-check retrieval for sub question '{step.query}': {str(e)}")
+        node = await self.sub_question_engine.aanswer_sub_question(sub_q, use_cache=use_cache)
+        if node is None:
+            return step, False
+        try:
+            structured_output = await self.generate_structured_output_async(node.node.text, use_cache=use_cache)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Structured output failed for sub question '{step.query}': {str(e)}")
+            return step, False
+        return _analysis_step(node, structured_output), True
+
+    async def arun_reanalysis(self, query: str, previous: Dict[str, Any], use_cache: bool = True, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Bring a previous analysis result up to date with the problem's corpus.
+
+        Every previous step's sub question is retrieved again; only steps whose
+        source nodes changed are answered and extracted again, the rest are
+        reused as they are. The final response is re-synthesised only if some
+        step changed, and the meta-analysis is recomputed from the merged steps.
+        Sub questions are not regenerated, so the analysis keeps its shape.
+
+        Every step observes ``deadline`` (default: the caller's current
+        deadline). Whatever was not brought up to date when it passes is
+        carried over from ``previous``, and ``truncated`` is True.
+        """
+        deadline = current_deadline() if deadline is None else deadline
+        truncated = False
+        with tracer.span("reanalysis", "workflow", problem_id=self.problem.id) as span:
+            previous_steps = [AnalysisStep.parse_obj(step) for step in previous.get("steps", [])]
+            semaphore = asyncio.Semaphore(self.sub_question_concurrency)
+
+            async def refresh(step: AnalysisStep) -> Tuple[AnalysisStep, bool]:
+                nonlocal truncated
+                try:
+                    async with semaphore:
+                        return await bounded(self._refresh_step(step, use_cache), deadline)
+                except DeadlineExceeded:
+                    truncated = True
+                    return step, False
+
+            refreshed = await asyncio.gather(*(refresh(step) for step in previous_steps))
+            steps = [step for step, _ in refreshed]
+            rerun = [index for index, (_, changed) in enumerate(refreshed) if changed]
+            final_response = previous.get("final_response", "")
+            meta_analysis = previous.get("meta_analysis")
+            try:
+                await bounded(self.context_manager.aupdate_context_batch([steps[index].structured_output for index in rerun]), deadline)
+                if rerun or not final_response:
+                    nodes = [
+                        _sub_question_node(SubQuestion(sub_question=step.query, tool_name=step.tool_name or ""), step.response, step.sources)
+                        for step in steps
+                    ]
+                    final_response = str(await bounded(self.sub_question_engine.asynthesize(QueryBundle(query), nodes), deadline))
+                if not truncated:
+                    meta_analysis = (await bounded(self.perform_meta_analysis_internal(steps, final_response, use_cache=use_cache), deadline)).dict()
+            except DeadlineExceeded:
+                truncated = True
+            span.set(steps=len(steps), rerun_steps=len(rerun), truncated=truncated)
+        if truncated:
+            logger.warning(f"Re-analysis of problem {self.problem.id} hit its deadline after re-running {len(rerun)} of {len(steps)} steps")
+            interruption_stats.record(truncated=True)
+        return {
+            "steps": [step.dict() for step in steps],
+            "final_response": final_response,
+            "meta_analysis": meta_analysis,
+            "rerun_steps": rerun,
+            "truncated": truncated,
+        }
+
+    @staticmethod
+    def _cache_key(model_name: str, llm, prompt: str) -> str:
+        return LLMResponseCache.make_key(model_name, getattr(llm, "temperature", None), prompt)
+
+    async def _acomplete_structured(self, model_name: str, llm, prompt: str, output_cls: Type[OutputT], use_cache: bool) -> OutputT:
+        use_cache = use_cache and settings.LLM_CACHE_ENABLED
+        key = self._cache_key(model_name, llm, prompt) if use_cache else None
+        cached = get_llm_cache().get(key) if use_cache else None
+        if use_cache:
+            tracer.record_cache("llm", hits=int(cached is not None), misses=int(cached is None))
+        if cached is not None:
+            return output_cls.parse_raw(cached)
+        kwargs = response_format_kwargs(model_name, output_cls.__name__, output_cls.schema())
+        async with model_router.track(model_name):
+            output_str = str(await llm_executor.acomplete(llm, prompt, **kwargs))
+        result = parse_structured(output_str, output_cls)
+        # Defects that local repair cannot fix cost a request for the missing
+        # fields only, never a full re-generation.
+        field_requests = 0
+        while result.output is None and result.missing and field_requests < settings.STRUCTURED_OUTPUT_FIELD_RETRIES:
+            field_requests += 1
+            fields_kwargs = response_format_kwargs(model_name, f"{output_cls.__name__}Fields", fields_schema(output_cls, result.missing))
+            async with model_router.track(model_name):
+                fields_str = str(await llm_executor.acomplete(llm, fields_prompt(output_cls, result, prompt), **fields_kwargs))
+            result = merge_fields(result, fields_str, output_cls)
+        structured_output_stats.record(result, field_requests)
+        if result.output is None:
+            raise ValueError(f"Missing or invalid {output_cls.__name__} fields: {', '.join(result.missing)}")
+        # Only outputs that validated are cached, and in their repaired form.
+        if use_cache:
+            get_llm_cache().put(key, result.output.json())
+        return result.output
+
+    async def generate_structured_output_async(self, response: str, use_cache: bool = True) -> SegmentOutput:
         try:
             prompt = f"""
             Based on the following analysis response, generate a structured output:
@@ -192,35 +731,36 @@ class ConsultingWorkflow(Workflow):
             - required_data: List of data required to validate or refine the analysis
             - external_review_required: Whether external review is required for this segment (true/false)
             """
-            structured_output_str = await self.llm.acomplete(prompt)
-            return SegmentOutput.parse_raw(structured_output_str)
+            model_name, llm = model_router.get_llm("structured_output")
+            with tracer.span("structured_output", "step", model=model_name):
+                return await self._acomplete_structured(model_name, llm, prompt, SegmentOutput, use_cache)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate structured output: {e}")
 
-    def perform_meta_analysis_internal(self, steps: List[AnalysisStep], final_response: str) -> MetaAnalysis:
-        prompt = f"""
-        Evaluate the following multi-step analysis for coherence, consistency, and overall quality.
-        Provide scores between 0 and 1 for each aspect, suggest improvements, and identify the critical path activities.
+    async def perform_meta_analysis_internal(self, steps: List[AnalysisStep], final_response: str, use_cache: bool = True) -> MetaAnalysis:
+        model_name, llm = model_router.get_llm("meta_analysis")
+        packed = prompt_packer.pack_steps(
+            META_ANALYSIS_PROMPT,
+            [step.dict(exclude=BOOKKEEPING_STEP_FIELDS) for step in steps],
+            final_response,
+            budget=prompt_packer.budget_for(llm),
+        )
+        prompt = packed.text
+        with tracer.span("meta_analysis", "step", model=model_name, prompt_tokens_saved=packed.tokens_saved):
+            return await self._acomplete_structured(model_name, llm, prompt, MetaAnalysis, use_cache)
 
-        Steps:
-        {json.dumps([step.dict() for step in steps], indent=2)}
+async def run_analysis_in_process(problem: Problem, query: str, use_cache: bool = True, deadline: Optional[float] = None) -> Dict[str, Any]:
+    async with workflow_pool.lease(problem) as workflow:
+        return await workflow.arun_analysis(query, use_cache=use_cache, deadline=deadline)
 
-        Final Response:
-        {final_response}
+async def run_reanalysis_in_process(problem: Problem, query: str, previous: Dict[str, Any], use_cache: bool = True, deadline: Optional[float] = None) -> Dict[str, Any]:
+    async with workflow_pool.lease(problem) as workflow:
+        return await workflow.arun_reanalysis(query, previous, use_cache=use_cache, deadline=deadline)
 
-        Output your evaluation as a JSON object matching the MetaAnalysis schema.
-        """
-        meta_analysis_str = self.llm.complete(prompt)
-        return MetaAnalysis.parse_raw(meta_analysis_str)
-
-async def run_consulting_workflow(problem: Problem, query: str):
-    client = LlamaDeployClient(ControlPlaneConfig())
-    session = client.create_session()
-    workflow = ConsultingWorkflow(problem)
-    await workflow.setup_engines()  # Ensure engines are set up
-    result = await session.arun(workflow, query=query)
-    return result
-
-# This function can be called from your API endpoint
-async def analyze_problem(problem: Problem, query: str):
-    return await run_consulting_workflow(problem, query)
\ No newline at end of file
+# This function can be called from your API endpoint. Analyses always run in
+# this process, like the streamed ones: only here do they get the warm workflow
+# pool, the pipelined steps, deadlines and cancellation on client disconnect.
+async def analyze_problem(problem: Problem, query: str, use_cache: bool = True, deadline: Optional[float] = None):
+    return await run_analysis_in_process(problem, query, use_cache=use_cache, deadline=deadline)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from llama_index.core.utils import get_tokenizer
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = " [truncated]"
+
+# Step fields given up first when a prompt is over budget, lowest value first.
+LOW_VALUE_STEP_FIELDS = ("relevant_data", "required_data")
+# Dropped only after the free-text fields have been cut down.
+SECONDARY_STEP_FIELDS = ("next_steps", "critical_assumptions", "response")
+# Successive per-field token limits applied to free text.
+TEXT_TOKEN_LIMITS = (1024, 512, 256, 128, 64)
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class PackedPrompt(NamedTuple):
+    text: str
+    tokens: int
+    tokens_saved: int
+
+
+class PromptPacker:
+    """Fits analysis prompts into a per-model token budget.
+
+    Steps are serialised as compact JSON and counted with the local tokenizer.
+    If the prompt is still over budget, the lowest-value step fields are
+    dropped, then free text is truncated in stages. As a last resort the
+    packed sections themselves are cut, never the template's instructions.
+    Tokens saved against the naive ``indent=2`` rendering are recorded per
+    prompt and in aggregate. :meth:`pack_texts` fits the context passages of a
+    synthesis prompt the same way.
+    """
+
+    def __init__(self, tokenizer: Optional[Callable[[str], List]] = None):
+        self._tokenizer = tokenizer or get_tokenizer()
+        self._lock = threading.Lock()
+        self.prompts_packed = 0
+        self.prompts_reduced = 0
+        self.tokens_saved = 0
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def budget_for(self, llm: Any) -> int:
+        """Prompt budget for ``llm``: its context window less the output reserve.
+
+        ``PROMPT_TOKEN_BUDGET`` is only used for models that report no window.
+        """
+        context_window = getattr(getattr(llm, "metadata", None), "context_window", None)
+        if not context_window:
+            return max(settings.PROMPT_TOKEN_BUDGET, 1)
+        return max(context_window - settings.PROMPT_OUTPUT_RESERVE_TOKENS, 1)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        # Token boundaries depend on the tokenizer, so cut by characters and shrink until it fits.
+        keep = int(len(text) * max_tokens / tokens)
+        while keep > 0 and self.count_tokens(text[:keep] + TRUNCATION_MARKER) > max_tokens:
+            keep = int(keep * 0.9)
+        return text[:keep] + TRUNCATION_MARKER
+
+    def pack_steps(self, template: str, steps: List[Dict[str, Any]], final_response: str, budget: int) -> PackedPrompt:
+        """Render ``template`` with ``{steps}`` and ``{final_response}`` within ``budget`` tokens."""
+        naive_tokens = self.count_tokens(template.format(steps=json.dumps(steps, indent=2, default=str), final_response=final_response))
+        steps = [self._flatten(step) for step in steps]
+        texts = {"final_response": final_response}
+
+        def render() -> str:
+            return template.format(steps=compact_json(steps), final_response=texts["final_response"])
+
+        def drop(field: str) -> Callable[[], None]:
+            def remove():
+                for step in steps:
+                    step.pop(field, None)
+            return remove
+
+        def cut_text(limit: int) -> Callable[[], None]:
+            def cut():
+                texts["final_response"] = self.truncate(texts["final_response"], max(budget // 2, limit))
+                for step in steps:
+                    if "response" in step:
+                        step["response"] = self.truncate(step["response"], limit)
+            return cut
+
+        reductions = (
+            [drop(field) for field in LOW_VALUE_STEP_FIELDS]
+            + [cut_text(limit) for limit in TEXT_TOKEN_LIMITS]
+            + [drop(field) for field in SECONDARY_STEP_FIELDS]
+        )
+        prompt = render()
+        reduced = False
+        for reduce in reductions:
+            if self.count_tokens(prompt) <= budget:
+                break
+            reduced = True
+            reduce()
+            prompt = render()
+        tokens = self.count_tokens(prompt)
+        if tokens > budget:
+            reduced = True
+            # Cut the packed sections, keeping the template's instructions whole.
+            room = budget - self.count_tokens(template.format(steps="", final_response=""))
+            while tokens > budget and room > 0:
+                final = self.truncate(texts["final_response"], room // 2)
+                prompt = template.format(steps=self.truncate(compact_json(steps), room - self.count_tokens(final)), final_response=final)
+                tokens = self.count_tokens(prompt)
+                room = int(room * 0.9)
+
+        packed = PackedPrompt(text=prompt, tokens=tokens, tokens_saved=max(naive_tokens - tokens, 0))
+        self._record(reduced, packed.tokens_saved)
+        logger.debug(f"Packed prompt to {packed.tokens} tokens (budget {budget}, saved {packed.tokens_saved})")
+        return packed
+
+    def pack_texts(self, texts: Sequence[str], budget: int) -> List[str]:
+        """``texts`` cut to at most ``budget`` tokens in total, longest first.
+
+        Every text keeps at least as many tokens as it would with the budget
+        split evenly, so one long passage cannot crowd out the others.
+        """
+        counts = [self.count_tokens(text) for text in texts]
+        if sum(counts) <= budget:
+            self._record(False, 0)
+            return list(texts)
+        # The largest per-text limit whose total fits the budget.
+        limit, remaining = 0, budget
+        for index, count in enumerate(sorted(counts)):
+            share = remaining // (len(counts) - index)
+            if count > share:
+                limit = share
+                break
+            remaining -= count
+        packed = [self.truncate(text, max(limit, 1)) if count > limit else text for text, count in zip(texts, counts)]
+        self._record(True, sum(counts) - sum(self.count_tokens(text) for text in packed))
+        return packed
+
+    def _record(self, reduced: bool, tokens_saved: int) -> None:
+        with self._lock:
+            self.prompts_packed += 1
+            self.prompts_reduced += int(reduced)
+            self.tokens_saved += max(tokens_saved, 0)
+
+    @staticmethod
+    def _flatten(step: Dict[str, Any]) -> Dict[str, Any]:
+        flat = {key: value for key, value in step.items() if key != "structured_output"}
+        flat.update(step.get("structured_output") or {})
+        return flat
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "prompts_packed": self.prompts_packed,
+            "prompts_reduced": self.prompts_reduced,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+prompt_packer = PromptPacker()
@@ -0,0 +1,214 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from llama_index.core import QueryBundle
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other
+our ours ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists by summing ``1 / (k + rank)``; best first."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """In-process Okapi BM25 over an inverted index, updated node by node.
+
+    Each node keeps the access list it was indexed with (the documents it
+    belongs to), so searches can be limited to what a problem may see.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._access: Dict[str, Tuple[str, ...]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._lengths
+
+    def add(self, node_id: str, text: str, access: Iterable[str] = ()) -> None:
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if node_id in self._lengths:
+                self._remove(node_id)
+            for term, count in counts.items():
+                self._postings[term][node_id] = count
+            length = sum(counts.values())
+            self._terms[node_id] = tuple(counts)
+            self._lengths[node_id] = length
+            self._access[node_id] = tuple(access)
+            self._total_length += length
+
+    def _remove(self, node_id: str) -> None:
+        for term in self._terms.pop(node_id):
+            postings = self._postings[term]
+            del postings[node_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(node_id)
+        del self._access[node_id]
+
+    def remove(self, node_id: str) -> None:
+        with self._lock:
+            if node_id in self._lengths:
+                self._remove(node_id)
+
+    def set_access(self, node_id: str, access: Iterable[str]) -> None:
+        with self._lock:
+            if node_id in self._lengths:
+                self._access[node_id] = tuple(access)
+
+    def search(self, query: str, top_k: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float, int]]:
+        """``(node_id, score, matched query terms)`` for the best ``top_k`` nodes."""
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, int] = defaultdict(int)
+        with self._lock:
+            if not self._lengths:
+                return []
+            total = len(self._lengths)
+            average = self._total_length / total
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for node_id, count in postings.items():
+                    if allowed is not None and allowed.isdisjoint(self._access[node_id]):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[node_id] / average)
+                    scores[node_id] += idf * count * (self.k1 + 1) / (count + norm)
+                    matched[node_id] += 1
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(node_id, score, matched[node_id]) for node_id, score in best]
+
+
+class RetrievalStats:
+    """Counts of hybrid retrievals and of lexical fast-path hits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hybrid = 0
+        self.lexical = 0
+
+    def record(self, lexical: bool) -> None:
+        with self._lock:
+            if lexical:
+                self.lexical += 1
+            else:
+                self.hybrid += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hybrid": self.hybrid, "lexical": self.lexical}
+
+
+retrieval_stats = RetrievalStats()
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 and vector retrieval fused with reciprocal rank fusion.
+
+    Both retrievers return ``candidates`` nodes and the fused top
+    ``similarity_top_k`` are kept. A short keyword query whose best BM25 hit
+    contains every query term is answered from BM25 alone, so it needs no
+    query embedding.
+    """
+
+    def __init__(
+        self,
+        bm25: BM25Index,
+        docstore: BaseDocumentStore,
+        vector_retriever: BaseRetriever,
+        allowed: Optional[Set[str]] = None,
+        similarity_top_k: int = 2,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        lexical_max_terms: int = 0,
+    ):
+        super().__init__()
+        self._bm25 = bm25
+        self._docstore = docstore
+        self._vector_retriever = vector_retriever
+        self._allowed = allowed
+        self._similarity_top_k = similarity_top_k
+        self._candidates = max(candidates, similarity_top_k)
+        self._rrf_k = rrf_k
+        self._lexical_max_terms = lexical_max_terms
+
+    def _lexical(self, query_str: str) -> List[Tuple[str, float, int]]:
+        return self._bm25.search(query_str, self._candidates, self._allowed)
+
+    def _fast_path(self, query_str: str, lexical: List[Tuple[str, float, int]]) -> bool:
+        terms = set(tokenize(query_str))
+        if not lexical or not terms or len(terms) > self._lexical_max_terms:
+            return False
+        # Most words in a keyword query are content terms, not stopwords.
+        words = _TOKEN.findall(query_str)
+        return len(terms) * 2 >= len(words) and lexical[0][2] == len(terms)
+
+    def answers_lexically(self, query_str: str) -> bool:
+        """Whether ``query_str`` is answered from BM25 alone, without a query embedding."""
+        return self._fast_path(query_str, self._lexical(query_str))
+
+    def _nodes(self, ranked: Sequence[Tuple[str, float]]) -> List[NodeWithScore]:
+        nodes = self._docstore.get_nodes([node_id for node_id, _ in ranked], raise_error=False)
+        return [NodeWithScore(node=node, score=score) for node, (_, score) in zip(nodes, ranked) if node is not None]
+
+    def _fuse(self, lexical: List[Tuple[str, float, int]], dense: List[NodeWithScore]) -> List[NodeWithScore]:
+        dense_nodes = {node.node.node_id: node.node for node in dense}
+        fused = reciprocal_rank_fusion(
+            [[node_id for node_id, _, _ in lexical], [node.node.node_id for node in dense]], k=self._rrf_k
+        )[:self._similarity_top_k]
+        missing = [(node_id, score) for node_id, score in fused if node_id not in dense_nodes]
+        loaded = {node.node.node_id: node.node for node in self._nodes(missing)}
+        results = []
+        for node_id, score in fused:
+            node = dense_nodes.get(node_id) or loaded.get(node_id)
+            if node is not None:
+                results.append(NodeWithScore(node=node, score=score))
+        return results
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        lexical = self._lexical(query_bundle.query_str)
+        if self._fast_path(query_bundle.query_str, lexical):
+            retrieval_stats.record(lexical=True)
+            return self._nodes([(node_id, score) for node_id, score, _ in lexical[:self._similarity_top_k]])
+        retrieval_stats.record(lexical=False)
+        return self._fuse(lexical, self._vector_retriever.retrieve(query_bundle))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        lexical = self._lexical(query_bundle.query_str)
+        if self._fast_path(query_bundle.query_str, lexical):
+            retrieval_stats.record(lexical=True)
+            return self._nodes([(node_id, score) for node_id, score, _ in lexical[:self._similarity_top_k]])
+        retrieval_stats.record(lexical=False)
+        return self._fuse(lexical, await self._vector_retriever.aretrieve(query_bundle))
@@ -0,0 +1,219 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+FIELDS_PROMPT = """The JSON below is missing the fields {fields}, or they were invalid.
+Using the original request, return a JSON object containing only these fields.
+
+Original request:
+{request}
+
+JSON so far:
+{partial}
+
+Schema of the missing fields:
+{schema}"""
+
+
+class ParseResult(NamedTuple):
+    output: Optional[BaseModel]
+    data: Dict[str, Any]
+    missing: List[str]
+    repaired: bool
+
+
+def _loads(text: str) -> Optional[Any]:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _replace_python_literals(text: str) -> str:
+    return re.sub(r"\b(True|False|None)\b", lambda m: _PYTHON_LITERALS[m.group(1)], text)
+
+
+def _scan(text: str):
+    """Yield ``(index, open_closers, in_string)`` after each character, ignoring brackets in strings."""
+    stack = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+        yield index, stack, in_string
+
+
+def _extract_object(text: str) -> Optional[str]:
+    """The first top-level object in ``text``, or everything after its ``{`` if it never closes."""
+    start = text.find("{")
+    if start == -1:
+        return None
+    for index, stack, _ in _scan(text[start:]):
+        if not stack:
+            return text[start:start + index + 1]
+    return text[start:]
+
+
+def _close_truncated(text: str) -> str:
+    """Close the strings, arrays and objects left open by a truncated completion."""
+    stack, in_string = [], False
+    for _, stack, in_string in _scan(text):
+        pass
+    if in_string:
+        text += '"'
+    # A dangling comma or a key without its value cannot be completed, so drop it.
+    text = re.sub(r'(,\s*"[^"]*"\s*:?\s*|,\s*|:\s*)$', "", text.rstrip())
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """Parse ``text`` as JSON, fixing common completion defects locally.
+
+    Handles code fences, prose around the object, smart quotes, trailing
+    commas, Python literals, single-quoted JSON and truncated output. Returns
+    None if the text cannot be salvaged.
+    """
+    candidate = _extract_object(_FENCE.sub("", text.strip()))
+    if candidate is None:
+        return None
+
+    fixes = [
+        lambda t: t.translate(_SMART_QUOTES),
+        lambda t: _TRAILING_COMMA.sub(r"\1", t),
+        _replace_python_literals,
+        lambda t: t.replace("'", '"') if '"' not in t else t,
+        _close_truncated,
+        lambda t: _TRAILING_COMMA.sub(r"\1", t),
+    ]
+    for fix in fixes:
+        parsed = _loads(candidate)
+        if parsed is not None:
+            return parsed
+        candidate = fix(candidate)
+    return _loads(candidate)
+
+
+def _validate(data: Dict[str, Any], output_cls: Type[BaseModel]) -> ParseResult:
+    data = dict(data)
+    try:
+        return ParseResult(output_cls.parse_obj(data), data, [], False)
+    except ValidationError as e:
+        errors = e.errors()
+    for error in errors:
+        field = error["loc"][0] if error["loc"] else None
+        if field not in data:
+            continue
+        # A bare string where a list is expected is almost always a one-item list.
+        if "list" in error["type"] and isinstance(data[field], str):
+            data[field] = [data[field]]
+            continue
+        del data[field]
+    try:
+        return ParseResult(output_cls.parse_obj(data), data, [], False)
+    except ValidationError as e:
+        invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+    valid = {field: value for field, value in data.items() if field not in invalid}
+    missing = [field for field in output_cls.schema().get("properties", {}) if field in invalid and field not in valid]
+    return ParseResult(None, valid, missing, False)
+
+
+def parse_structured(text: str, output_cls: Type[BaseModel]) -> ParseResult:
+    """Parse ``text`` into ``output_cls``, keeping whatever fields are valid."""
+    parsed = _loads(text)
+    repaired = parsed is None
+    if repaired:
+        parsed = repair_json(text)
+    if not isinstance(parsed, dict):
+        return ParseResult(None, {}, list(output_cls.schema().get("properties", {})), repaired)
+    return _validate(parsed, output_cls)._replace(repaired=repaired)
+
+
+def merge_fields(result: ParseResult, text: str, output_cls: Type[BaseModel]) -> ParseResult:
+    """Merge a completion holding only the missing fields into ``result``."""
+    extra = _loads(text)
+    if extra is None:
+        extra = repair_json(text)
+    if not isinstance(extra, dict):
+        return result
+    fields = {field: value for field, value in extra.items() if field in result.missing}
+    return _validate({**result.data, **fields}, output_cls)._replace(repaired=result.repaired)
+
+
+def fields_schema(output_cls: Type[BaseModel], fields: List[str]) -> Dict[str, Any]:
+    schema = output_cls.schema()
+    properties = schema.get("properties", {})
+    subset = {"type": "object", "properties": {field: properties[field] for field in fields if field in properties}, "required": fields}
+    if "$defs" in schema:
+        subset["$defs"] = schema["$defs"]
+    return subset
+
+
+def fields_prompt(output_cls: Type[BaseModel], result: ParseResult, request: str) -> str:
+    return FIELDS_PROMPT.format(
+        fields=", ".join(result.missing),
+        request=request.strip(),
+        partial=json.dumps(result.data, default=str),
+        schema=json.dumps(fields_schema(output_cls, result.missing)),
+    )
+
+
+def supports_json_schema(model_name: str) -> bool:
+    return any(model_name.startswith(prefix) for prefix in settings.STRUCTURED_OUTPUT_SCHEMA_MODELS)
+
+
+def response_format_kwargs(model_name: str, name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Provider arguments that constrain the completion to ``schema``, if supported."""
+    if not supports_json_schema(model_name):
+        return {}
+    # Non-strict: strict mode cannot express free-form objects such as relevant_data.
+    return {"response_format": {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": False}}}
+
+
+class StructuredOutputStats:
+    """Counts of locally repaired completions and field-only re-requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.repaired = 0
+        self.field_requests = 0
+        self.failed = 0
+
+    def record(self, result: ParseResult, field_requests: int) -> None:
+        with self._lock:
+            self.parsed += 1
+            self.repaired += int(result.repaired)
+            self.field_requests += field_requests
+            self.failed += int(result.output is None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "parsed": self.parsed,
+            "repaired": self.repaired,
+            "field_requests": self.field_requests,
+            "failed": self.failed,
+        }
+
+
+structured_output_stats = StructuredOutputStats()
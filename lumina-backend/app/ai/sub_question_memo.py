@@ -0,0 +1,157 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.ai.vector_store import normalise
+from app.core.config import settings
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalise_question(question: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", question.lower()).split())
+
+
+class SubQuestionMemo:
+    """Answers to sub-questions, reused while a problem's corpus is unchanged.
+
+    Entries are scoped to a problem, a version hash of its indexed content and
+    the tool that answered them, and keyed by the normalised sub-question.
+    Questions without an exact match are compared by embedding, and an answer
+    is reused when the cosine similarity reaches ``similarity_threshold``.
+    Entries live in SQLite; the embeddings of each scope are held in memory as
+    one matrix once the scope has been read. Writing under a new version drops
+    the problem's entries for older versions.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86_400, similarity_threshold: float = 0.95):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        # (problem_id, version, tool) -> (answers, unit-length embedding rows)
+        self._scopes: Dict[Tuple[int, str, str], Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sub_question_answers ("
+            " problem_id INTEGER NOT NULL,"
+            " version TEXT NOT NULL,"
+            " tool TEXT NOT NULL,"
+            " question_key TEXT NOT NULL,"
+            " embedding BLOB,"
+            " answer TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (problem_id, version, tool, question_key))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question: str) -> str:
+        return hashlib.sha256(normalise_question(question).encode("utf-8")).hexdigest()
+
+    def _load_scope(self, scope: Tuple[int, str, str]) -> Tuple[List[str], np.ndarray]:
+        if scope not in self._scopes:
+            rows = self._conn.execute(
+                "SELECT embedding, answer FROM sub_question_answers"
+                " WHERE problem_id = ? AND version = ? AND tool = ? AND embedding IS NOT NULL AND created_at >= ?",
+                (*scope, time.time() - self.ttl_seconds),
+            ).fetchall()
+            vectors = [np.frombuffer(row[0], dtype=np.float32) for row in rows]
+            # Rows embedded by a model of another dimension cannot be compared.
+            dim = len(vectors[-1]) if vectors else 0
+            kept = [(vector, row[1]) for vector, row in zip(vectors, rows) if len(vector) == dim]
+            matrix = np.vstack([vector for vector, _ in kept]) if kept else np.zeros((0, 0), dtype=np.float32)
+            self._scopes[scope] = ([answer for _, answer in kept], matrix)
+        return self._scopes[scope]
+
+    def get(self, problem_id: int, version: str, tool: str, question: str) -> Optional[str]:
+        """The answer stored for this exact (normalised) question, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, created_at FROM sub_question_answers"
+                " WHERE problem_id = ? AND version = ? AND tool = ? AND question_key = ?",
+                (problem_id, version, tool, self.make_key(question)),
+            ).fetchone()
+            if row is not None and time.time() - row[1] <= self.ttl_seconds:
+                self.hits += 1
+                return row[0]
+            return None
+
+    def get_similar(self, problem_id: int, version: str, tool: str, embedding: List[float]) -> Optional[str]:
+        """The answer to the most similar stored question, if it is similar enough."""
+        with self._lock:
+            answers, matrix = self._load_scope((problem_id, version, tool))
+            if answers and matrix.shape[1] == len(embedding):
+                scores = matrix @ normalise(np.asarray(embedding, dtype=np.float32))
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self.hits += 1
+                    self.similar_hits += 1
+                    return answers[best]
+            self.misses += 1
+            return None
+
+    def record_miss(self) -> None:
+        """Count a lookup that could not be compared by embedding."""
+        with self._lock:
+            self.misses += 1
+
+    def put(self, problem_id: int, version: str, tool: str, question: str, answer: str, embedding: Optional[List[float]] = None) -> None:
+        vector = None if embedding is None else normalise(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sub_question_answers WHERE problem_id = ? AND version != ?", (problem_id, version)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sub_question_answers"
+                " (problem_id, version, tool, question_key, embedding, answer, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (problem_id, version, tool, self.make_key(question), None if vector is None else vector.tobytes(), answer, time.time()),
+            )
+            self._conn.commit()
+            for scope in [scope for scope in self._scopes if scope[0] == problem_id]:
+                del self._scopes[scope]
+
+    def invalidate(self, problem_id: int) -> int:
+        """Drop every entry for ``problem_id``, e.g. after its literature changed."""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM sub_question_answers WHERE problem_id = ?", (problem_id,)).rowcount
+            self._conn.commit()
+            for scope in [scope for scope in self._scopes if scope[0] == problem_id]:
+                del self._scopes[scope]
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+        }
+
+
+_sub_question_memo: Optional[SubQuestionMemo] = None
+_sub_question_memo_lock = threading.Lock()
+
+
+def get_sub_question_memo() -> SubQuestionMemo:
+    """Return the process-wide sub-question memo."""
+    global _sub_question_memo
+    with _sub_question_memo_lock:
+        if _sub_question_memo is None:
+            _sub_question_memo = SubQuestionMemo(
+                settings.SUB_QUESTION_MEMO_PATH,
+                ttl_seconds=settings.SUB_QUESTION_MEMO_TTL_SECONDS,
+                similarity_threshold=settings.SUB_QUESTION_MEMO_SIMILARITY,
+            )
+    return _sub_question_memo
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.utils import get_tokenizer
+
+from app.core.tracing import Tracer, tracer
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text))
+
+
+def token_usage(response: Any, prompt: str) -> Tuple[int, int]:
+    """Prompt and completion tokens, from provider usage when reported, otherwise counted locally."""
+    raw = getattr(response, "raw", None)
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if isinstance(usage, dict):
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    else:
+        prompt_tokens, completion_tokens = getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+    if prompt_tokens is not None and completion_tokens is not None:
+        return int(prompt_tokens), int(completion_tokens)
+    return count_tokens(prompt), count_tokens(str(response or ""))
+
+
+def model_name_of(llm: Any) -> str:
+    return str(getattr(llm, "model", None) or getattr(getattr(llm, "metadata", None), "model_name", None) or type(llm).__name__)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns llama_index retrieval and LLM events into spans.
+
+    The workflow's own LLMs call through the executor, which already opens a
+    span; an LLM event fired inside one is the same call and is not recorded
+    twice. These events record retrievals and any LLM call llama_index makes
+    on a model that was not wrapped, e.g. a sync query path.
+    """
+
+    KINDS = {CBEventType.RETRIEVE: "retrieval", CBEventType.LLM: "llm"}
+
+    def __init__(self, tracer: Tracer, usage: Callable[[Any, str], Tuple[int, int]] = token_usage):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self.tracer = tracer
+        self.usage = usage
+        # Start time and model of every event in flight, by event id. Only the
+        # start payload carries the serialized LLM.
+        self._starts: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(
+        self,
+        event_type: CBEventType,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        parent_id: str = "",
+        **kwargs: Any,
+    ) -> str:
+        if event_type in self.KINDS and not self._nested(event_type):
+            serialized = (payload or {}).get(EventPayload.SERIALIZED) or {}
+            model = str(serialized.get("model") or serialized.get("model_name") or serialized.get("class_name") or "unknown")
+            with self._lock:
+                self._starts[event_id] = (time.perf_counter(), model)
+        return event_id
+
+    def on_event_end(
+        self,
+        event_type: CBEventType,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            start, model = self._starts.pop(event_id, (None, None))
+        if start is None:
+            return
+        payload = payload or {}
+        duration = time.perf_counter() - start
+        error = payload.get(EventPayload.EXCEPTION)
+        if error is not None:
+            # A failed call has no response or usage to count; record it as an error.
+            name, attributes = ("retrieve", {}) if event_type == CBEventType.RETRIEVE else ("complete", {"model": model})
+            self.tracer.record(name, self.KINDS[event_type], duration, status="error", error=type(error).__name__, **attributes)
+            return
+        if event_type == CBEventType.RETRIEVE:
+            self.tracer.record("retrieve", "retrieval", duration, nodes=len(payload.get(EventPayload.NODES) or []))
+            return
+        response = payload.get(EventPayload.RESPONSE) or payload.get(EventPayload.COMPLETION)
+        prompt = payload.get(EventPayload.PROMPT) or "\n".join(str(m) for m in payload.get(EventPayload.MESSAGES) or [])
+        prompt_tokens, completion_tokens = self.usage(response, str(prompt))
+        self.tracer.llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+        self.tracer.llm_tokens.inc(model, "completion", amount=completion_tokens)
+        self.tracer.record(
+            "complete", "llm", duration, model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+
+    def _nested(self, event_type: CBEventType) -> bool:
+        span = self.tracer.current_span()
+        return span is not None and span.kind == self.KINDS[event_type]
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
+
+
+tracing_callback_handler = TracingCallbackHandler(tracer)
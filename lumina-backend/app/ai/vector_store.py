@@ -0,0 +1,348 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from pydantic import PrivateAttr
+
+DEFAULT_PERSIST_FNAME = "default__vector_store.json"
+# Metadata filter comparisons, applied to the metadata kept with each row.
+FILTER_OPERATORS: Dict[FilterOperator, Callable[[Any, Any], bool]] = {
+    FilterOperator.EQ: lambda value, expected: value == expected,
+    FilterOperator.NE: lambda value, expected: value != expected,
+    FilterOperator.IN: lambda value, expected: value in expected,
+    FilterOperator.NIN: lambda value, expected: value not in expected,
+    FilterOperator.GT: lambda value, expected: value is not None and value > expected,
+    FilterOperator.GTE: lambda value, expected: value is not None and value >= expected,
+    FilterOperator.LT: lambda value, expected: value is not None and value < expected,
+    FilterOperator.LTE: lambda value, expected: value is not None and value <= expected,
+    FilterOperator.ANY: lambda value, expected: value is not None and any(item in expected for item in value),
+    FilterOperator.ALL: lambda value, expected: value is not None and all(item in value for item in expected),
+    FilterOperator.CONTAINS: lambda value, expected: value is not None and expected in value,
+}
+# Operators answered from the metadata postings instead of row by row:
+# EQ and IN look up scalar values, ANY looks up the items of list values.
+POSTING_OPERATORS = (FilterOperator.EQ, FilterOperator.IN, FilterOperator.ANY)
+
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    """Unit-length float32 rows; zero rows stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first, without a full sort."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """In-process vector store holding normalised embeddings in one NumPy matrix.
+
+    Rows live in a contiguous float32 matrix that grows by doubling, so
+    appends are amortised in place. A query is one matrix-vector product and
+    an ``argpartition``; :meth:`query_batch` scores many queries with one
+    matrix-matrix product. Node id, ref doc id and EQ/IN/ANY metadata filters
+    select rows through in-memory postings rather than a scan of every
+    row's metadata. Text stays in the index's docstore
+    (``stores_text`` is False). Persisted as an ``.npz`` archive, and indexes
+    persisted by the default JSON store are converted on load.
+    """
+
+    stores_text: bool = False
+
+    _matrix: np.ndarray = PrivateAttr()
+    _size: int = PrivateAttr(default=0)
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+    _metadata: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+    _rows: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # Rows by ref doc id, and by metadata key and scalar value or list item.
+    _ref_rows: Dict[Optional[str], List[int]] = PrivateAttr(default_factory=dict)
+    _values: Dict[str, Dict[Any, Set[int]]] = PrivateAttr(default_factory=dict)
+    _items: Dict[str, Dict[Any, Set[int]]] = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr()
+
+    def __init__(self, dim: int = 0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._lock = threading.RLock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Read-only view of the stored rows."""
+        view = self._matrix[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        if self._size == 0 and self._matrix.shape[1] != dim:
+            self._matrix = np.zeros((0, dim), dtype=np.float32)
+        elif self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match stored dimension {self._matrix.shape[1]}")
+        needed = self._size + rows
+        if needed > len(self._matrix):
+            grown = np.empty((max(needed, 2 * len(self._matrix), 64), dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def add_vectors(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        ref_doc_ids: Optional[Sequence[Optional[str]]] = None,
+        metadata: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> List[str]:
+        """Append rows straight from an array, e.g. a memory-mapped file, without per-node lists."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(ids):
+            return []
+        with self._lock:
+            self._reserve(len(ids), vectors.shape[1])
+            self._matrix[self._size:self._size + len(ids)] = normalise(vectors)
+            for offset, node_id in enumerate(ids):
+                self._rows[node_id] = self._size + offset
+            first = self._size
+            self._size += len(ids)
+            self._ids.extend(ids)
+            self._ref_doc_ids.extend(ref_doc_ids or [None] * len(ids))
+            self._metadata.extend(metadata or [{} for _ in ids])
+            self._index_rows(range(first, self._size))
+        return list(ids)
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        return self.add_vectors(
+            [node.node_id for node in nodes],
+            np.array([node.get_embedding() for node in nodes], dtype=np.float32),
+            ref_doc_ids=[node.ref_doc_id for node in nodes],
+            metadata=[dict(node.metadata) for node in nodes],
+        )
+
+    def get(self, text_id: str) -> List[float]:
+        with self._lock:
+            return self._matrix[self._rows[text_id]].tolist()
+
+    def get_vectors(self, ids: Sequence[str]) -> np.ndarray:
+        with self._lock:
+            return self._matrix[[self._rows[node_id] for node_id in ids]].copy()
+
+    def _remove_rows(self, keep: np.ndarray) -> None:
+        kept = int(keep.sum())
+        self._matrix[:kept] = self._matrix[:self._size][keep]
+        self._ids = [node_id for node_id, k in zip(self._ids, keep) if k]
+        self._ref_doc_ids = [ref for ref, k in zip(self._ref_doc_ids, keep) if k]
+        self._metadata = [meta for meta, k in zip(self._metadata, keep) if k]
+        self._rows = {node_id: row for row, node_id in enumerate(self._ids)}
+        self._size = kept
+        # Row numbers shifted, so the postings are rebuilt.
+        self._ref_rows, self._values, self._items = {}, {}, {}
+        self._index_rows(range(self._size))
+
+    @staticmethod
+    def _post(postings: Dict[str, Dict[Any, Set[int]]], key: str, value: Any, row: int, add: bool) -> None:
+        try:
+            rows = postings.setdefault(key, {}).setdefault(value, set())
+        except TypeError:
+            # Unhashable values are only matched by the row-by-row fallback.
+            return
+        if add:
+            rows.add(row)
+        else:
+            rows.discard(row)
+
+    def _index_metadata(self, row: int, metadata: Dict[str, Any], add: bool = True) -> None:
+        for key, value in metadata.items():
+            if isinstance(value, (list, tuple)):
+                for item in value:
+                    self._post(self._items, key, item, row, add)
+            if value is not None and not isinstance(value, list):
+                self._post(self._values, key, value, row, add)
+
+    def _index_rows(self, rows: Iterable[int]) -> None:
+        for row in rows:
+            self._ref_rows.setdefault(self._ref_doc_ids[row], []).append(row)
+            self._index_metadata(row, self._metadata[row])
+
+    def update_metadata(self, node_id: str, metadata: Dict[str, Any]) -> None:
+        """Replace the metadata filters see for ``node_id``."""
+        with self._lock:
+            row = self._rows[node_id]
+            self._index_metadata(row, self._metadata[row], add=False)
+            self._metadata[row] = dict(metadata)
+            self._index_metadata(row, self._metadata[row])
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            rows = self._ref_rows.get(ref_doc_id)
+            if rows:
+                keep = np.ones(self._size, dtype=bool)
+                keep[rows] = False
+                self._remove_rows(keep)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        with self._lock:
+            remove = self._mask(node_ids=node_ids, filters=filters)
+            if remove.any():
+                self._remove_rows(~remove)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = np.zeros((0, self._matrix.shape[1]), dtype=np.float32)
+            self._size = 0
+            self._ids, self._ref_doc_ids, self._metadata, self._rows = [], [], [], {}
+            self._ref_rows, self._values, self._items = {}, {}, {}
+
+    def _rows_mask(self, rows: Iterable[int]) -> np.ndarray:
+        mask = np.zeros(self._size, dtype=bool)
+        rows = list(rows)
+        if rows:
+            mask[rows] = True
+        return mask
+
+    def _mask(self, node_ids=None, doc_ids=None, filters: Optional[MetadataFilters] = None) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        if node_ids is not None:
+            mask &= self._rows_mask(self._rows[node_id] for node_id in set(node_ids) if node_id in self._rows)
+        if doc_ids is not None:
+            mask &= self._rows_mask(row for ref in set(doc_ids) for row in self._ref_rows.get(ref, ()))
+        if filters is not None and filters.filters:
+            mask &= self._filters_mask(filters)
+        return mask
+
+    def _filters_mask(self, filters: MetadataFilters) -> np.ndarray:
+        masks = [
+            self._filters_mask(metadata_filter) if isinstance(metadata_filter, MetadataFilters) else self._filter_mask(metadata_filter)
+            for metadata_filter in filters.filters
+        ]
+        if filters.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        if filters.condition == FilterCondition.NOT:
+            return ~np.logical_or.reduce(masks)
+        return np.logical_and.reduce(masks)
+
+    def _filter_mask(self, metadata_filter: MetadataFilter) -> np.ndarray:
+        operator, key, expected = metadata_filter.operator, metadata_filter.key, metadata_filter.value
+        compare = FILTER_OPERATORS.get(operator)
+        if compare is None:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        if operator in POSTING_OPERATORS:
+            wanted = [expected] if operator == FilterOperator.EQ else expected
+            # A missing key reads as None, which the postings do not hold.
+            if isinstance(wanted, (list, tuple, set)) and None not in wanted:
+                postings = (self._items if operator == FilterOperator.ANY else self._values).get(key, {})
+                try:
+                    return self._rows_mask(row for value in wanted for row in postings.get(value, ()))
+                except TypeError:
+                    pass
+        return np.fromiter((compare(meta.get(key), expected) for meta in self._metadata), dtype=bool, count=self._size)
+
+    def _result(self, scores: np.ndarray, rows: np.ndarray, k: int) -> VectorStoreQueryResult:
+        best = top_k(scores, k)
+        return VectorStoreQueryResult(
+            similarities=scores[best].tolist(),
+            ids=[self._ids[row] for row in rows[best]],
+        )
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"NumpyVectorStore does not support query mode {query.mode}")
+        if query.query_embedding is None:
+            raise ValueError("NumpyVectorStore requires a query embedding")
+        with self._lock:
+            if self._size == 0:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+            vector = normalise(np.asarray(query.query_embedding, dtype=np.float32))
+            if query.node_ids is None and query.doc_ids is None and not (query.filters and query.filters.filters):
+                return self._result(self._matrix[:self._size] @ vector, np.arange(self._size), query.similarity_top_k)
+            rows = np.flatnonzero(self._mask(query.node_ids, query.doc_ids, query.filters))
+            return self._result(self._matrix[rows] @ vector, rows, query.similarity_top_k)
+
+    def query_batch(self, query_embeddings: np.ndarray, similarity_top_k: int) -> List[VectorStoreQueryResult]:
+        """Top-k for several query embeddings with one matrix product."""
+        with self._lock:
+            queries = normalise(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+            if self._size == 0:
+                return [VectorStoreQueryResult(similarities=[], ids=[]) for _ in queries]
+            scores = self._matrix[:self._size] @ queries.T
+            rows = np.arange(self._size)
+            return [self._result(scores[:, column], rows, similarity_top_k) for column in range(scores.shape[1])]
+
+    def persist(self, persist_path: str = os.path.join("./storage", DEFAULT_PERSIST_FNAME), fs: Optional[Any] = None) -> None:
+        directory = os.path.dirname(persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            payload = {
+                "embeddings": self._matrix[:self._size],
+                "ids": np.array(self._ids, dtype=np.str_),
+                "ref_doc_ids": np.array([ref or "" for ref in self._ref_doc_ids], dtype=np.str_),
+                "metadata": np.array(json.dumps(self._metadata, default=str)),
+            }
+            # Written through a handle so numpy keeps the llama_index file name.
+            with open(persist_path, "wb") as f:
+                np.savez(f, **payload)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs: Optional[Any] = None) -> "NumpyVectorStore":
+        with open(persist_path, "rb") as f:
+            is_json = f.read(1) == b"{"
+        if is_json:
+            from llama_index.core.vector_stores import SimpleVectorStore
+            return cls.from_simple(SimpleVectorStore.from_persist_path(persist_path))
+        store = cls()
+        with np.load(persist_path) as data:
+            store.add_vectors(
+                data["ids"].tolist(),
+                data["embeddings"],
+                ref_doc_ids=[ref or None for ref in data["ref_doc_ids"].tolist()],
+                metadata=json.loads(data["metadata"].item()),
+            )
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, fs: Optional[Any] = None) -> "NumpyVectorStore":
+        persist_path = os.path.join(persist_dir, DEFAULT_PERSIST_FNAME)
+        if not os.path.exists(persist_path):
+            return cls()
+        return cls.from_persist_path(persist_path)
+
+    @classmethod
+    def from_simple(cls, simple_store: Any) -> "NumpyVectorStore":
+        """Convert a llama_index ``SimpleVectorStore``."""
+        data = simple_store.data
+        store = cls()
+        ids = list(data.embedding_dict)
+        if ids:
+            store.add_vectors(
+                ids,
+                np.array([data.embedding_dict[node_id] for node_id in ids], dtype=np.float32),
+                ref_doc_ids=[data.text_id_to_ref_doc_id.get(node_id) for node_id in ids],
+                metadata=[dict(data.metadata_dict.get(node_id) or {}) for node_id in ids],
+            )
+        return store
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.models.consulting import Problem
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowPool:
+    """Warm ``ConsultingWorkflow`` instances, one idle instance per problem.
+
+    ``acquire`` hands out an idle instance whose engines are already set up,
+    or builds a new one; ``release`` returns it. Idle instances expire after
+    ``ttl_seconds`` and the least recently released are evicted beyond
+    ``max_size``. ``invalidate`` bumps a problem's generation so that every
+    instance built before the change, idle or leased, is dropped instead of
+    being reused.
+
+    An instance is only ever used by one analysis at a time; concurrent
+    analyses of the same problem each get their own. Generations live in
+    memory, so a change made by another process would not invalidate this
+    pool: the app runs as a single process.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 32,
+        ttl_seconds: float = 900.0,
+        factory: Optional[Callable[[Problem], Any]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._factory = factory
+        self._idle: "OrderedDict[int, Tuple[float, int, Any]]" = OrderedDict()
+        self._leased: Dict[int, Tuple[int, int]] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, problem: Problem):
+        if self._factory is not None:
+            return self._factory(problem)
+        # Imported lazily so CRUD modules can invalidate without loading the AI stack.
+        from app.ai.multi_step_engine import ConsultingWorkflow
+        return ConsultingWorkflow(problem)
+
+    def _expired(self, released_at: float) -> bool:
+        return time.monotonic() - released_at > self.ttl_seconds
+
+    async def acquire(self, problem: Problem):
+        with self._lock:
+            generation = self._generations.get(problem.id, 0)
+            entry = self._idle.pop(problem.id, None)
+        warm = entry is not None and entry[1] == generation and not self._expired(entry[0])
+        if warm:
+            workflow = entry[2]
+            # The instance outlives the request that built it, so point it at
+            # this request's problem, re-route models for the new run and drop
+            # the previous run's context: runs never share findings, and the
+            # context would otherwise grow with every analysis.
+            workflow.problem = problem
+            workflow.reset_context()
+            workflow.route_models()
+        else:
+            workflow = self._build(problem)
+            await workflow.setup_engines()
+        with self._lock:
+            self._leased[id(workflow)] = (problem.id, generation)
+            if warm:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return workflow
+
+    def release(self, workflow, reusable: bool = True) -> None:
+        with self._lock:
+            leased = self._leased.pop(id(workflow), None)
+            if leased is None or not reusable:
+                return
+            problem_id, generation = leased
+            if generation != self._generations.get(problem_id, 0):
+                return
+            self._idle[problem_id] = (time.monotonic(), generation, workflow)
+            self._idle.move_to_end(problem_id)
+            self._evict()
+
+    def _evict(self) -> None:
+        for problem_id in [pid for pid, (released_at, _, _) in self._idle.items() if self._expired(released_at)]:
+            del self._idle[problem_id]
+        while len(self._idle) > self.max_size:
+            problem_id, _ = self._idle.popitem(last=False)
+            logger.debug(f"Evicted warm workflow for problem {problem_id}")
+
+    def invalidate(self, problem_id: int) -> None:
+        with self._lock:
+            self._generations[problem_id] = self._generations.get(problem_id, 0) + 1
+            self._idle.pop(problem_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._idle.clear()
+
+    @asynccontextmanager
+    async def lease(self, problem: Problem) -> AsyncIterator[Any]:
+        """Acquire a workflow for one analysis; it is discarded if the analysis fails."""
+        workflow = await self.acquire(problem)
+        reusable = False
+        try:
+            yield workflow
+            reusable = True
+        finally:
+            self.release(workflow, reusable=reusable)
+
+    def stats(self) -> Dict[str, int]:
+        return {"idle": len(self._idle), "leased": len(self._leased), "hits": self.hits, "misses": self.misses}
+
+
+workflow_pool = WorkflowPool(
+    max_size=settings.WORKFLOW_POOL_MAX_SIZE,
+    ttl_seconds=settings.WORKFLOW_POOL_TTL_SECONDS,
+)
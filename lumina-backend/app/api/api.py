@@ -1,7 +1,8 @@
 from fastapi import APIRouter
-from app.api.endpoints import literature_review, problem  # Add problem import
+from app.api.endpoints import analysis_job, literature_review, problem  # Add problem import
 
 api_router = APIRouter()
 api_router.include_router(literature_review.router, prefix="/literature-reviews", tags=["literature_reviews"])
 api_router.include_router(problem.router, prefix="/problems", tags=["problems"])  # Add this line
+api_router.include_router(analysis_job.router, prefix="/analysis-jobs", tags=["analysis_jobs"])
 # Include other routers as needed
\ No newline at end of file
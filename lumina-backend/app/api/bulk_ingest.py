@@ -0,0 +1,194 @@
+import asyncio
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Set
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.models.consulting import IngestJob, Problem
+from app.schemas.literature_review import LiteratureReviewCreate
+
+FORMATS = ("ndjson", "csv")
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+
+class Record(NamedTuple):
+    line: int
+    data: Optional[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+class RecordParser:
+    """Incremental parser for NDJSON or CSV uploads.
+
+    Bytes are fed as they arrive and complete records come back as soon as
+    their last line is in, so only one record is ever buffered. A CSV record
+    may span lines inside a quoted field; its first line is a header naming
+    the columns. ``line`` is the 1-based line a record starts on.
+    """
+
+    def __init__(self, format: str, max_record_bytes: int = 10 * 1024 * 1024):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported ingest format: {format}")
+        self.format = format
+        self.max_record_bytes = max_record_bytes
+        self._buffer = b""
+        self._line = 0
+        # CSV state: the header, and the lines of a record still inside quotes.
+        self._header: Optional[List[str]] = None
+        self._record: List[str] = []
+        self._record_line = 0
+        self._skipping = False
+
+    def feed(self, chunk: bytes) -> List[Record]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        records = [record for line in lines for record in self._parse_line(line)]
+        if len(self._buffer) > self.max_record_bytes and not self._skipping:
+            # Drop the oversized line instead of buffering it without bound.
+            records.append(Record(self._line + 1, None, f"Record exceeds {self.max_record_bytes} bytes"))
+            self._skipping = True
+        if self._skipping:
+            self._buffer = b""
+        return records
+
+    def close(self) -> List[Record]:
+        records = list(self._parse_line(self._buffer)) if self._buffer else []
+        self._buffer = b""
+        if self._record:
+            records.append(Record(self._record_line, None, "Unterminated quoted field"))
+            self._record = []
+        return records
+
+    def _parse_line(self, raw: bytes) -> Iterator[Record]:
+        self._line += 1
+        if self._skipping:
+            # The tail of a line already reported as oversized.
+            self._skipping = False
+            return
+        try:
+            line = raw.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError:
+            yield Record(self._line, None, "Line is not valid UTF-8")
+            return
+        if self._line == 1:
+            line = line.lstrip("\ufeff")
+        if self.format == "ndjson":
+            yield from self._parse_json(line)
+        else:
+            yield from self._parse_csv(line)
+
+    def _parse_json(self, line: str) -> Iterator[Record]:
+        if not line.strip():
+            return
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield Record(self._line, None, f"Invalid JSON: {e}")
+            return
+        if not isinstance(data, dict):
+            yield Record(self._line, None, "Expected a JSON object")
+            return
+        yield Record(self._line, data)
+
+    def _parse_csv(self, line: str) -> Iterator[Record]:
+        if not self._record:
+            if not line.strip():
+                return
+            self._record_line = self._line
+        self._record.append(line)
+        text = "\n".join(self._record)
+        if len(text) > self.max_record_bytes:
+            self._record = []
+            yield Record(self._record_line, None, f"Record exceeds {self.max_record_bytes} bytes")
+            return
+        # Quotes are balanced once the record is complete; an escaped quote
+        # ("") adds two, so it never changes the parity.
+        if text.count('"') % 2:
+            return
+        self._record = []
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            yield Record(self._record_line, None, f"Invalid CSV: {e}")
+            return
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return
+        if len(values) != len(self._header):
+            yield Record(self._record_line, None, f"Expected {len(self._header)} columns, got {len(values)}")
+            return
+        yield Record(self._record_line, dict(zip(self._header, values)))
+
+
+async def iter_records(chunks: AsyncIterator[bytes], parser: RecordParser) -> AsyncIterator[Record]:
+    async for chunk in chunks:
+        for record in parser.feed(chunk):
+            yield record
+    for record in parser.close():
+        yield record
+
+
+def ingest_batch(db: Session, job: IngestJob, records: List[Record], problem_id: Optional[int], known_problems: Set[int]) -> None:
+    """Validate ``records``, insert the valid ones in one transaction and record progress on ``job``."""
+    errors = [{"line": record.line, "error": record.error} for record in records if record.error is not None]
+    candidates = []
+    for record in records:
+        if record.data is None:
+            continue
+        data = record.data if problem_id is None else {"problem_id": problem_id, **record.data}
+        try:
+            candidates.append((record.line, LiteratureReviewCreate(**data)))
+        except ValidationError as e:
+            errors.append({"line": record.line, "error": "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )})
+
+    unknown = {obj_in.problem_id for _, obj_in in candidates} - known_problems
+    if unknown:
+        known_problems.update(row[0] for row in db.query(Problem.id).filter(Problem.id.in_(unknown)))
+    objs_in = []
+    for line, obj_in in candidates:
+        if obj_in.problem_id in known_problems:
+            objs_in.append(obj_in)
+        else:
+            errors.append({"line": line, "error": f"Problem {obj_in.problem_id} not found"})
+
+    reviews = crud.literature_review.create_many(db, objs_in=objs_in) if objs_in else []
+    crud.ingest_job.record_batch(
+        db,
+        db_obj=job,
+        received=len(records),
+        inserted=len(reviews),
+        errors=sorted(errors, key=lambda error: error["line"]),
+        document_ids=[review.document_id for review in reviews],
+    )
+
+
+async def ingest_stream(
+    db: Session, job: IngestJob, chunks: AsyncIterator[bytes], problem_id: Optional[int] = None
+) -> IngestJob:
+    """Parse an upload as it streams in and insert its reviews batch by batch.
+
+    Validation and the inserts block, so each batch runs in a worker thread
+    while the event loop keeps serving other requests.
+    """
+    parser = RecordParser(job.format, max_record_bytes=settings.BULK_INGEST_MAX_RECORD_BYTES)
+    known_problems: Set[int] = set()
+    batch: List[Record] = []
+    async for record in iter_records(chunks, parser):
+        batch.append(record)
+        if len(batch) >= settings.BULK_INGEST_BATCH_SIZE:
+            await asyncio.to_thread(ingest_batch, db, job, batch, problem_id, known_problems)
+            batch = []
+    if batch:
+        await asyncio.to_thread(ingest_batch, db, job, batch, problem_id, known_problems)
+    return job
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, TypeVar
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.deadline import interruption_stats
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the work it asked for finished."""
+
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable``, cancelling it as soon as the client disconnects.
+
+    A plain (non-streaming) endpoint is not cancelled when its client goes
+    away, so without this an abandoned analysis keeps running to the end.
+    Raises ClientDisconnected after cancelling.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.ANALYSIS_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}; cancelling")
+                interruption_stats.record(disconnected=True)
+                task.cancel()
+                # Let the analysis unwind (and hand back its workflow) first.
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
+
+
+async def relay_until_disconnected(request: Request, messages: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Relay ``messages``, cancelling their producer as soon as the client disconnects.
+
+    Streaming responses only notice a disconnect when their next send fails,
+    which may be long after the client left. Raises ClientDisconnected.
+    """
+    iterator = messages.__aiter__()
+    try:
+        while True:
+            try:
+                yield await run_until_disconnected(request, iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        try:
+            await iterator.aclose()
+        except RuntimeError:
+            # Still unwinding from a cancellation; it finishes on its own.
+            pass
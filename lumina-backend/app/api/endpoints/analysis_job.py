@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Any
+
+from app import crud
+from app.api import deps
+from app.jobs.analysis_queue import analysis_job_queue
+from app.models.consulting import Problem
+from app.schemas.analysis_job import AnalysisJob, AnalysisJobCreate, AnalysisJobResult, AnalysisJobStatus
+
+router = APIRouter()
+
+@router.post("/", response_model=AnalysisJob, status_code=202)
+async def submit_analysis_job(
+    *,
+    db: Session = Depends(deps.get_db),
+    analysis_job_in: AnalysisJobCreate,
+) -> Any:
+    """
+    Queue an analysis of a problem and return the job to poll.
+    """
+    problem = db.query(Problem).filter(Problem.id == analysis_job_in.problem_id).first()
+    if problem is None:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    if analysis_job_in.previous_job_id is not None:
+        previous = crud.analysis_job.get(db=db, id=analysis_job_in.previous_job_id)
+        if previous is None or previous.problem_id != analysis_job_in.problem_id:
+            raise HTTPException(status_code=404, detail="Previous analysis job not found for this problem")
+        if previous.status != AnalysisJobStatus.SUCCEEDED.value:
+            raise HTTPException(status_code=409, detail=f"Previous analysis job is {previous.status}")
+    analysis_job = crud.analysis_job.create(db=db, obj_in=analysis_job_in)
+    analysis_job_queue.submit(analysis_job.id)
+    return analysis_job
+
+@router.get("/{analysis_job_id}", response_model=AnalysisJob)
+def read_analysis_job(
+    analysis_job_id: int,
+    db: Session = Depends(deps.get_db),
+) -> Any:
+    """
+    Get the status of an analysis job.
+    """
+    analysis_job = crud.analysis_job.get(db=db, id=analysis_job_id)
+    if analysis_job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return analysis_job
+
+@router.get("/{analysis_job_id}/result", response_model=AnalysisJobResult)
+def read_analysis_job_result(
+    analysis_job_id: int,
+    db: Session = Depends(deps.get_db),
+) -> Any:
+    """
+    Get the result of a finished analysis job.
+    """
+    analysis_job = crud.analysis_job.get(db=db, id=analysis_job_id)
+    if analysis_job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    if analysis_job.status != AnalysisJobStatus.SUCCEEDED.value:
+        raise HTTPException(status_code=409, detail=f"Analysis job is {analysis_job.status}")
+    return AnalysisJobResult(job_id=analysis_job.id, problem_id=analysis_job.problem_id, result=analysis_job.result)
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import Any, List
+from typing import Any, List, Optional
 
 from app import crud
 from app.api import deps
+from app.api.bulk_ingest import CONTENT_TYPES, FORMATS, ingest_stream
+from app.jobs.ingest_queue import ingest_queue
+from app.models.consulting import Problem
+from app.schemas.ingest_job import IngestJob
 from app.schemas.literature_review import LiteratureReview, LiteratureReviewCreate, LiteratureReviewUpdate
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=LiteratureReview)
 def create_literature_review(
@@ -20,6 +26,52 @@ def create_literature_review(
     literature_review = crud.literature_review.create(db=db, obj_in=literature_review_in)
     return literature_review
 
+@router.post("/bulk", response_model=IngestJob, status_code=202)
+async def bulk_ingest_literature_reviews(
+    request: Request,
+    upload_format: Optional[str] = Query(None, alias="format", description="ndjson or csv; defaults to the Content-Type"),
+    problem_id: Optional[int] = Query(None, description="Problem for rows that do not name one"),
+    db: Session = Depends(deps.get_db),
+) -> Any:
+    """
+    Ingest a streamed NDJSON or CSV upload of literature reviews.
+
+    Rows are inserted in batches as the body arrives; rows that fail validation
+    are counted and reported, not fatal. Embedding runs in the background: poll
+    the returned ingest job for its progress.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    upload_format = upload_format or CONTENT_TYPES.get(content_type)
+    if upload_format not in FORMATS:
+        raise HTTPException(status_code=415, detail="Upload NDJSON or CSV, or pass format=ndjson|csv")
+    if problem_id is not None and db.query(Problem.id).filter(Problem.id == problem_id).first() is None:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    ingest_job = crud.ingest_job.create(db, format=upload_format)
+    try:
+        await ingest_stream(db, ingest_job, request.stream(), problem_id=problem_id)
+    except Exception as e:
+        # Batches committed so far are kept; they are embedded when their
+        # problems' indexes are next loaded.
+        logger.error(f"Bulk ingest {ingest_job.id} failed: {str(e)}")
+        db.rollback()
+        return crud.ingest_job.mark_failed(db, db_obj=ingest_job, error=str(e))
+    ingest_job = crud.ingest_job.mark_embedding(db, db_obj=ingest_job)
+    ingest_queue.submit(ingest_job.id)
+    return ingest_job
+
+@router.get("/bulk/{ingest_job_id}", response_model=IngestJob)
+def read_ingest_job(
+    ingest_job_id: int,
+    db: Session = Depends(deps.get_db),
+) -> Any:
+    """
+    Get the progress of a bulk ingest.
+    """
+    ingest_job = crud.ingest_job.get(db=db, id=ingest_job_id)
+    if ingest_job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return ingest_job
+
 @router.get("/{literature_review_id}", response_model=LiteratureReview)
 def read_literature_review(
     literature_review_id: int,
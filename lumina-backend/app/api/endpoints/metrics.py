@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.ai.index_store import get_problem_index_store
+from app.ai.llm_cache import get_llm_cache
+from app.ai.prompt_packing import prompt_packer
+from app.ai.retrieval import retrieval_stats
+from app.ai.structured_output import structured_output_stats
+from app.ai.sub_question_memo import get_sub_question_memo
+from app.ai.workflow_pool import workflow_pool
+from app.core.deadline import interruption_stats
+from app.core.tracing import metrics_registry
+
+router = APIRouter()
+
+metrics_registry.register_collector("lumina_analysis_interruptions", interruption_stats.stats)
+metrics_registry.register_collector("lumina_ingest", lambda: get_problem_index_store().stats())
+metrics_registry.register_collector("lumina_llm_cache", lambda: get_llm_cache().stats())
+metrics_registry.register_collector("lumina_prompt_packing", prompt_packer.stats)
+metrics_registry.register_collector("lumina_retrieval", retrieval_stats.stats)
+metrics_registry.register_collector("lumina_structured_output", structured_output_stats.stats)
+metrics_registry.register_collector("lumina_sub_question_memo", lambda: get_sub_question_memo().stats())
+metrics_registry.register_collector("lumina_workflow_pool", workflow_pool.stats)
+
+
+@router.get("", response_class=PlainTextResponse)
+def read_metrics() -> PlainTextResponse:
+    """
+    Span histograms and component counters in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,12 +1,16 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
 from app import crud
 from app.schemas.problem import ProblemBase, ProblemCreate, ProblemUpdate
 from app.schemas.literature_review import LiteratureReviewBase, LiteratureReviewCreate, LiteratureReviewUpdate
 from app.schemas.analysis import AnalysisResult, AnalysisRequest
 from app.api.deps import get_db
-from app.ai.multi_step_engine import analyze_problem
+from app.api.disconnect import ClientDisconnected, run_until_disconnected
+from app.ai.multi_step_engine import analyze_problem as run_problem_analysis
+from app.api.streaming import streaming_analysis_response
+from app.core.config import settings
+from app.core.deadline import deadline_after
 from typing import List
 
 router = APIRouter()
@@ -103,16 +107,44 @@ async def delete_literature_review(
 async def analyze_problem(
     problem_id: int,
     analysis_request: AnalysisRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
+    deadline = deadline_after(analysis_request.deadline_seconds or settings.ANALYSIS_DEFAULT_DEADLINE_SECONDS)
     db_problem = crud.problem.get(db, id=problem_id)
     if db_problem is None:
         raise HTTPException(status_code=404, detail="Problem not found")
 
     try:
-        result = await analyze_problem(db_problem, analysis_request.query)
+        result = await run_until_disconnected(
+            request,
+            run_problem_analysis(db_problem, analysis_request.query, use_cache=analysis_request.use_cache, deadline=deadline),
+        )
         logger.info(f"Analysis completed for problem {problem_id}")
         return result
+    except ClientDisconnected:
+        # Nobody is left to read a response; 499 is what the access log shows.
+        return Response(status_code=499)
     except Exception as e:
         logger.error(f"Error during analysis of problem {problem_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred during analysis")
+
+@router.post("/{problem_id}/analyze/stream")
+async def stream_analyze_problem(
+    problem_id: int,
+    analysis_request: AnalysisRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    deadline = deadline_after(analysis_request.deadline_seconds or settings.ANALYSIS_DEFAULT_DEADLINE_SECONDS)
+    db_problem = crud.problem.get(db, id=problem_id)
+    if db_problem is None:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    try:
+        return await streaming_analysis_response(
+            db_problem, analysis_request.query, use_cache=analysis_request.use_cache, deadline=deadline, request=request
+        )
+    except Exception as e:
+        logger.error(f"Error starting streamed analysis of problem {problem_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred during analysis")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.ai.multi_step_engine import ConsultingWorkflow
+from app.ai.workflow_pool import workflow_pool
+from app.api.disconnect import ClientDisconnected, relay_until_disconnected
+from app.models.consulting import Problem
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream until it completes.
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_workflow_events(
+    workflow: ConsultingWorkflow,
+    query: str,
+    use_cache: bool = True,
+    on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Relay ``workflow.astream_analysis`` as SSE messages.
+
+    ``on_complete`` receives the collected ``steps``, ``meta_analysis`` and
+    ``truncated`` flag once the run finishes, so callers can persist results
+    the same way the blocking endpoint does. It runs after the request's DB
+    session has closed, so it must open its own. A run cut short by ``deadline``
+    ends with a ``truncated`` event before ``done``.
+    """
+    steps = []
+    meta_analysis = None
+    truncated = False
+    try:
+        async for event in workflow.astream_analysis(query, use_cache=use_cache, deadline=deadline):
+            if event["event"] == "step":
+                steps.append(event["data"])
+            elif event["event"] == "meta_analysis":
+                meta_analysis = event["data"]
+            elif event["event"] == "truncated":
+                truncated = True
+            yield sse_event(event["event"], event["data"])
+        if on_complete is not None:
+            await on_complete({
+                "steps": sorted(steps, key=lambda step: step["index"]),
+                "meta_analysis": meta_analysis,
+                "truncated": truncated,
+            })
+    except Exception as e:
+        logger.error(f"Error during streamed analysis of problem {workflow.problem.id}: {str(e)}")
+        yield sse_event("error", {"detail": "An error occurred during analysis"})
+        return
+    yield sse_event("done", {})
+
+
+async def streaming_analysis_response(
+    problem: Problem,
+    query: str,
+    use_cache: bool = True,
+    on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    deadline: Optional[float] = None,
+    request: Optional[Request] = None,
+) -> StreamingResponse:
+    # The workflow is acquired before the response starts so that setup
+    # failures surface as a normal HTTP error and the problem's reviews are
+    # read while the request's DB session is still open. It goes back to the
+    # pool only if the stream ran to completion. With ``request``, a client
+    # disconnect cancels the analysis' in-flight work straight away.
+    workflow = await workflow_pool.acquire(problem)
+
+    async def events() -> AsyncIterator[str]:
+        reusable = False
+        messages = stream_workflow_events(workflow, query, use_cache=use_cache, on_complete=on_complete, deadline=deadline)
+        if request is not None:
+            messages = relay_until_disconnected(request, messages)
+        try:
+            async for message in messages:
+                yield message
+            reusable = True
+        except ClientDisconnected:
+            return
+        finally:
+            workflow_pool.release(workflow, reusable=reusable)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +9,67 @@ class Settings(BaseSettings):
     CLERK_SECRET_KEY: str = "test_secret_key"
     CLERK_API_URL: str = "https://api.clerk.dev/v1"
     SQLALCHEMY_DATABASE_URI: str = "sqlite:///./test.db"
+    EMBEDDING_CACHE_PATH: str = "./.cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 100_000
+    INDEX_STORAGE_DIR: str = "./.cache/indexes"
+    INDEX_PERSIST_DELAY_SECONDS: float = 5.0  # 0 writes every change immediately
+    CHUNK_SIZE_TOKENS: int = 1_024
+    CHUNK_OVERLAP_TOKENS: int = 200
+    INGEST_BATCH_SIZE: int = 64
+    BULK_INGEST_BATCH_SIZE: int = 500  # rows per insert transaction
+    BULK_INGEST_INDEX_BATCH_SIZE: int = 256  # documents per index update (and progress step)
+    BULK_INGEST_MAX_RECORD_BYTES: int = 10 * 1024 * 1024
+    BULK_INGEST_MAX_ERRORS: int = 100
+    MINHASH_PERMUTATIONS: int = 128
+    MINHASH_BANDS: int = 32
+    DEDUP_SIMILARITY_THRESHOLD: float = 0.85
+    HYBRID_RETRIEVAL_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20
+    RRF_K: int = 60
+    LEXICAL_FAST_PATH_MAX_TERMS: int = 4  # 0 disables the BM25-only path
+    SUB_QUESTION_CONCURRENCY: int = 4
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "./.cache/llm_responses.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 86_400
+    LLM_CACHE_MEMORY_ENTRIES: int = 256
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_REQUESTS_PER_MINUTE: int = 500  # 0 disables the limit
+    LLM_TOKENS_PER_MINUTE: int = 150_000  # 0 disables the limit
+    LLM_MAX_RETRIES: int = 5
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    PROMPT_TOKEN_BUDGET: int = 6_000  # for models that report no context window
+    PROMPT_OUTPUT_RESERVE_TOKENS: int = 1_024
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    MODEL_TEMPERATURE: float = 0.7
+    MODEL_TIERS: Dict[str, str] = {"premium": "gpt-4", "standard": "gpt-4o", "fast": "gpt-4o-mini"}
+    STAGE_MODEL_TIERS: Dict[str, str] = {
+        "sub_questions": "premium",
+        "structured_output": "fast",
+        "synthesis": "premium",
+        "meta_analysis": "standard",
+    }
+    MODEL_FALLBACK_TIERS: Dict[str, str] = {"premium": "standard", "standard": "fast"}
+    MODEL_HEALTH_WINDOW_SECONDS: float = 300.0
+    MODEL_HEALTH_MIN_SAMPLES: int = 10
+    MODEL_FALLBACK_P95_SECONDS: float = 30.0
+    MODEL_FALLBACK_ERROR_RATE: float = 0.25
+    STRUCTURED_OUTPUT_SCHEMA_MODELS: List[str] = ["gpt-4o", "gpt-4.1", "o1", "o3"]
+    STRUCTURED_OUTPUT_FIELD_RETRIES: int = 1
+    SUB_QUESTION_MEMO_ENABLED: bool = True
+    SUB_QUESTION_MEMO_PATH: str = "./.cache/sub_question_answers.sqlite3"
+    SUB_QUESTION_MEMO_TTL_SECONDS: int = 7 * 86_400
+    SUB_QUESTION_MEMO_SIMILARITY: float = 0.95
+    WORKFLOW_POOL_MAX_SIZE: int = 32
+    WORKFLOW_POOL_TTL_SECONDS: float = 900.0
+    CONTEXT_SUMMARY_BATCH_SIZE: int = 4
+    CONTEXT_MAX_LEAF_SUMMARIES: int = 4
+    CONTEXT_SUMMARY_MAX_WORDS: int = 300
+    CONTEXT_FINDINGS_FLUSH_SIZE: int = 1
+    ANALYSIS_JOB_WORKERS: int = 2
+    ANALYSIS_DEFAULT_DEADLINE_SECONDS: Optional[float] = None  # for analyze requests that set none
+    ANALYSIS_DISCONNECT_POLL_SECONDS: float = 0.5
+    TRACING_ENABLED: bool = True
+    TRACE_OUTPUT_DIR: str = ""  # per-request trace JSON is written here when set
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() deadline of the current analysis. Tasks inherit it
+# when they are created, so it reaches every step of the run.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised by ``bounded`` when the work did not finish before the deadline."""
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """The deadline ``seconds`` from now, never later than the current one."""
+    current = _deadline.get()
+    if seconds is None:
+        return current
+    deadline = time.monotonic() + seconds
+    return deadline if current is None else min(current, deadline)
+
+
+def time_left(deadline: Optional[float] = None) -> Optional[float]:
+    """Seconds until ``deadline`` (default: the current one), or None if there is none."""
+    deadline = _deadline.get() if deadline is None else deadline
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Run the enclosed code under ``deadline``; an earlier enclosing deadline still applies."""
+    current = _deadline.get()
+    if deadline is not None and current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline if deadline is not None else current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def bounded(awaitable: Awaitable[T], deadline: Optional[float] = None) -> T:
+    """Await ``awaitable``, cancelling it if ``deadline`` (default: the current one) passes first.
+
+    Anything the awaitable starts runs under the same deadline.
+    """
+    with deadline_scope(deadline):
+        left = time_left()
+        if left is None:
+            return await awaitable
+        if left <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            elif asyncio.isfuture(awaitable):
+                awaitable.cancel()
+            raise DeadlineExceeded()
+        try:
+            return await asyncio.wait_for(awaitable, left)
+        except asyncio.TimeoutError:
+            if time_left() > 0:
+                # The awaitable's own timeout, not ours.
+                raise
+            raise DeadlineExceeded() from None
+
+
+class InterruptionStats:
+    """Counts of analyses cut short by their deadline or by a client disconnect."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.truncated = 0
+        self.disconnected = 0
+
+    def record(self, truncated: bool = False, disconnected: bool = False) -> None:
+        with self._lock:
+            self.truncated += int(truncated)
+            self.disconnected += int(disconnected)
+
+    def stats(self) -> Dict[str, int]:
+        return {"truncated": self.truncated, "disconnected": self.disconnected}
+
+
+interruption_stats = InterruptionStats()
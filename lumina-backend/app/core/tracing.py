@@ -0,0 +1,374 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default buckets stop at 10s; LLM calls and whole analyses run longer.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: (per-bucket counts, sum, count).
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *values: str) -> None:
+        with self._lock:
+            counts, total, count = self._series.get(values) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._series[values] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    bucket_labels = _format_labels(self.labels, values, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                inf_labels = _format_labels(self.labels, values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf_labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text format.
+
+    Components that already keep their own counters (``stats()`` dicts) are
+    registered as collectors and exported as gauges under a prefix.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, float]]) -> None:
+        self._collectors[prefix] = collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect in sorted(self._collectors.items()):
+            try:
+                stats = collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector {prefix} failed: {str(e)}")
+                continue
+            for key, value in sorted(stats.items()):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    def __init__(self, name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "duration_seconds": round(self.duration, 6),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    def __init__(self, name: str, attributes: Dict[str, Any], keep_spans: bool):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.keep_spans = keep_spans
+        self.spans: List[Span] = []
+
+    def to_dict(self, duration: float) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_seconds": round(duration, 6),
+            "attributes": self.attributes,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("lumina_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("lumina_span", default=None)
+
+
+class Tracer:
+    """Spans for workflow steps, LLM calls, embedding batches, retrieval and DB work.
+
+    Every finished span feeds the duration histogram, token and cache
+    counters. Spans opened inside ``trace()`` are also collected into that
+    trace, which is written as JSON to ``trace_dir`` when it is set. Span
+    context lives in contextvars, so spans opened in tasks spawned by a traced
+    request are attributed to it.
+    """
+
+    def __init__(self, registry: MetricsRegistry, enabled: bool = True, trace_dir: str = ""):
+        self.registry = registry
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.span_seconds = registry.histogram(
+            "lumina_span_duration_seconds", "Duration of traced operations.", ("kind", "name")
+        )
+        self.span_errors = registry.counter(
+            "lumina_span_errors_total", "Traced operations that raised.", ("kind", "name")
+        )
+        self.llm_tokens = registry.counter(
+            "lumina_llm_tokens_total", "LLM tokens by model and direction.", ("model", "type")
+        )
+        self.cache_lookups = registry.counter(
+            "lumina_cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result")
+        )
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+        """Collect the spans of one request or job into a trace."""
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace(name, attributes, keep_spans=bool(self.trace_dir))
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            if trace.keep_spans:
+                self._write(trace, time.perf_counter() - start)
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(name, kind, parent.span_id if parent else None, attributes)
+        if not self.enabled:
+            yield span
+            return
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration = time.perf_counter() - start
+            self._finish(span)
+
+    def record(self, name: str, kind: str, duration: float, status: str = "ok", **attributes: Any) -> None:
+        """Record a span whose start and end were observed by callbacks rather than a ``with`` block."""
+        if not self.enabled:
+            return
+        parent = _current_span.get()
+        span = Span(name, kind, parent.span_id if parent else None, attributes)
+        span.started_at = time.time() - duration
+        span.duration = duration
+        span.status = status
+        self._finish(span)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def current_trace_id(self) -> Optional[str]:
+        trace = _current_trace.get()
+        return trace.trace_id if trace else None
+
+    def record_tokens(self, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """Count LLM tokens and attach them to the current span."""
+        if not self.enabled:
+            return
+        self.llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+        self.llm_tokens.inc(model, "completion", amount=completion_tokens)
+        span = _current_span.get()
+        if span is not None:
+            span.add("prompt_tokens", prompt_tokens)
+            span.add("completion_tokens", completion_tokens)
+
+    def record_cache(self, cache: str, hits: int = 0, misses: int = 0) -> None:
+        """Count cache lookups and attach them to the current span."""
+        if not self.enabled:
+            return
+        if hits:
+            self.cache_lookups.inc(cache, "hit", amount=hits)
+        if misses:
+            self.cache_lookups.inc(cache, "miss", amount=misses)
+        span = _current_span.get()
+        if span is not None:
+            span.add(f"{cache}_cache_hits", hits)
+            span.add(f"{cache}_cache_misses", misses)
+
+    def _finish(self, span: Span) -> None:
+        self.span_seconds.observe(span.duration, span.kind, span.name)
+        if span.status != "ok":
+            self.span_errors.inc(span.kind, span.name)
+        trace = _current_trace.get()
+        if trace is not None and trace.keep_spans:
+            trace.spans.append(span)
+
+    def _write(self, trace: Trace, duration: float) -> None:
+        try:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            path = os.path.join(self.trace_dir, f"{trace.trace_id}.json")
+            with open(path, "w") as f:
+                json.dump(trace.to_dict(duration), f, default=str)
+        except OSError as e:
+            logger.warning(f"Failed to write trace {trace.trace_id}: {str(e)}")
+
+
+def instrument_engine(engine: Any, tracer: "Tracer") -> None:
+    """Record a span for every statement and transaction run on ``engine``."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("lumina_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("lumina_query_start")
+        if starts:
+            operation = statement.split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+            tracer.record("query", "db", time.perf_counter() - starts.pop(), operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("lumina_query_start") if conn is not None else None
+        if starts:
+            tracer.record("query", "db", time.perf_counter() - starts.pop(), status="error")
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.info["lumina_transaction_start"] = time.perf_counter()
+
+    def _end(outcome: str):
+        def listener(conn):
+            start = conn.info.pop("lumina_transaction_start", None)
+            if start is not None:
+                tracer.record("transaction", "db", time.perf_counter() - start, outcome=outcome)
+        return listener
+
+    event.listen(engine, "commit", _end("commit"))
+    event.listen(engine, "rollback", _end("rollback"))
+
+
+class TraceMiddleware:
+    """ASGI middleware that traces each HTTP request, streamed bodies included.
+
+    The trace id is returned in the ``X-Trace-Id`` response header.
+    """
+
+    def __init__(self, app: Any, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        tracer = self.tracer
+        if scope["type"] != "http" or not tracer.enabled or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.trace(f"{scope['method']} {scope['path']}") as trace:
+            status = {"code": 500}
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", trace.trace_id.encode())]
+                await send(message)
+
+            with tracer.span("request", "http", method=scope["method"], path=scope["path"]) as span:
+                await self.app(scope, receive, send_with_trace_id)
+                span.set(status_code=status["code"])
+
+
+metrics_registry = MetricsRegistry()
+tracer = Tracer(metrics_registry, enabled=settings.TRACING_ENABLED, trace_dir=settings.TRACE_OUTPUT_DIR)
@@ -0,0 +1 @@
+from . import analysis_job, ingest_job, literature_document, literature_review, problem
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from sqlalchemy.orm import Session
+from app.models.consulting import AnalysisJob
+from app.schemas.analysis_job import AnalysisJobCreate, AnalysisJobStatus
+
+def create(db: Session, *, obj_in: AnalysisJobCreate) -> AnalysisJob:
+    db_obj = AnalysisJob(**obj_in.dict(), status=AnalysisJobStatus.QUEUED.value)
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def get(db: Session, id: int) -> AnalysisJob:
+    return db.query(AnalysisJob).filter(AnalysisJob.id == id).first()
+
+def get_unfinished(db: Session) -> List[AnalysisJob]:
+    unfinished = [AnalysisJobStatus.QUEUED.value, AnalysisJobStatus.RUNNING.value]
+    return db.query(AnalysisJob).filter(AnalysisJob.status.in_(unfinished)).order_by(AnalysisJob.id).all()
+
+def mark_queued(db: Session, *, db_obj: AnalysisJob) -> AnalysisJob:
+    db_obj.status = AnalysisJobStatus.QUEUED.value
+    db_obj.started_at = None
+    db.commit()
+    return db_obj
+
+def mark_running(db: Session, *, db_obj: AnalysisJob) -> AnalysisJob:
+    db_obj.status = AnalysisJobStatus.RUNNING.value
+    db_obj.started_at = datetime.now(timezone.utc)
+    db.commit()
+    return db_obj
+
+def mark_succeeded(db: Session, *, db_obj: AnalysisJob, result: Dict[str, Any]) -> AnalysisJob:
+    db_obj.status = AnalysisJobStatus.SUCCEEDED.value
+    db_obj.result = result
+    db_obj.finished_at = datetime.now(timezone.utc)
+    db.commit()
+    return db_obj
+
+def mark_failed(db: Session, *, db_obj: AnalysisJob, error: str) -> AnalysisJob:
+    db_obj.status = AnalysisJobStatus.FAILED.value
+    db_obj.error = error
+    db_obj.finished_at = datetime.now(timezone.utc)
+    db.commit()
+    return db_obj
+
+analysis_job = {
+    "create": create,
+    "get": get,
+    "get_unfinished": get_unfinished,
+    "mark_queued": mark_queued,
+    "mark_running": mark_running,
+    "mark_succeeded": mark_succeeded,
+    "mark_failed": mark_failed
+}
@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.consulting import IngestJob, IngestJobDocument
+from app.schemas.ingest_job import IngestJobStatus
+
+def create(db: Session, *, format: str) -> IngestJob:
+    db_obj = IngestJob(
+        format=format,
+        status=IngestJobStatus.RECEIVING.value,
+        rows_received=0,
+        rows_inserted=0,
+        rows_failed=0,
+        errors=[],
+        documents_total=0,
+        documents_embedded=0,
+    )
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def get(db: Session, id: int) -> IngestJob:
+    return db.query(IngestJob).filter(IngestJob.id == id).first()
+
+def get_embedding(db: Session) -> List[IngestJob]:
+    return db.query(IngestJob).filter(IngestJob.status == IngestJobStatus.EMBEDDING.value).order_by(IngestJob.id).all()
+
+def record_batch(db: Session, *, db_obj: IngestJob, received: int, inserted: int, errors: List[Dict[str, Any]], document_ids: List[int]) -> IngestJob:
+    db_obj.rows_received += received
+    db_obj.rows_inserted += inserted
+    db_obj.rows_failed += len(errors)
+    if len(db_obj.errors) < settings.BULK_INGEST_MAX_ERRORS:
+        db_obj.errors = (db_obj.errors + errors)[:settings.BULK_INGEST_MAX_ERRORS]
+    # Reviews sharing a document need it embedded once; only this batch's
+    # documents are looked up, never the job's whole list.
+    batch = list(dict.fromkeys(document_ids))
+    if batch:
+        linked = {
+            row[0] for row in db.query(IngestJobDocument.document_id)
+            .filter(IngestJobDocument.job_id == db_obj.id, IngestJobDocument.document_id.in_(batch))
+        }
+        new = [document_id for document_id in batch if document_id not in linked]
+        db.add_all(IngestJobDocument(job_id=db_obj.id, document_id=document_id) for document_id in new)
+        db_obj.documents_total += len(new)
+    db.commit()
+    return db_obj
+
+def iter_document_batches(db: Session, *, db_obj: IngestJob, skip: int, size: int) -> Iterator[List[int]]:
+    """The job's document ids after the first ``skip``, ``size`` at a time, in upload order."""
+    query = db.query(IngestJobDocument.id, IngestJobDocument.document_id).filter(IngestJobDocument.job_id == db_obj.id).order_by(IngestJobDocument.id)
+    rows = query.offset(skip).limit(size).all()
+    while rows:
+        yield [document_id for _, document_id in rows]
+        # Later batches continue from the last row rather than re-counting an offset.
+        rows = query.filter(IngestJobDocument.id > rows[-1][0]).limit(size).all()
+
+def mark_embedding(db: Session, *, db_obj: IngestJob) -> IngestJob:
+    db_obj.status = IngestJobStatus.EMBEDDING.value
+    db.commit()
+    return db_obj
+
+def mark_progress(db: Session, *, db_obj: IngestJob, documents_embedded: int) -> IngestJob:
+    db_obj.documents_embedded = documents_embedded
+    db.commit()
+    return db_obj
+
+def mark_succeeded(db: Session, *, db_obj: IngestJob) -> IngestJob:
+    db_obj.status = IngestJobStatus.SUCCEEDED.value
+    db_obj.finished_at = datetime.now(timezone.utc)
+    db.commit()
+    return db_obj
+
+def mark_failed(db: Session, *, db_obj: IngestJob, error: str) -> IngestJob:
+    db_obj.status = IngestJobStatus.FAILED.value
+    db_obj.error = error
+    db_obj.finished_at = datetime.now(timezone.utc)
+    db.commit()
+    return db_obj
+
+ingest_job = {
+    "create": create,
+    "get": get,
+    "get_embedding": get_embedding,
+    "record_batch": record_batch,
+    "iter_document_batches": iter_document_batches,
+    "mark_embedding": mark_embedding,
+    "mark_progress": mark_progress,
+    "mark_succeeded": mark_succeeded,
+    "mark_failed": mark_failed
+}
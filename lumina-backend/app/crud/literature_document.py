@@ -0,0 +1,63 @@
+import hashlib
+from typing import Dict, Iterable, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.consulting import LiteratureDocument, LiteratureReview
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def get_by_hash(db: Session, *, content_hash: str) -> Optional[LiteratureDocument]:
+    return db.query(LiteratureDocument).filter(LiteratureDocument.content_hash == content_hash).first()
+
+def get_or_create(db: Session, *, content: str) -> LiteratureDocument:
+    """Return the canonical document for ``content``, adding it if this is its first use.
+
+    The document is flushed but not committed, so it commits with the review
+    that references it.
+    """
+    digest = content_hash(content)
+    db_obj = get_by_hash(db, content_hash=digest)
+    if db_obj is not None:
+        return db_obj
+    try:
+        with db.begin_nested():
+            db_obj = LiteratureDocument(content_hash=digest, content=content)
+            db.add(db_obj)
+    except IntegrityError:
+        # Another request added the same content first.
+        db_obj = get_by_hash(db, content_hash=digest)
+    return db_obj
+
+def get_or_create_many(db: Session, *, contents: Iterable[str]) -> Dict[str, LiteratureDocument]:
+    """Canonical documents for ``contents``, keyed by content hash, resolved in one query.
+
+    New documents are flushed but not committed. Content added concurrently
+    by another session surfaces as an IntegrityError when the caller commits.
+    """
+    by_hash = {content_hash(content): content for content in contents}
+    documents = {
+        db_obj.content_hash: db_obj
+        for db_obj in db.query(LiteratureDocument).filter(LiteratureDocument.content_hash.in_(by_hash))
+    }
+    new = [LiteratureDocument(content_hash=digest, content=content) for digest, content in by_hash.items() if digest not in documents]
+    if new:
+        db.add_all(new)
+        db.flush()
+        documents.update((db_obj.content_hash, db_obj) for db_obj in new)
+    return documents
+
+def remove_if_unreferenced(db: Session, *, id: int) -> bool:
+    if db.query(LiteratureReview.id).filter(LiteratureReview.document_id == id).first() is not None:
+        return False
+    db.query(LiteratureDocument).filter(LiteratureDocument.id == id).delete()
+    db.commit()
+    return True
+
+literature_document = {
+    "content_hash": content_hash,
+    "get_by_hash": get_by_hash,
+    "get_or_create": get_or_create,
+    "get_or_create_many": get_or_create_many,
+    "remove_if_unreferenced": remove_if_unreferenced,
+}
@@ -1,15 +1,110 @@
-from typing import List
+import logging
+from typing import List, Optional, Sequence
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.ai.index_store import get_problem_index_store
+from app.ai.sub_question_memo import get_sub_question_memo
+from app.ai.workflow_pool import workflow_pool
+from app.crud import literature_document
 from app.models.consulting import LiteratureReview
 from app.schemas.literature_review import LiteratureReviewCreate, LiteratureReviewUpdate
 
+logger = logging.getLogger(__name__)
+
+def _invalidate_problems(problem_ids: Sequence[Optional[int]]) -> None:
+    for problem_id in problem_ids:
+        workflow_pool.invalidate(problem_id)
+        if problem_id is None:
+            continue
+        # Stale answers are also unreachable under the new corpus version, so a
+        # failure here only delays freeing them.
+        try:
+            get_sub_question_memo().invalidate(problem_id)
+        except Exception as e:
+            logger.error(f"Failed to invalidate memoised sub-question answers for problem {problem_id}: {str(e)}")
+
+def _ingest_queue():
+    # Imported lazily: the queue's jobs use these CRUD modules.
+    from app.jobs.ingest_queue import ingest_queue
+    return ingest_queue
+
+def _sync_index(review: LiteratureReview, problem_ids: Sequence[Optional[int]]) -> None:
+    # Embedding runs on the ingest queue so the write returns first. Index
+    # maintenance must never fail the write itself; any drift left behind is
+    # reconciled the next time a problem's index is loaded for analysis.
+    _invalidate_problems(problem_ids)
+    if review.document_id is None:
+        return
+    try:
+        queue = _ingest_queue()
+        if queue.running:
+            queue.submit_documents([review.document_id])
+        else:
+            # No app (and so no queue) around this write, e.g. a script.
+            get_problem_index_store().add_document(review.document)
+    except Exception as e:
+        logger.error(f"Failed to update vector index for literature review {review.id}: {str(e)}")
+
+def _release_document(db: Session, document_id: Optional[int]) -> None:
+    # Shared documents are dropped, with their embeddings, once no review uses them.
+    if document_id is None or not literature_document.remove_if_unreferenced(db, id=document_id):
+        return
+    try:
+        queue = _ingest_queue()
+        if queue.running:
+            queue.submit_removals([document_id])
+        else:
+            get_problem_index_store().delete_document(document_id)
+    except Exception as e:
+        logger.error(f"Failed to remove literature document {document_id} from the vector index: {str(e)}")
+
 def create(db: Session, *, obj_in: LiteratureReviewCreate) -> LiteratureReview:
-    db_obj = LiteratureReview(**obj_in.dict())
+    data = obj_in.dict()
+    document = literature_document.get_or_create(db, content=data.pop("content"))
+    db_obj = LiteratureReview(**data, document=document)
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    _sync_index(db_obj, [db_obj.problem_id])
     return db_obj
 
+def _commit_loaded(db: Session) -> None:
+    # Keeps a batch's rows loaded; expiring them would cost a query per row on
+    # the next attribute access.
+    expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+def create_many(db: Session, *, objs_in: Sequence[LiteratureReviewCreate]) -> List[LiteratureReview]:
+    """Insert ``objs_in`` in one transaction, leaving their embedding to the caller.
+
+    Documents are resolved for the whole batch at once. If another session
+    adds one of the same documents first, the batch falls back to resolving
+    them one at a time.
+    """
+    rows = [obj_in.dict() for obj_in in objs_in]
+    try:
+        documents = literature_document.get_or_create_many(db, contents=[row["content"] for row in rows])
+        db_objs = [
+            LiteratureReview(**{key: value for key, value in row.items() if key != "content"},
+                             document=documents[literature_document.content_hash(row["content"])])
+            for row in rows
+        ]
+        db.add_all(db_objs)
+        _commit_loaded(db)
+    except IntegrityError:
+        db.rollback()
+        db_objs = []
+        for row in rows:
+            document = literature_document.get_or_create(db, content=row.pop("content"))
+            db_objs.append(LiteratureReview(**row, document=document))
+        db.add_all(db_objs)
+        _commit_loaded(db)
+    _invalidate_problems({db_obj.problem_id for db_obj in db_objs})
+    return db_objs
+
 def get_multi_by_problem(db: Session, *, problem_id: int) -> List[LiteratureReview]:
     return db.query(LiteratureReview).filter(LiteratureReview.problem_id == problem_id).all()
 
@@ -17,22 +112,37 @@ def get(db: Session, id: int) -> LiteratureReview:
     return db.query(LiteratureReview).filter(LiteratureReview.id == id).first()
 
 def update(db: Session, *, db_obj: LiteratureReview, obj_in: LiteratureReviewUpdate) -> LiteratureReview:
+    previous_problem_id = db_obj.problem_id
+    previous_document_id = db_obj.document_id
     update_data = obj_in.dict(exclude_unset=True)
+    content = update_data.pop("content", None)
+    if content is not None:
+        db_obj.document = literature_document.get_or_create(db, content=content)
     for field, value in update_data.items():
         setattr(db_obj, field, value)
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    _sync_index(db_obj, {previous_problem_id, db_obj.problem_id})
+    if previous_document_id != db_obj.document_id:
+        _release_document(db, previous_document_id)
     return db_obj
 
 def remove(db: Session, *, id: int) -> LiteratureReview:
     obj = db.query(LiteratureReview).get(id)
+    if obj.document is not None:
+        # Detached so the returned review keeps its content even if the
+        # document is dropped below.
+        db.expunge(obj.document)
     db.delete(obj)
     db.commit()
+    _invalidate_problems([obj.problem_id])
+    _release_document(db, obj.document_id)
     return obj
 
 literature_review = {
     "create": create,
+    "create_many": create_many,
     "get_multi_by_problem": get_multi_by_problem,
     "get": get,
     "update": update,
@@ -0,0 +1,52 @@
+import logging
+from sqlalchemy.orm import Session
+from app.ai.index_store import get_problem_index_store
+from app.ai.sub_question_memo import get_sub_question_memo
+from app.ai.workflow_pool import workflow_pool
+from app.models.consulting import Problem
+from app.schemas.problem import ProblemCreate, ProblemUpdate
+
+logger = logging.getLogger(__name__)
+
+def create(db: Session, *, obj_in: ProblemCreate) -> Problem:
+    db_obj = Problem(**obj_in.dict())
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def get(db: Session, id: int) -> Problem:
+    return db.query(Problem).filter(Problem.id == id).first()
+
+def update(db: Session, *, db_obj: Problem, obj_in: ProblemUpdate) -> Problem:
+    update_data = obj_in.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_obj, field, value)
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    # Warm workflows hold the old description; memoised answers and the index
+    # follow it through the problem's content version.
+    workflow_pool.invalidate(db_obj.id)
+    return db_obj
+
+def remove(db: Session, *, id: int) -> Problem:
+    obj = db.query(Problem).get(id)
+    db.delete(obj)
+    db.commit()
+    workflow_pool.invalidate(id)
+    # The problem is gone either way; a failure here only leaves its
+    # description and memoised answers unreachable until cleaned up.
+    try:
+        get_problem_index_store().delete_problem(id)
+        get_sub_question_memo().invalidate(id)
+    except Exception as e:
+        logger.error(f"Failed to remove problem {id} from the vector index: {str(e)}")
+    return obj
+
+problem = {
+    "create": create,
+    "get": get,
+    "update": update,
+    "remove": remove
+}
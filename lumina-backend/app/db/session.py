@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.tracing import instrument_engine, tracer
 
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
+instrument_engine(engine, tracer)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
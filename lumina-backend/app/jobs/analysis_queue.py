@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from app import crud
+from app.ai.multi_step_engine import run_analysis_in_process, run_reanalysis_in_process
+from app.core.config import settings
+from app.core.deadline import deadline_after
+from app.core.tracing import tracer
+from app.db.session import SessionLocal
+from app.models.consulting import Problem
+from app.schemas.analysis_job import AnalysisJobStatus
+
+logger = logging.getLogger(__name__)
+
+
+async def execute_job(job_id: int) -> None:
+    """Run one queued analysis job and record its outcome in the database."""
+    with tracer.trace("analysis_job", job_id=job_id):
+        await _execute_job(job_id)
+
+
+async def _execute_job(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        job = crud.analysis_job.get(db, id=job_id)
+        if job is None or job.status != AnalysisJobStatus.QUEUED.value:
+            return
+        job = crud.analysis_job.mark_running(db, db_obj=job)
+        try:
+            problem = db.query(Problem).filter(Problem.id == job.problem_id).first()
+            if problem is None:
+                raise ValueError(f"Problem {job.problem_id} not found")
+            # Jobs run under the same default deadline as the analysis endpoints.
+            deadline = deadline_after(settings.ANALYSIS_DEFAULT_DEADLINE_SECONDS)
+            if job.previous_job_id is not None:
+                previous = crud.analysis_job.get(db, id=job.previous_job_id)
+                if previous is None or previous.result is None:
+                    raise ValueError(f"Previous analysis job {job.previous_job_id} has no result")
+                result = await run_reanalysis_in_process(problem, job.query, previous.result, use_cache=job.use_cache, deadline=deadline)
+            else:
+                result = await run_analysis_in_process(problem, job.query, use_cache=job.use_cache, deadline=deadline)
+        except Exception as e:
+            logger.error(f"Analysis job {job_id} failed: {str(e)}")
+            crud.analysis_job.mark_failed(db, db_obj=job, error=str(e))
+            return
+        crud.analysis_job.mark_succeeded(db, db_obj=job, result=result)
+        logger.info(f"Analysis job {job_id} completed for problem {job.problem_id}")
+    finally:
+        db.close()
+
+
+class AnalysisJobQueue:
+    """Pool of workers that execute persisted analysis jobs.
+
+    Jobs live in the ``analysis_jobs`` table; the in-memory queue only carries
+    their ids. Workers run on the server's event loop: jobs need the warm
+    workflow pool, index store and caches, which live in this process and are
+    invalidated in memory, so the app must run as a single process. Jobs left
+    queued or running by a previous process are re-enqueued on start.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._recover()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: int) -> None:
+        if self._queue is None:
+            raise RuntimeError("Analysis job queue has not been started")
+        self._queue.put_nowait(job_id)
+
+    def _recover(self) -> None:
+        db = SessionLocal()
+        try:
+            for job in crud.analysis_job.get_unfinished(db):
+                # A job still marked running belonged to a worker that died with
+                # the previous process, so it is safe to run it again.
+                if job.status == AnalysisJobStatus.RUNNING.value:
+                    crud.analysis_job.mark_queued(db, db_obj=job)
+                self.submit(job.id)
+                logger.info(f"Re-enqueued analysis job {job.id}")
+        except Exception as e:
+            logger.error(f"Failed to recover unfinished analysis jobs: {str(e)}")
+        finally:
+            db.close()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await execute_job(job_id)
+            except Exception as e:
+                logger.error(f"Analysis job worker crashed on job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+
+analysis_job_queue = AnalysisJobQueue(workers=settings.ANALYSIS_JOB_WORKERS)
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from app import crud
+from app.ai.index_store import get_problem_index_store
+from app.core.config import settings
+from app.core.tracing import tracer
+from app.db.session import SessionLocal
+from app.models.consulting import LiteratureDocument
+from app.schemas.ingest_job import IngestJobStatus
+
+logger = logging.getLogger(__name__)
+
+
+async def embed_job(job_id: int) -> None:
+    """Index the documents of a bulk ingest job, recording progress as it goes."""
+    with tracer.trace("ingest_job", job_id=job_id):
+        await _embed_job(job_id)
+
+
+async def _embed_job(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        job = crud.ingest_job.get(db, id=job_id)
+        if job is None or job.status != IngestJobStatus.EMBEDDING.value:
+            return
+        try:
+            store = get_problem_index_store()
+            # A job recovered after a restart resumes where its progress stopped.
+            batches = crud.ingest_job.iter_document_batches(
+                db, db_obj=job, skip=job.documents_embedded, size=settings.BULK_INGEST_INDEX_BATCH_SIZE
+            )
+            for batch in batches:
+                documents = db.query(LiteratureDocument).filter(LiteratureDocument.id.in_(batch)).all()
+                # Embedding and persisting block, so they run off the event loop.
+                await asyncio.to_thread(store.add_documents, documents)
+                crud.ingest_job.mark_progress(db, db_obj=job, documents_embedded=job.documents_embedded + len(batch))
+        except Exception as e:
+            logger.error(f"Ingest job {job_id} failed to index its documents: {str(e)}")
+            crud.ingest_job.mark_failed(db, db_obj=job, error=str(e))
+            return
+        crud.ingest_job.mark_succeeded(db, db_obj=job)
+        logger.info(f"Ingest job {job_id} indexed {job.documents_total} documents")
+    finally:
+        db.close()
+
+
+async def index_documents(document_ids: List[int]) -> None:
+    """Index literature documents added or changed by review CRUD."""
+    db = SessionLocal()
+    try:
+        # A document released again since it was queued is no longer in the table.
+        documents = db.query(LiteratureDocument).filter(LiteratureDocument.id.in_(document_ids)).all()
+    finally:
+        db.close()
+    if documents:
+        await asyncio.to_thread(get_problem_index_store().add_documents, documents)
+
+
+async def remove_documents(document_ids: List[int]) -> None:
+    """Drop literature documents that no review references any more from the index."""
+    store = get_problem_index_store()
+    for document_id in document_ids:
+        await asyncio.to_thread(store.delete_document, document_id)
+
+
+class IngestQueue:
+    """Background stage that keeps the corpus index in step with the literature tables.
+
+    Uploads insert their reviews and hand the job id over here, so the upload
+    returns before anything is embedded; single reviews created, changed or
+    deleted through CRUD hand over their documents the same way. One worker
+    runs everything in order: it all writes to the same corpus index. Jobs
+    still embedding when the previous process stopped are resumed on start,
+    and lost single-document updates are reconciled when a problem's index is
+    next loaded.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._worker())
+        self._recover()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def _put(self, work: Callable[[], Awaitable[None]]) -> None:
+        if self._queue is None:
+            raise RuntimeError("Ingest queue has not been started")
+        # Sync CRUD endpoints submit from the threadpool, not the queue's loop.
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, work)
+
+    def submit(self, job_id: int) -> None:
+        self._put(functools.partial(embed_job, job_id))
+
+    def submit_documents(self, document_ids: List[int]) -> None:
+        self._put(functools.partial(index_documents, document_ids))
+
+    def submit_removals(self, document_ids: List[int]) -> None:
+        self._put(functools.partial(remove_documents, document_ids))
+
+    def _recover(self) -> None:
+        db = SessionLocal()
+        try:
+            for job in crud.ingest_job.get_embedding(db):
+                self.submit(job.id)
+                logger.info(f"Re-enqueued ingest job {job.id}")
+        except Exception as e:
+            logger.error(f"Failed to recover unfinished ingest jobs: {str(e)}")
+        finally:
+            db.close()
+
+    async def _worker(self) -> None:
+        while True:
+            work = await self._queue.get()
+            try:
+                await work()
+            except Exception as e:
+                logger.error(f"Ingest worker failed on {work.func.__name__}{work.args}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+
+ingest_queue = IngestQueue()
@@ -2,6 +2,9 @@ from fastapi import FastAPI
 from app.api.api import api_router
 from app.core.config import settings
 from app.ai.deploy_config import setup_workflow_deployment
+from app.ai.index_store import get_problem_index_store
+from app.jobs.analysis_queue import analysis_job_queue
+from app.jobs.ingest_queue import ingest_queue
 import asyncio
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
@@ -12,6 +15,15 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def startup_event():
     # Set up the workflow deployment
     asyncio.create_task(setup_workflow_deployment())
+    await analysis_job_queue.start()
+    await ingest_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await analysis_job_queue.stop()
+    await ingest_queue.stop()
+    # Write index changes still waiting for their batched persist.
+    get_problem_index_store().flush()
 
 if __name__ == "__main__":
     import uvicorn
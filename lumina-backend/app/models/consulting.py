@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -67,13 +67,75 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ARRAY
 from app.db.base_class import Base
 
+class LiteratureDocument(Base):
+    __tablename__ = "literature_documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, unique=True, index=True)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    reviews = relationship("LiteratureReview", back_populates="document")
+
 class LiteratureReview(Base):
     __tablename__ = "literature_reviews"
 
     id = Column(Integer, primary_key=True, index=True)
     problem_id = Column(Integer, ForeignKey("problems.id"))
+    document_id = Column(Integer, ForeignKey("literature_documents.id"), index=True)
     title = Column(String, index=True)
-    content = Column(Text)
     source = Column(String)
 
-    problem = relationship("Problem", back_populates="literature_reviews")
\ No newline at end of file
+    problem = relationship("Problem", back_populates="literature_reviews")
+    # Content lives in a shared, content-addressed document so a paper reused
+    # across problems is stored and embedded once.
+    document = relationship("LiteratureDocument", back_populates="reviews", lazy="joined")
+
+    @property
+    def content(self):
+        return self.document.content if self.document is not None else None
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    problem_id = Column(Integer, ForeignKey("problems.id"), nullable=False, index=True)
+    query = Column(Text, nullable=False)
+    use_cache = Column(Boolean, default=True)
+    # A re-analysis brings this earlier job's result up to date.
+    previous_job_id = Column(Integer, ForeignKey("analysis_jobs.id"), nullable=True)
+    status = Column(String(50), nullable=False, index=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    problem = relationship("Problem")
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    format = Column(String(20), nullable=False)
+    status = Column(String(50), nullable=False, index=True)
+    rows_received = Column(Integer, nullable=False, default=0)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    # The first BULK_INGEST_MAX_ERRORS rejected rows, as {"line", "error"}.
+    errors = Column(JSON, nullable=True)
+    # Distinct documents the inserted reviews reference (see IngestJobDocument).
+    documents_total = Column(Integer, nullable=False, default=0)
+    documents_embedded = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class IngestJobDocument(Base):
+    __tablename__ = "ingest_job_documents"
+    __table_args__ = (UniqueConstraint("job_id", "document_id"),)
+
+    # Rows are embedded in id order, which is the order the upload named them.
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("ingest_jobs.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("literature_documents.id"), nullable=False)
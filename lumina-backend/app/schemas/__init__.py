@@ -1,10 +1,14 @@
 from .literature_review import LiteratureReviewBase, LiteratureReviewCreate, LiteratureReviewUpdate, LiteratureReview
 from .problem import ProblemBase, ProblemCreate, ProblemUpdate, Problem
 from .analysis import AnalysisResult, AnalysisRequest
+from .analysis_job import AnalysisJobStatus, AnalysisJobCreate, AnalysisJob, AnalysisJobResult
+from .ingest_job import IngestJobStatus, IngestJob
 
 # Export all schemas
 __all__ = [
     "LiteratureReviewBase", "LiteratureReviewCreate", "LiteratureReviewUpdate", "LiteratureReview",
     "ProblemBase", "ProblemCreate", "ProblemUpdate", "Problem",
-    "AnalysisResult", "AnalysisRequest"
+    "AnalysisResult", "AnalysisRequest",
+    "AnalysisJobStatus", "AnalysisJobCreate", "AnalysisJob", "AnalysisJobResult",
+    "IngestJobStatus", "IngestJob"
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class AnalysisStep(BaseModel):
@@ -8,6 +8,10 @@ class AnalysisStep(BaseModel):
 class AnalysisResult(BaseModel):
     steps: List[AnalysisStep]
     final_response: str
+    # The deadline passed first; steps holds only those that finished.
+    truncated: bool = False
 
 class AnalysisRequest(BaseModel):
-    query: str
\ No newline at end of file
+    query: str
+    use_cache: bool = True
+    deadline_seconds: Optional[float] = Field(None, gt=0, description="Seconds the analysis may run before returning partial results")
\ No newline at end of file
@@ -0,0 +1,37 @@
+from enum import Enum
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+class AnalysisJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class AnalysisJobCreate(BaseModel):
+    problem_id: int
+    query: str
+    use_cache: bool = True
+    # Re-analyse a succeeded job of the same problem, re-running only the
+    # steps whose retrieved sources changed since.
+    previous_job_id: Optional[int] = None
+
+class AnalysisJob(BaseModel):
+    id: int
+    problem_id: int
+    query: str
+    previous_job_id: Optional[int] = None
+    status: AnalysisJobStatus
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class AnalysisJobResult(BaseModel):
+    job_id: int
+    problem_id: int
+    result: Dict[str, Any]
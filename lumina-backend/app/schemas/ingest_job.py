@@ -0,0 +1,27 @@
+from enum import Enum
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class IngestJobStatus(str, Enum):
+    RECEIVING = "receiving"
+    EMBEDDING = "embedding"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class IngestJob(BaseModel):
+    id: int
+    format: str
+    status: IngestJobStatus
+    rows_received: int
+    rows_inserted: int
+    rows_failed: int
+    errors: List[Dict[str, Any]] = []
+    documents_total: int
+    documents_embedded: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
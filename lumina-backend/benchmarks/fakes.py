@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.base.llms.types import CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+from pydantic import PrivateAttr
+
+# Marker text that identifies each kind of prompt the pipeline sends.
+PROMPT_KINDS = (
+    ("fields", "is missing the fields"),
+    ("structured_output", "generate a structured output"),
+    ("meta_analysis", "Evaluate the following multi-step analysis"),
+    ("summary", "Summarise the following analysis segments"),
+    ("summary", "Merge the existing summary"),
+    ("sub_questions", "sub_question"),
+)
+
+
+def prompt_kind(prompt: str) -> str:
+    for kind, marker in PROMPT_KINDS:
+        if marker in prompt:
+            return kind
+    return "answer"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+
+
+class FakeLLM(CustomLLM):
+    """Deterministic local stand-in for the completion API.
+
+    Each prompt kind gets a well-formed answer of the shape the pipeline
+    expects, after ``latency`` seconds plus ``latency_per_1k_tokens`` for every
+    thousand prompt tokens (approximated from characters). Calls are counted
+    per kind.
+    """
+
+    model: str = "fake-llm"
+    temperature: float = 0.0
+    latency: float = 0.05
+    latency_per_1k_tokens: float = 0.0
+    sub_questions: int = 4
+    context_window: int = 16_384
+
+    _calls: Counter = PrivateAttr(default_factory=Counter)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=self.context_window, num_output=1024, model_name=self.model)
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return dict(self._calls)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+    def _delay(self, prompt: str) -> float:
+        return self.latency + self.latency_per_1k_tokens * len(prompt) / 4000
+
+    def _answer(self, prompt: str) -> str:
+        kind = prompt_kind(prompt)
+        with self._lock:
+            self._calls[kind] += 1
+        digest = _digest(prompt)
+        if kind == "sub_questions":
+            items = [
+                {"sub_question": f"Aspect {i} of the problem ({digest})", "tool_name": "problem_context"}
+                for i in range(self.sub_questions)
+            ]
+            return f"```json\n{json.dumps(items)}\n```"
+        if kind == "structured_output":
+            return json.dumps({
+                "key_findings": [f"Finding {digest}"],
+                "relevant_data": {"source": digest},
+                "next_steps": ["Validate with the client"],
+                "confidence_score": 0.7,
+                "critical_assumptions": ["Data is representative"],
+                "required_data": ["Quarterly figures"],
+                "external_review_required": False,
+            })
+        if kind == "fields":
+            return json.dumps({"confidence_score": 0.7})
+        if kind == "meta_analysis":
+            return json.dumps({
+                "coherence_score": 0.8,
+                "consistency_score": 0.8,
+                "quality_score": 0.8,
+                "improvement_suggestions": ["Quantify the main risks"],
+                "critical_path": ["Aspect 0 of the problem"],
+            })
+        return f"Deterministic answer {digest}."
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self._delay(prompt))
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        await asyncio.sleep(self._delay(prompt))
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        yield self.complete(prompt, formatted=formatted, **kwargs)
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Deterministic hash-based embeddings with simulated per-request latency."""
+
+    model_name: str = "fake-embedding"
+    dimensions: int = 64
+    latency: float = 0.02
+
+    _requests: int = PrivateAttr(default=0)
+    _texts: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return {"requests": self._requests, "texts": self._texts}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests = 0
+            self._texts = 0
+
+    def _vectors(self, texts: List[str]) -> List[Embedding]:
+        with self._lock:
+            self._requests += 1
+            self._texts += len(texts)
+        vectors = []
+        for text in texts:
+            seed = hashlib.sha256(text.encode("utf-8")).digest()
+            raw = (seed * (self.dimensions // len(seed) + 1))[:self.dimensions]
+            vectors.append([byte / 255.0 - 0.5 for byte in raw])
+        return vectors
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._get_text_embedding(query)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        time.sleep(self.latency)
+        return self._vectors(texts)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        await asyncio.sleep(self.latency)
+        return self._vectors(texts)
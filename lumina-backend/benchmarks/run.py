@@ -0,0 +1,215 @@
+"""
+Offline end-to-end benchmarks for the analysis pipeline.
+
+Drives ConsultingWorkflow directly and through the blocking and streaming
+analyze endpoints, with deterministic local stand-ins for the LLM and
+embedding APIs, and reports per-stage wall time, call counts and throughput.
+
+    python -m benchmarks.run                      # run and compare to the baseline
+    python -m benchmarks.run --save-baseline      # record a new baseline
+    python -m benchmarks.run --sizes small --latency 0.2 --repeats 5
+
+Exits non-zero when a metric regresses past ``--tolerance`` against the
+baseline. Timings scale with ``--latency``; compare runs with the same
+settings as the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+QUERY = "What are the main levers to improve this client's margins?"
+
+
+def configure_environment(workdir: str) -> None:
+    """Point settings at a scratch database and caches. Must run before ``app`` is imported."""
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embeddings.sqlite3")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_responses.sqlite3")
+    os.environ["SUB_QUESTION_MEMO_PATH"] = os.path.join(workdir, "sub_question_answers.sqlite3")
+    os.environ["INDEX_STORAGE_DIR"] = os.path.join(workdir, "indexes")
+    # Provider quotas do not apply to the stand-ins and would only add noise.
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = "0"
+    os.environ["LLM_TOKENS_PER_MINUTE"] = "0"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+
+def install_fakes(latency: float, embed_latency: float):
+    from app.ai.model_factory import AIModelFactory
+    from app.core.config import settings
+    from benchmarks.fakes import FakeEmbedding, FakeLLM
+
+    llm = FakeLLM(latency=latency)
+    embed_model = FakeEmbedding(latency=embed_latency)
+    for model_name in set(settings.MODEL_TIERS.values()):
+        AIModelFactory.register(model_name, llm)
+    AIModelFactory.register(settings.EMBEDDING_MODEL, embed_model)
+    return llm, embed_model
+
+
+def summarise(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mean of every timing and call count over ``runs``."""
+    summary: Dict[str, Any] = {}
+    for section in ("seconds", "llm_calls", "embedding"):
+        keys = sorted({key for run in runs for key in run.get(section, {})})
+        summary[section] = {
+            key: round(statistics.mean(run.get(section, {}).get(key, 0) for run in runs), 4) for key in keys
+        }
+    return summary
+
+
+async def bench_workflow(problem, llm, embed_model, repeats: int) -> Dict[str, Any]:
+    from llama_index.core.workflow import Event
+    from app.ai.workflow_pool import workflow_pool
+
+    runs = []
+    for _ in range(repeats):
+        llm.reset()
+        embed_model.reset()
+        seconds = {}
+        start = time.perf_counter()
+        async with workflow_pool.lease(problem) as workflow:
+            seconds["setup"] = time.perf_counter() - start
+            mark = time.perf_counter()
+            generated = await workflow.generate_sub_questions(Event(payload={"query": QUERY}))
+            seconds["sub_questions"] = time.perf_counter() - mark
+            mark = time.perf_counter()
+            processed = await workflow.process_sub_questions(Event(payload={**generated, "use_cache": False}))
+            seconds["structured_output"] = time.perf_counter() - mark
+            mark = time.perf_counter()
+            await workflow.perform_meta_analysis(Event(payload={**processed, "use_cache": False}))
+            seconds["meta_analysis"] = time.perf_counter() - mark
+        seconds["total"] = time.perf_counter() - start
+        runs.append({"seconds": seconds, "llm_calls": llm.calls, "embedding": embed_model.calls})
+    return summarise(runs)
+
+
+async def bench_endpoint(client, path: str, problem_id: int, llm, embed_model, repeats: int, concurrency: int, stream: bool) -> Dict[str, Any]:
+    url = f"/api/v1/problems/{problem_id}/{path}"
+
+    async def request(index: int) -> Dict[str, float]:
+        body = {"query": f"{QUERY} ({index})", "use_cache": False}
+        start = time.perf_counter()
+        response = await client.post(url, json=body)
+        response.raise_for_status()
+        # The in-process transport buffers the whole body, so only the total is measurable.
+        if stream and "event: error" in response.text:
+            raise RuntimeError(f"Streamed analysis failed: {response.text.strip()}")
+        return {"total": time.perf_counter() - start}
+
+    runs = []
+    for repeat in range(repeats):
+        llm.reset()
+        embed_model.reset()
+        runs.append({"seconds": await request(repeat), "llm_calls": llm.calls, "embedding": embed_model.calls})
+    summary = summarise(runs)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(repeats + index) for index in range(concurrency)))
+    summary["throughput_per_second"] = round(concurrency / (time.perf_counter() - start), 4)
+    return summary
+
+
+async def run(sizes: List[str], latency: float, embed_latency: float, repeats: int, concurrency: int) -> Dict[str, Any]:
+    import httpx
+    from app.db.base_class import Base
+    from app.db.session import SessionLocal, engine
+    from benchmarks.seeds import PROBLEM_SIZES, seed_problem
+    from main import app
+
+    llm, embed_model = install_fakes(latency, embed_latency)
+    Base.metadata.create_all(bind=engine)
+    results: Dict[str, Any] = {}
+    db = SessionLocal()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+            for size in sizes:
+                llm.sub_questions = PROBLEM_SIZES[size]["sub_questions"]
+                # Each scenario gets its own problem so no scenario starts warm from another.
+                problems = {scenario: seed_problem(db, size, seed=index) for index, scenario in enumerate(("workflow", "analyze", "analyze_stream"))}
+                results[f"workflow/{size}"] = await bench_workflow(problems["workflow"], llm, embed_model, repeats)
+                results[f"analyze/{size}"] = await bench_endpoint(client, "analyze", problems["analyze"].id, llm, embed_model, repeats, concurrency, stream=False)
+                results[f"analyze_stream/{size}"] = await bench_endpoint(client, "analyze/stream", problems["analyze_stream"].id, llm, embed_model, repeats, concurrency, stream=True)
+    finally:
+        db.close()
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of ``results`` against ``baseline``: slower timings, lower throughput, more calls."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        for stage, seconds in result["seconds"].items():
+            before = reference["seconds"].get(stage)
+            if before and seconds > before * (1 + tolerance):
+                regressions.append(f"{name} {stage}: {before:.3f}s -> {seconds:.3f}s")
+        before = reference.get("throughput_per_second")
+        after = result.get("throughput_per_second")
+        if before and after is not None and after < before * (1 - tolerance):
+            regressions.append(f"{name} throughput: {before:.2f}/s -> {after:.2f}/s")
+        for section in ("llm_calls", "embedding"):
+            for key, count in result[section].items():
+                before = reference[section].get(key)
+                if before is not None and count > before:
+                    regressions.append(f"{name} {section}.{key}: {before} -> {count}")
+    return regressions
+
+
+def report(results: Dict[str, Any]) -> None:
+    for name, result in results.items():
+        stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in result["seconds"].items())
+        calls = ", ".join(f"{kind} {count:g}" for kind, count in result["llm_calls"].items())
+        line = f"{name:<24} {stages} | llm: {calls} | embedding requests: {result['embedding'].get('requests', 0):g}"
+        if "throughput_per_second" in result:
+            line += f" | {result['throughput_per_second']:.2f} analyses/s"
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="small,medium,large", help="comma-separated problem sizes")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="simulated seconds per embedding request")
+    parser.add_argument("--repeats", type=int, default=3, help="sequential runs per scenario; the first is cold")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent requests for the throughput run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a timing counts as a regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="lumina-bench-")
+    configure_environment(workdir)
+    config = {"latency": args.latency, "embed_latency": args.embed_latency, "repeats": args.repeats, "concurrency": args.concurrency}
+    results = asyncio.run(run(args.sizes.split(","), args.latency, args.embed_latency, args.repeats, args.concurrency))
+    report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"Warning: baseline was recorded with {baseline.get('config')}, this run used {config}")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
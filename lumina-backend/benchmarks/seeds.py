@@ -0,0 +1,54 @@
+import random
+from typing import Dict
+
+from sqlalchemy.orm import Session
+
+from app.crud import literature_document
+from app.models.consulting import LiteratureReview, Problem
+
+# reviews: literature reviews attached to the problem; review_words: words per
+# review; sub_questions: sub questions the stand-in LLM generates per query.
+PROBLEM_SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"reviews": 2, "review_words": 200, "sub_questions": 2},
+    "medium": {"reviews": 10, "review_words": 600, "sub_questions": 4},
+    "large": {"reviews": 40, "review_words": 1500, "sub_questions": 8},
+}
+
+VOCABULARY = (
+    "market revenue cost margin supplier logistics customer churn pricing demand forecast "
+    "capacity regulation risk inventory channel segment growth retention acquisition "
+    "benchmark efficiency network warehouse procurement contract strategy portfolio"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(VOCABULARY) for _ in range(length)).capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def seed_problem(db: Session, size: str, seed: int = 0) -> Problem:
+    """Insert a problem of ``size`` with deterministic literature reviews."""
+    spec = PROBLEM_SIZES[size]
+    rng = random.Random(f"{size}:{seed}")
+    problem = Problem(
+        title=f"Benchmark problem ({size})",
+        description=_text(rng, 80),
+        client="Benchmark client",
+        status="New",
+    )
+    db.add(problem)
+    db.flush()
+    for index in range(spec["reviews"]):
+        db.add(LiteratureReview(
+            problem_id=problem.id,
+            title=f"Review {index}",
+            document=literature_document.get_or_create(db, content=_text(rng, spec["review_words"])),
+            source="benchmark",
+        ))
+    db.commit()
+    db.refresh(problem)
+    return problem
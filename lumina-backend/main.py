@@ -6,7 +6,12 @@ This file sets up the FastAPI application and includes the API router.
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api import api_router
+from app.ai.index_store import get_problem_index_store
+from app.api.endpoints import metrics
 from app.core.config import settings
+from app.core.tracing import TraceMiddleware, tracer
+from app.jobs.analysis_queue import analysis_job_queue
+from app.jobs.ingest_queue import ingest_queue
 import uvicorn
 import os
 
@@ -22,9 +27,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+app.add_middleware(TraceMiddleware, tracer=tracer)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# Served outside the API prefix, where Prometheus scrapers expect it.
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+
+@app.on_event("startup")
+async def start_analysis_job_queue():
+    await analysis_job_queue.start()
+
+@app.on_event("startup")
+async def start_ingest_queue():
+    await ingest_queue.start()
+
+@app.on_event("shutdown")
+async def stop_analysis_job_queue():
+    await analysis_job_queue.stop()
+
+@app.on_event("shutdown")
+async def stop_ingest_queue():
+    await ingest_queue.stop()
+
+@app.on_event("shutdown")
+async def flush_index_store():
+    # Runs after the queues stop. Writes index changes still waiting for their
+    # batched persist; load() would not bring back pending deletes.
+    get_problem_index_store().flush()
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -38,4 +69,8 @@ if __name__ == "__main__":
 # - HOST: The host to run the server on (default: 0.0.0.0)
 # - PORT: The port to run the server on (default: 8000)
 # - DATABASE_URL: The URL for your database connection
-# - SECRET_KEY: A secret key for security purposes
\ No newline at end of file
+# - SECRET_KEY: A secret key for security purposes
+# - ANALYSIS_JOB_WORKERS: Number of concurrent analysis jobs
+#   Run a single server process (no uvicorn --workers): the warm workflow pool,
+#   index store and caches are per process and invalidated in memory.
+# - TRACE_OUTPUT_DIR: Directory for per-request trace JSON (unset disables trace files; /metrics is always served)
\ No newline at end of file
@@ -37,10 +37,6 @@ class AsyncMockWithAttributes(AsyncMock):
         super().__init__(*args, **kwargs)
         self.__dict__.update(kwargs)
 
-sys.modules['app.ai.multi_step_engine'] = AsyncMockWithAttributes(
-    query=AsyncMock(),
-    generate_structured_output_async=AsyncMock()
-)
 sys.modules['app.crud'] = AsyncMockWithAttributes()
 sys.modules['app.crud.crud'] = AsyncMockWithAttributes()
 
@@ -0,0 +1,19 @@
+from benchmarks.run import compare
+
+
+def _result(total, throughput, answers):
+    return {"seconds": {"total": total}, "llm_calls": {"answer": answers}, "embedding": {"requests": 2}, "throughput_per_second": throughput}
+
+
+def test_compare_flags_slower_timings_lower_throughput_and_extra_calls():
+    baseline = {"results": {"analyze/small": _result(1.0, 4.0, 3)}}
+    assert compare({"analyze/small": _result(1.1, 3.9, 3)}, baseline, tolerance=0.25) == []
+    regressions = compare({"analyze/small": _result(1.5, 2.0, 4)}, baseline, tolerance=0.25)
+    assert len(regressions) == 3
+    assert any("total" in r for r in regressions)
+    assert any("throughput" in r for r in regressions)
+    assert any("llm_calls.answer" in r for r in regressions)
+
+
+def test_compare_ignores_scenarios_missing_from_the_baseline():
+    assert compare({"analyze/large": _result(9.0, 0.1, 99)}, {"results": {}}, tolerance=0.25) == []
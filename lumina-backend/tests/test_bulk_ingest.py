@@ -0,0 +1,53 @@
+import pytest
+from app.api.bulk_ingest import Record, RecordParser
+
+def parse(parser, chunks):
+    records = []
+    for chunk in chunks:
+        records.extend(parser.feed(chunk))
+    return records + parser.close()
+
+def test_ndjson_records_span_chunk_boundaries():
+    body = b'{"problem_id": 1, "title": "A", "content": "x"}\n\n{"problem_id": 1, "title": "B", "content": "y"}'
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+    records = parse(RecordParser("ndjson"), chunks)
+    assert records == [
+        Record(1, {"problem_id": 1, "title": "A", "content": "x"}),
+        Record(3, {"problem_id": 1, "title": "B", "content": "y"}),
+    ]
+
+def test_invalid_ndjson_lines_are_reported_and_skipped():
+    records = parse(RecordParser("ndjson"), [b'{"title": "A"}\nnot json\n[1, 2]\n\xff\n{"title": "B"}\n'])
+    assert [record.data for record in records if record.error is None] == [{"title": "A"}, {"title": "B"}]
+    assert [record.line for record in records if record.error is not None] == [2, 3, 4]
+
+def test_csv_quoted_fields_may_span_lines():
+    body = b'\xef\xbb\xbfproblem_id,title,content\r\n1,"Study, part 1","Line one\nsaid ""hello""\nline three"\r\n2,Plain,Text\r\n'
+    chunks = [body[i:i + 5] for i in range(0, len(body), 5)]
+    records = parse(RecordParser("csv"), chunks)
+    assert records == [
+        Record(2, {"problem_id": "1", "title": "Study, part 1", "content": 'Line one\nsaid "hello"\nline three'}),
+        Record(5, {"problem_id": "2", "title": "Plain", "content": "Text"}),
+    ]
+
+def test_csv_rows_with_the_wrong_column_count_are_reported():
+    records = parse(RecordParser("csv"), [b"problem_id,title,content\n1,Only two\n1,T,C\n"])
+    assert records[0].line == 2 and records[0].error is not None
+    assert records[1] == Record(3, {"problem_id": "1", "title": "T", "content": "C"})
+
+def test_unterminated_csv_field_is_reported_on_close():
+    records = parse(RecordParser("csv"), [b'title,content\nT,"never closed\n'])
+    assert records == [Record(2, None, "Unterminated quoted field")]
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_oversized_records_are_dropped_without_buffering(format):
+    parser = RecordParser(format, max_record_bytes=16)
+    header = [b"title\n"] if format == "csv" else []
+    line = b'{"title": "ok"}\n' if format == "ndjson" else b"ok\n"
+    records = parse(parser, header + [b"x" * 10, b"x" * 10, b"x" * 10, b"\n", line])
+    assert [record.error is not None for record in records] == [True, False]
+    assert parser._buffer == b""
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        RecordParser("xml")
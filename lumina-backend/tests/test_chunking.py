@@ -0,0 +1,64 @@
+import numpy as np
+
+from app.ai.chunking import ChunkDeduplicator, MinHasher, iter_chunks
+
+SENTENCES = [f"Sentence number {i} talks about freight routing and depot {i}." for i in range(40)]
+TEXT = " ".join(SENTENCES)
+
+def test_iter_chunks_respects_size_and_overlap():
+    chunks = list(iter_chunks(TEXT, size=30, overlap=10))
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 30 for chunk in chunks)
+    # The last sentence of one chunk opens the next one.
+    assert chunks[1].startswith(chunks[0].split(". ")[-1])
+    assert chunks[-1].endswith(SENTENCES[-1])
+
+def test_iter_chunks_splits_long_sentences():
+    chunks = list(iter_chunks(" ".join(["word"] * 95), size=40))
+    assert [len(chunk.split()) for chunk in chunks] == [40, 40, 15]
+
+def test_iter_chunks_measures_with_length_function():
+    chunks = list(iter_chunks(TEXT, size=100, length=len))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+def test_iter_chunks_is_lazy():
+    chunks = iter_chunks(TEXT, size=30)
+    assert next(chunks)
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=128)
+    words = TEXT.lower().replace(".", "").split()
+    base = hasher.signature(" ".join(words))
+    assert np.array_equal(base, MinHasher(num_perm=128).signature(" ".join(words)))
+    similar = hasher.signature(" ".join(words[:-3]))
+    different = hasher.signature("completely unrelated text about marketing budgets and brand awareness")
+    assert np.mean(base == similar) > 0.9
+    assert np.mean(base == different) < 0.1
+
+def make_dedup():
+    return ChunkDeduplicator(MinHasher(num_perm=64), bands=16, threshold=0.8)
+
+def test_deduplicator_drops_exact_and_near_duplicates():
+    dedup = make_dedup()
+    assert dedup.admit("a", "a-0", TEXT) is None
+    assert dedup.admit("b", "b-0", TEXT.upper()) == ("exact", "a-0")
+    near = TEXT.replace("depot 39", "depot thirty-nine")
+    assert dedup.admit("a", "a-1", near) == ("near", "a-0")
+    # Another document's near duplicate differs in content, so it is kept.
+    assert dedup.admit("c", "c-0", near) is None
+    assert dedup.admit("d", "d-0", "Warehouse automation lowers picking costs.") is None
+    assert dedup.stats() == {"chunks_kept": 3, "exact_duplicates": 1, "near_duplicates": 1}
+
+def test_remove_doc_returns_dependents(tmp_path):
+    dedup = make_dedup()
+    dedup.admit("a", "a-0", TEXT)
+    dedup.admit("b", "b-0", TEXT)
+    path = str(tmp_path / "dedup.npz")
+    dedup.save(path)
+
+    reloaded = make_dedup()
+    reloaded.load(path)
+    assert reloaded.admit("c", "c-0", TEXT).kind == "exact"
+    assert reloaded.remove_doc("a") == {"b", "c"}
+    assert reloaded.admit("b", "b-0", TEXT) is None
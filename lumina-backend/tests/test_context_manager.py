@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from app.ai.context_manager import ContextManager
+
+class FakeSegmentOutput:
+    def __init__(self, finding):
+        self.key_findings = [finding]
+
+    def json(self):
+        return f'{{"key_findings": ["{self.key_findings[0]}"]}}'
+
+@pytest.fixture
+def llm():
+    Settings.embed_model = MockEmbedding(embed_dim=4)
+    # A sync-only client, which the executor runs in a worker thread.
+    llm = MagicMock(spec=["complete"])
+    llm.complete.side_effect = lambda prompt: f"summary {llm.complete.call_count}"
+    return llm
+
+@pytest.mark.asyncio
+async def test_segments_are_summarised_in_batches(llm):
+    context_manager = ContextManager(SimpleNamespace(llm=llm), batch_size=3, max_leaf_summaries=10)
+
+    await context_manager.aupdate_context_batch([FakeSegmentOutput(f"finding {i}") for i in range(7)])
+    assert llm.complete.call_count == 2
+    assert len(context_manager._pending) == 1
+
+    await context_manager.aflush()
+    assert llm.complete.call_count == 3
+    assert context_manager.leaf_summaries == ["summary 1", "summary 2", "summary 3"]
+
+@pytest.mark.asyncio
+async def test_leaf_summaries_roll_up_into_bounded_root(llm):
+    context_manager = ContextManager(SimpleNamespace(llm=llm), batch_size=1, max_leaf_summaries=2)
+
+    for i in range(5):
+        await context_manager.aupdate_context(FakeSegmentOutput(f"finding {i}"))
+
+    assert len(context_manager.leaf_summaries) <= 2
+    assert context_manager.root_summary.startswith("summary")
+    assert context_manager.running_summary.startswith(context_manager.root_summary)
+    # Each prompt carries at most the root and a bounded number of leaves.
+    longest_prompt = max(len(call.args[0]) for call in llm.complete.call_args_list)
+    assert longest_prompt < 1000
+
+@pytest.mark.asyncio
+async def test_findings_are_embedded_in_one_batch_and_flushed_before_queries(llm):
+    embed_model = MockEmbedding(embed_dim=4)
+    Settings.embed_model = embed_model
+    context_manager = ContextManager(SimpleNamespace(llm=llm), batch_size=10, findings_flush_size=5)
+
+    async def embed_texts(self, texts):
+        return [[0.1] * 4 for _ in texts]
+
+    with patch.object(MockEmbedding, "_aget_text_embeddings", autospec=True, side_effect=embed_texts) as embed:
+        await context_manager.aupdate_context_batch([FakeSegmentOutput(f"finding {i}") for i in range(3)])
+        assert embed.call_count == 0
+
+        await context_manager.aupdate_context_batch([FakeSegmentOutput(f"finding {i}") for i in range(3, 6)])
+        assert embed.call_count == 1
+        assert len(embed.call_args.args[1]) == 6
+
+        await context_manager.aupdate_context(FakeSegmentOutput("late finding"))
+        await context_manager.aflush()
+        assert embed.call_count == 2
+        assert len(context_manager.memory_index.docstore.docs) == 7
+
+@pytest.mark.asyncio
+async def test_findings_stay_buffered_until_flushed_when_requested(llm):
+    context_manager = ContextManager(SimpleNamespace(llm=llm), batch_size=10, findings_flush_size=1)
+
+    for i in range(3):
+        await context_manager.aupdate_context(FakeSegmentOutput(f"finding {i}"), flush_findings=False)
+    assert len(context_manager._pending_findings) == 3
+    assert context_manager.memory_index.docstore.docs == {}
+
+    await context_manager.aflush_findings()
+    assert len(context_manager.memory_index.docstore.docs) == 3
+
+@pytest.mark.asyncio
+async def test_saved_session_loads_vectors_mapped_and_saves_incrementally(llm, tmp_path):
+    path = str(tmp_path / "session")
+    context_manager = ContextManager(SimpleNamespace(llm=llm), batch_size=2, embed_model=MockEmbedding(embed_dim=4))
+    await context_manager.aupdate_context_batch([FakeSegmentOutput(f"finding {i}") for i in range(3)])
+    context_manager.save_context(path)
+
+    restored = ContextManager(SimpleNamespace(llm=llm), batch_size=2, embed_model=MockEmbedding(embed_dim=4))
+    restored.load_context(path)
+    assert restored.leaf_summaries == context_manager.leaf_summaries
+    assert restored._pending == context_manager._pending
+    # Nothing is copied into the index until the memory is used.
+    assert isinstance(restored._unloaded.vectors, np.memmap)
+    assert len(restored.memory_index.docstore.docs) == 0
+
+    log_size = os.path.getsize(os.path.join(path, "records.log"))
+    await restored.aupdate_context(FakeSegmentOutput("finding 3"))
+    assert len(restored.memory_index.docstore.docs) == 4
+    restored.save_context(path)
+    assert os.path.getsize(os.path.join(path, "records.log")) > log_size
+
+    reloaded = ContextManager(SimpleNamespace(llm=llm), embed_model=MockEmbedding(embed_dim=4))
+    reloaded.load_context(path)
+    assert reloaded._unloaded.texts == [f"finding {i}" for i in range(4)]
+    assert reloaded._unloaded.vectors.shape == (4, 4)
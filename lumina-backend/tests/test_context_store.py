@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.ai.context_store import ContextState, ContextStore
+
+
+def _state(summary):
+    return ContextState(summary, ["leaf"], ['{"key_findings": []}'], ["pending finding"])
+
+
+def test_round_trip_maps_vectors_without_copying(tmp_path):
+    store = ContextStore(str(tmp_path / "ctx"))
+    store.clear()
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    store.append(["a", "b", "c"], ["alpha", "beta", "gamma"], vectors, _state("root"))
+
+    stored = ContextStore(store.path).load()
+    assert stored.node_ids == ["a", "b", "c"]
+    assert stored.texts == ["alpha", "beta", "gamma"]
+    assert stored.state == _state("root")
+    assert isinstance(stored.vectors, np.memmap)
+    np.testing.assert_array_equal(stored.vectors, vectors)
+
+
+def test_torn_tail_is_discarded_and_appends_continue(tmp_path):
+    store = ContextStore(str(tmp_path / "ctx"))
+    store.clear()
+    store.append(["a"], ["alpha"], np.ones((1, 2)), _state("one"))
+    with open(store.log_path, "ab") as f:
+        f.write(b"\x01\xff\x00\x00\x00partial")
+
+    reopened = ContextStore(store.path)
+    assert reopened.load().node_ids == ["a"]
+    reopened.append(["b"], ["beta"], np.full((1, 2), 2.0), None)
+
+    stored = ContextStore(store.path).load()
+    assert stored.node_ids == ["a", "b"]
+    np.testing.assert_array_equal(stored.vectors[1], [2.0, 2.0])
+
+
+def test_superseded_states_are_compacted(tmp_path):
+    store = ContextStore(str(tmp_path / "ctx"), compact_after=3)
+    store.clear()
+    store.append(["a"], ["alpha"], np.ones((1, 2)), _state("0"))
+    for version in range(1, 4):
+        store.append([], [], None, _state(str(version)))
+    size = os.path.getsize(store.log_path)
+
+    assert store.stale_states == 0
+    stored = ContextStore(store.path).load()
+    assert stored.state.root_summary == "3"
+    assert stored.node_ids == ["a"]
+    assert size < 200
+
+
+def test_clear_only_removes_store_files(tmp_path):
+    store = ContextStore(str(tmp_path / "ctx"))
+    store.clear()
+    store.append(["a"], ["alpha"], np.ones((1, 2)), _state("one"))
+    store.clear()
+    assert sorted(os.listdir(store.path)) == ["records.log"]
+
+    (tmp_path / "notes.txt").write_text("keep me")
+    with pytest.raises(ValueError):
+        ContextStore(str(tmp_path)).clear()
+    with pytest.raises(ValueError):
+        ContextStore(str(tmp_path / "notes.txt")).clear()
+    assert (tmp_path / "notes.txt").read_text() == "keep me"
+    assert os.path.exists(store.log_path)
+
+
+def test_clear_replaces_a_json_session(tmp_path):
+    path = tmp_path / "ctx.json"
+    path.write_text('{"memory_index": {}, "root_summary": ""}')
+    store = ContextStore(str(path))
+    store.clear()
+    assert os.path.isdir(path) and store.exists()
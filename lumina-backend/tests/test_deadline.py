@@ -0,0 +1,52 @@
+import asyncio
+import time
+import pytest
+from app.core.deadline import DeadlineExceeded, bounded, current_deadline, deadline_after, deadline_scope, time_left
+
+def test_nested_deadlines_never_extend_the_enclosing_one():
+    outer = deadline_after(1)
+    with deadline_scope(outer):
+        assert deadline_after(60) == outer
+        with deadline_scope(time.monotonic() + 60):
+            assert current_deadline() == outer
+        assert deadline_after(None) == outer
+    assert current_deadline() is None
+    assert time_left() is None
+
+@pytest.mark.asyncio
+async def test_bounded_cancels_work_still_running_at_the_deadline():
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(DeadlineExceeded):
+        await bounded(slow(), deadline_after(0.05))
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_bounded_passes_its_deadline_to_nested_calls():
+    async def nested():
+        return current_deadline()
+
+    deadline = deadline_after(5)
+    assert await bounded(nested(), deadline) == deadline
+    assert await bounded(nested()) is None
+
+@pytest.mark.asyncio
+async def test_bounded_keeps_timeouts_raised_by_the_work_itself():
+    async def times_out():
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError) as error:
+        await bounded(times_out(), deadline_after(5))
+    assert not isinstance(error.value, DeadlineExceeded)
+
+@pytest.mark.asyncio
+async def test_bounded_fails_fast_once_the_deadline_has_passed():
+    with pytest.raises(DeadlineExceeded):
+        await bounded(asyncio.sleep(0), time.monotonic() - 1)
@@ -0,0 +1,42 @@
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from app.ai.embedding_cache import EmbeddingCache, CachedEmbedding
+
+class CountingEmbedding(MockEmbedding):
+    calls: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.calls += len(texts)
+        return super()._get_text_embeddings(texts)
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_entries=3)
+
+def test_only_new_text_is_embedded(cache):
+    backend = CountingEmbedding(embed_dim=4)
+    embed_model = CachedEmbedding(backend, cache=cache)
+
+    first = embed_model.get_text_embedding_batch(["problem", "review"])
+    assert backend.calls == 2
+
+    second = embed_model.get_text_embedding_batch(["problem", "review", "edited review"])
+    assert backend.calls == 3
+    assert second[:2] == first
+
+def test_cache_is_keyed_by_model(cache):
+    backend = CountingEmbedding(embed_dim=4)
+    CachedEmbedding(backend, cache=cache).get_text_embedding_batch(["problem"])
+
+    other = CountingEmbedding(embed_dim=4, model_name="other-model")
+    CachedEmbedding(other, cache=cache).get_text_embedding_batch(["problem"])
+    assert other.calls == 1
+
+def test_least_recently_used_entries_are_evicted(cache):
+    keys = [EmbeddingCache.make_key("m", str(i)) for i in range(4)]
+    cache.put_many({keys[0]: [0.0], keys[1]: [1.0], keys[2]: [2.0]})
+    cache.get_many([keys[0]])
+    cache.put_many({keys[3]: [3.0]})
+
+    assert len(cache) == 3
+    assert set(cache.get_many(keys)) == {keys[0], keys[2], keys[3]}
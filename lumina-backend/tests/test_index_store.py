@@ -0,0 +1,171 @@
+import pytest
+from types import SimpleNamespace
+from llama_index.core.embeddings import MockEmbedding
+from app.ai.index_store import CORPUS, ProblemIndexStore, document_doc_id
+
+class CountingEmbedding(MockEmbedding):
+    texts: list = []
+
+    def _get_text_embeddings(self, texts):
+        self.texts.extend(texts)
+        return super()._get_text_embeddings(texts)
+
+def make_review(review_id, content, problem_id=1, document_id=None):
+    document_id = review_id if document_id is None else document_id
+    return SimpleNamespace(id=review_id, problem_id=problem_id, title=f"Review {review_id}", content=content, document_id=document_id)
+
+def make_document(document_id, content):
+    return SimpleNamespace(id=document_id, content=content)
+
+@pytest.fixture
+def embed_model():
+    return CountingEmbedding(embed_dim=4, texts=[])
+
+@pytest.fixture
+def problem():
+    return SimpleNamespace(
+        id=1,
+        description="Reduce logistics costs",
+        literature_reviews=[make_review(1, "Route optimisation"), make_review(2, "Multi-modal freight")],
+    )
+
+def ref_doc_ids(index):
+    return set(index.ref_doc_info.keys())
+
+def retrieved_texts(problem_index):
+    return {node.node.text for node in problem_index.as_retriever(similarity_top_k=10).retrieve("What do we know about freight?")}
+
+def test_load_builds_and_persists_index(tmp_path, embed_model, problem):
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    problem_index = store.load(problem)
+    assert ref_doc_ids(problem_index.index) == {"problem-1", "document-1", "document-2"}
+    assert len(embed_model.texts) == 3
+    store.flush()
+
+    reloaded = ProblemIndexStore(str(tmp_path), embed_model=embed_model).load(problem)
+    assert ref_doc_ids(reloaded.index) == {"problem-1", "document-1", "document-2"}
+    assert len(embed_model.texts) == 3
+
+def test_document_changes_are_applied_incrementally(tmp_path, embed_model, problem):
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    store.load(problem)
+    embed_model.texts.clear()
+
+    store.add_document(make_document(3, "Warehouse automation"))
+    store.add_document(make_document(3, "Warehouse automation"))
+    store.delete_document(1)
+    store.flush()
+
+    index = ProblemIndexStore(str(tmp_path), embed_model=embed_model)._open(CORPUS)
+    assert ref_doc_ids(index) == {"problem-1", document_doc_id(2), document_doc_id(3)}
+    assert embed_model.texts == ["Warehouse automation"]
+
+def test_changes_are_persisted_in_one_write_per_batch(tmp_path, embed_model, problem):
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model, persist_delay=60)
+    writes = []
+    persist = store._persist
+    store._persist = lambda name: writes.append(name) or persist(name)
+    store.load(problem)
+    for document_id in range(3, 8):
+        store.add_document(make_document(document_id, f"Study {document_id}"))
+    assert writes == []
+
+    store.flush()
+    store.flush()
+
+    assert writes == [CORPUS]
+    assert document_doc_id(7) in ref_doc_ids(ProblemIndexStore(str(tmp_path), embed_model=embed_model)._open(CORPUS))
+
+def test_deleted_problem_loses_its_description(tmp_path, embed_model, problem):
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    store.load(problem)
+
+    store.delete_problem(problem.id)
+
+    assert ref_doc_ids(store._open(CORPUS)) == {document_doc_id(1), document_doc_id(2)}
+
+def test_load_reconciles_drift_from_database(tmp_path, embed_model, problem):
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    store.load(problem)
+    embed_model.texts.clear()
+
+    problem.literature_reviews = [make_review(1, "Route optimisation")]
+    problem_index = store.load(problem)
+
+    assert problem_index.doc_ids == ["document-1", "problem-1"]
+    assert retrieved_texts(problem_index) == {"Reduce logistics costs", "Route optimisation"}
+    # Dropping a review is a filter change; nothing is re-embedded.
+    assert embed_model.texts == []
+
+def test_shared_documents_are_embedded_once_and_filtered_per_problem(tmp_path, embed_model, problem):
+    other = SimpleNamespace(
+        id=2,
+        description="Enter a new market",
+        literature_reviews=[make_review(3, "Multi-modal freight", problem_id=2, document_id=2), make_review(4, "Pricing study", problem_id=2)],
+    )
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    first = store.load(problem)
+    second = store.load(other)
+
+    assert embed_model.texts.count("Multi-modal freight") == 1
+    assert retrieved_texts(first) == {"Reduce logistics costs", "Route optimisation", "Multi-modal freight"}
+    assert retrieved_texts(second) == {"Enter a new market", "Multi-modal freight", "Pricing study"}
+
+def test_duplicate_chunks_are_not_embedded(tmp_path, embed_model, problem):
+    pasted = "Cross-docking cuts inventory holding costs by routing freight straight to outbound trucks."
+    problem.literature_reviews = [make_review(1, pasted), make_review(2, pasted + " ")]
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    problem_index = store.load(problem)
+
+    assert ref_doc_ids(problem_index.index) == {"problem-1", "document-1"}
+    assert len(embed_model.texts) == 2
+    assert store.stats()["exact_duplicates"] == 1
+    # A problem holding only the duplicate still retrieves the kept chunk.
+    only_duplicate = SimpleNamespace(id=2, description="Cut costs", literature_reviews=[make_review(3, pasted + " ", problem_id=2, document_id=2)])
+    assert pasted in retrieved_texts(store.load(only_duplicate))
+
+    # Deleting the kept copy brings the duplicate back on the next sync, and
+    # the deleted document no longer grants access to anything.
+    store.delete_document(1)
+    store.flush()
+    reloaded = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    problem.literature_reviews = problem.literature_reviews[1:]
+    problem_index = reloaded.load(problem)
+    assert "document-1" not in ref_doc_ids(problem_index.index)
+    assert pasted in retrieved_texts(problem_index)
+    stranger = SimpleNamespace(id=3, description="Unrelated", literature_reviews=[make_review(5, "Other", problem_id=3, document_id=1)])
+    assert retrieved_texts(reloaded.load(stranger)) == {"Unrelated", "Other"}
+
+def test_near_duplicate_problems_only_retrieve_their_own_text(tmp_path, embed_model):
+    brief = (
+        "plans to acquire Globex in secret. The deal closes in the third quarter after regulatory review, "
+        "financed by a term loan and a bond issue, with the board told only after signing. "
+        "Integration starts with procurement, then logistics, then the shared service centre. "
+        "Synergies come from closing two regional warehouses, merging the sales teams in the north, "
+        "renegotiating freight contracts and moving both companies onto one finance system within a year."
+    )
+    acme = SimpleNamespace(id=1, description=f"Client Acme {brief} Price: 900 million dollars.", literature_reviews=[])
+    initech = SimpleNamespace(id=2, description=f"Client Initech {brief} Price: 750 million dollars.", literature_reviews=[])
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    store.load(acme)
+
+    assert retrieved_texts(store.load(initech)) == {initech.description}
+    assert retrieved_texts(store.load(acme)) == {acme.description}
+
+def test_deleted_duplicate_loses_access_to_kept_chunk(tmp_path, embed_model, problem):
+    pasted = "Cross-docking cuts inventory holding costs by routing freight straight to outbound trucks."
+    problem.literature_reviews = [make_review(1, pasted), make_review(2, pasted + " ")]
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    store.load(problem)
+
+    store.delete_document(2)
+    reused_id = SimpleNamespace(id=2, description="Unrelated", literature_reviews=[make_review(3, "Other", problem_id=2, document_id=2)])
+    assert retrieved_texts(store.load(reused_id)) == {"Unrelated", "Other"}
+
+def test_version_changes_with_problem_content(tmp_path, embed_model, problem):
+    store = ProblemIndexStore(str(tmp_path), embed_model=embed_model)
+    version = store.load(problem).version
+    assert store.load(problem).version == version
+
+    problem.literature_reviews = [make_review(1, "Route optimisation"), make_review(2, "Rail freight")]
+    assert store.load(problem).version != version
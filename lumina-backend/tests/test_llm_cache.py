@@ -0,0 +1,32 @@
+import pytest
+from app.ai.llm_cache import LLMResponseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=60, memory_entries=1)
+
+def test_key_depends_on_model_temperature_and_prompt():
+    key = LLMResponseCache.make_key("gpt-4", 0.7, "prompt")
+    assert key == LLMResponseCache.make_key("gpt-4", 0.7, "prompt")
+    assert key != LLMResponseCache.make_key("gpt-4", 0.0, "prompt")
+    assert key != LLMResponseCache.make_key("gpt-3.5-turbo", 0.7, "prompt")
+    assert key != LLMResponseCache.make_key("gpt-4", 0.7, "other prompt")
+
+def test_memory_and_disk_tiers(tmp_path, cache):
+    cache.put("a", "response a")
+    cache.put("b", "response b")
+
+    assert cache.get("b") == "response b"
+    assert cache.get("a") == "response a"
+    assert cache.get("missing") is None
+    assert cache.stats() == {"hits": 2, "memory_hits": 1, "disk_hits": 1, "misses": 1}
+
+    restarted = LLMResponseCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=60)
+    assert restarted.get("a") == "response a"
+
+def test_expired_entries_are_misses(cache, monkeypatch):
+    cache.put("a", "response a")
+    monkeypatch.setattr("app.ai.llm_cache.time.time", lambda: 10**12)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from app.ai.llm_executor import LLMExecutor, TokenBucket, is_rate_limit_error
+
+class RateLimitError(Exception):
+    status_code = 429
+
+@pytest.mark.asyncio
+async def test_token_bucket_delays_once_quota_is_spent():
+    bucket = TokenBucket(per_minute=600)  # ten tokens per second
+
+    start = time.monotonic()
+    await bucket.acquire(600)
+    await bucket.acquire(2)
+
+    assert time.monotonic() - start >= 0.15
+
+@pytest.mark.asyncio
+async def test_rate_limited_calls_are_retried():
+    calls = []
+
+    class FlakyLLM:
+        async def acomplete(self, prompt):
+            calls.append(prompt)
+            if len(calls) < 3:
+                raise RateLimitError("slow down")
+            return "ok"
+
+    executor = LLMExecutor(max_retries=3, retry_base_delay=0.001)
+
+    assert await executor.acomplete(FlakyLLM(), "prompt") == "ok"
+    assert len(calls) == 3
+    assert is_rate_limit_error(RateLimitError())
+
+@pytest.mark.asyncio
+async def test_non_rate_limit_errors_are_not_retried():
+    llm = MagicMock(spec=["complete"])
+    llm.complete.side_effect = ValueError("bad prompt")
+    executor = LLMExecutor(max_retries=3, retry_base_delay=0.001)
+
+    with pytest.raises(ValueError):
+        await executor.acomplete(llm, "prompt")
+    assert llm.complete.call_count == 1
+
+@pytest.mark.asyncio
+async def test_sync_clients_run_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    llm = MagicMock(spec=["complete"])
+    llm.complete.side_effect = lambda prompt: threading.get_ident()
+    executor = LLMExecutor(max_concurrency=2)
+
+    threads = await asyncio.gather(*(executor.acomplete(llm, str(i)) for i in range(4)))
+
+    assert loop_thread not in threads
@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch
+from app.ai.model_factory import AIModelFactory
+from app.ai.model_router import ModelRouter
+
+@pytest.fixture
+def router():
+    return ModelRouter(
+        tiers={"premium": "gpt-4", "standard": "gpt-4o", "fast": "gpt-4o-mini"},
+        stage_tiers={"synthesis": "premium", "structured_output": "fast"},
+        fallback_tiers={"premium": "standard", "standard": "fast"},
+        min_samples=4,
+        max_p95_seconds=10.0,
+        max_error_rate=0.5,
+    )
+
+def test_stages_use_their_own_tier(router):
+    assert router.select("synthesis") == "gpt-4"
+    assert router.select("structured_output") == "gpt-4o-mini"
+    with pytest.raises(ValueError):
+        router.select("unknown")
+
+def test_slow_or_failing_models_fall_back_to_a_faster_tier(router):
+    for _ in range(4):
+        router.health("gpt-4").record(30.0, ok=True)
+    assert router.select("synthesis") == "gpt-4o"
+
+    for _ in range(4):
+        router.health("gpt-4o").record(1.0, ok=False)
+    assert router.select("synthesis") == "gpt-4o-mini"
+
+def test_too_few_samples_keep_the_primary_model(router):
+    router.health("gpt-4").record(30.0, ok=False)
+    assert router.select("synthesis") == "gpt-4"
+
+@pytest.mark.asyncio
+async def test_track_records_latency_and_errors(router):
+    async with router.track("gpt-4"):
+        pass
+    with pytest.raises(RuntimeError):
+        async with router.track("gpt-4"):
+            raise RuntimeError("boom")
+
+    snapshot = router.health("gpt-4").snapshot()
+    assert snapshot["samples"] == 2
+    assert snapshot["error_rate"] == 0.5
+
+def test_factory_reuses_clients():
+    AIModelFactory.clear()
+    with patch.object(AIModelFactory, "_build", side_effect=lambda name: object()) as build:
+        first = AIModelFactory.get_model("gpt-4o-mini")
+        assert AIModelFactory.get_model("gpt-4o-mini") is first
+        assert build.call_count == 1
+    AIModelFactory.clear()
+    with pytest.raises(ValueError):
+        AIModelFactory.get_model("unknown-model")
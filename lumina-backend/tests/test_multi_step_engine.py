@@ -1,5 +1,13 @@
+import asyncio
 import pytest
+import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
+from app.ai import embedding_cache, index_store, llm_cache, sub_question_memo
+from app.ai.embedding_cache import CachedEmbedding
+from app.ai.llm_executor import ExecutorLLM, llm_executor
+from app.ai.model_factory import AIModelFactory
+from app.ai.prompt_packing import prompt_packer
+from app.core.config import settings
 from app.ai.multi_step_engine import (
     ConsultingWorkflow,
     Problem,
@@ -7,11 +15,17 @@ from app.ai.multi_step_engine import (
     AnalysisStep,
     MetaAnalysis,
     Event,
-    SubQuestionQueryEngine
+    SourceNode,
+    SubQuestionQueryEngine,
+    _sub_question_node,
 )
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.core import VectorStoreIndex, Document
+from llama_index.core import VectorStoreIndex, Document, QueryBundle
+from llama_index.core.question_gen.types import SubQuestion
+from app.core.deadline import deadline_after
+from benchmarks.fakes import prompt_kind
+from benchmarks.run import install_fakes
 
 class Event:
     def __init__(self, payload):
@@ -22,27 +36,35 @@ def mock_problem():
     return Problem(id=1, title="Test Problem", description="This is a test problem", client="Test Client", status="New")
 
 @pytest.fixture
-async def consulting_workflow(mock_problem):
-    with patch('app.ai.multi_step_engine.OpenAI') as mock_llm, \
-         patch('app.ai.multi_step_engine.OpenAIEmbedding') as mock_embed_model, \
-         patch('app.ai.multi_step_engine.VectorStoreIndex') as mock_vector_store_index:
+def fake_models(tmp_path, monkeypatch):
+    """Local stand-ins for every model, with caches and indexes under tmp_path."""
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(settings, "LLM_CACHE_PATH", str(tmp_path / "llm_responses.sqlite3"))
+    monkeypatch.setattr(settings, "SUB_QUESTION_MEMO_PATH", str(tmp_path / "sub_question_answers.sqlite3"))
+    monkeypatch.setattr(settings, "INDEX_STORAGE_DIR", str(tmp_path / "indexes"))
+    monkeypatch.setattr(embedding_cache, "_embedding_cache", None)
+    monkeypatch.setattr(index_store, "_problem_index_store", None)
+    monkeypatch.setattr(llm_cache, "_llm_cache", None)
+    monkeypatch.setattr(sub_question_memo, "_sub_question_memo", None)
+    llm, embed_model = install_fakes(latency=0.0, embed_latency=0.0)
+    yield llm
+    AIModelFactory.clear()
 
-        mock_llm.return_value = AsyncMock()
-        mock_embed_model.return_value = AsyncMock()
-        mock_vector_store_index.from_documents.return_value = MagicMock()
-
-        workflow = ConsultingWorkflow(mock_problem)
-        workflow.setup_engines = AsyncMock()  # Mock the setup_engines method
-        await workflow.setup_engines()
-
-        return workflow
+@pytest_asyncio.fixture
+async def consulting_workflow(mock_problem, fake_models):
+    workflow = ConsultingWorkflow(mock_problem)
+    await workflow.setup_engines()
+    return workflow
 
 @pytest.mark.asyncio
-async def test_consulting_workflow_initialization(consulting_workflow, mock_problem):
+async def test_consulting_workflow_initialization(consulting_workflow, mock_problem, fake_models):
     assert consulting_workflow.problem.id == mock_problem.id
     assert consulting_workflow.problem.title == mock_problem.title
-    assert isinstance(consulting_workflow.llm, AsyncMock)
-    assert isinstance(consulting_workflow.embed_model, AsyncMock)
+    # Question generation and synthesis run on the routed models, through the executor.
+    for llm in (consulting_workflow.question_generator._llm, consulting_workflow.response_synthesizer._llm):
+        assert isinstance(llm, ExecutorLLM)
+        assert llm.llm is fake_models
+    assert isinstance(consulting_workflow.embed_model, CachedEmbedding)
 
 @pytest.mark.asyncio
 @patch.object(SubQuestionQueryEngine, 'aquery', new_callable=AsyncMock)
@@ -90,13 +112,14 @@ async def test_process_sub_questions(mock_generate_structured_output_async, cons
     )
 
     mock_generate_structured_output_async.return_value = mock_segment_output
-    consulting_workflow.context_manager = MagicMock()  # Mock the context manager
+    consulting_workflow.context_manager = AsyncMock()  # Mock the context manager
 
     mock_response = MagicMock(
         source_nodes=[
             MagicMock(
                 node=MagicMock(
-                    text="Sub question: Test\nResponse: Test response"
+                    text="Sub question: Test\nResponse: Test response",
+                    metadata={"tool_name": "problem_context", "sources": [{"node_id": "n1", "content_hash": "h1"}]}
                 )
             )
         ]
@@ -109,23 +132,256 @@ async def test_process_sub_questions(mock_generate_structured_output_async, cons
     assert "structured_steps" in result
     assert isinstance(result["structured_steps"], list)
     assert len(result["structured_steps"]) == 1
+    assert result["structured_steps"][0].sources == [SourceNode(node_id="n1", content_hash="h1")]
     assert "final_response" in result
 
 @pytest.mark.asyncio
-async def test_generate_structured_output_async_success(consulting_workflow):
+@patch.object(ConsultingWorkflow, 'perform_meta_analysis_internal', new_callable=AsyncMock)
+@patch.object(ConsultingWorkflow, 'generate_structured_output_async', new_callable=AsyncMock)
+async def test_analysis_extracts_answers_while_other_sub_questions_run(mock_generate_structured_output_async, mock_meta_analysis, consulting_workflow):
+    segment_output = SegmentOutput(
+        key_findings=["Test finding"],
+        relevant_data={},
+        next_steps=["Test step"],
+        confidence_score=0.8,
+        critical_assumptions=[],
+        required_data=[],
+        external_review_required=False
+    )
+    fast_extracted = asyncio.Event()
+
+    async def extract(text, use_cache=True):
+        if "Fast" in text:
+            fast_extracted.set()
+        return segment_output
+
+    async def answer(sub_q, use_cache=None):
+        # The slow sub question only finishes once the fast one was extracted.
+        if sub_q.sub_question == "Slow":
+            await fast_extracted.wait()
+        return MagicMock(node=MagicMock(text=f"Sub question: {sub_q.sub_question}\nResponse: Answer", metadata={}))
+
+    mock_generate_structured_output_async.side_effect = extract
+    mock_meta_analysis.return_value = MetaAnalysis(
+        coherence_score=0.9, consistency_score=0.8, quality_score=0.85, improvement_suggestions=[], critical_path=[]
+    )
+    consulting_workflow.context_manager = AsyncMock()
+    engine = MagicMock()
+    engine.agenerate_sub_questions = AsyncMock(return_value=[
+        SubQuestion(sub_question="Slow", tool_name="problem_context"),
+        SubQuestion(sub_question="Fast", tool_name="problem_context"),
+    ])
+    engine.aanswer_sub_question = AsyncMock(side_effect=answer)
+    engine.asynthesize = AsyncMock(return_value="Final response")
+    consulting_workflow.sub_question_engine = engine
+
+    result = await asyncio.wait_for(consulting_workflow.arun_analysis("Test query"), timeout=5)
+
+    assert [step["query"] for step in result["steps"]] == ["Slow", "Fast"]
+    assert result["final_response"] == "Final response"
+    assert len(engine.asynthesize.call_args.args[1]) == 2
+
+@pytest.mark.asyncio
+@patch.object(ConsultingWorkflow, 'perform_meta_analysis_internal', new_callable=AsyncMock)
+@patch.object(ConsultingWorkflow, 'generate_structured_output_async', new_callable=AsyncMock)
+async def test_analysis_returns_finished_steps_when_deadline_passes(mock_generate_structured_output_async, mock_meta_analysis, consulting_workflow):
+    mock_generate_structured_output_async.return_value = SegmentOutput(
+        key_findings=["Test finding"],
+        relevant_data={},
+        next_steps=["Test step"],
+        confidence_score=0.8,
+        critical_assumptions=[],
+        required_data=[],
+        external_review_required=False
+    )
+    slow_cancelled = asyncio.Event()
+
+    async def answer(sub_q, use_cache=None):
+        if sub_q.sub_question == "Slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                slow_cancelled.set()
+                raise
+        return MagicMock(node=MagicMock(text=f"Sub question: {sub_q.sub_question}\nResponse: Answer", metadata={}))
+
+    consulting_workflow.context_manager = AsyncMock()
+    engine = MagicMock()
+    engine.agenerate_sub_questions = AsyncMock(return_value=[
+        SubQuestion(sub_question="Fast", tool_name="problem_context"),
+        SubQuestion(sub_question="Slow", tool_name="problem_context"),
+    ])
+    engine.aanswer_sub_question = AsyncMock(side_effect=answer)
+    consulting_workflow.sub_question_engine = engine
+
+    result = await asyncio.wait_for(
+        consulting_workflow.arun_analysis("Test query", deadline=deadline_after(0.2)), timeout=5
+    )
+
+    assert result["truncated"] is True
+    assert [step["query"] for step in result["steps"]] == ["Fast"]
+    assert result["meta_analysis"] is None
+    assert slow_cancelled.is_set()
+    mock_meta_analysis.assert_not_awaited()
+
+@pytest.mark.asyncio
+@patch.object(ConsultingWorkflow, 'perform_meta_analysis_internal', new_callable=AsyncMock)
+@patch.object(ConsultingWorkflow, 'generate_structured_output_async', new_callable=AsyncMock)
+async def test_reanalysis_reruns_only_steps_whose_sources_changed(mock_generate_structured_output_async, mock_meta_analysis, consulting_workflow):
+    segment_output = SegmentOutput(
+        key_findings=["Test finding"],
+        relevant_data={},
+        next_steps=["Test step"],
+        confidence_score=0.8,
+        critical_assumptions=[],
+        required_data=[],
+        external_review_required=False
+    )
+    mock_generate_structured_output_async.return_value = segment_output
+    mock_meta_analysis.return_value = MetaAnalysis(
+        coherence_score=0.9, consistency_score=0.8, quality_score=0.85, improvement_suggestions=[], critical_path=[]
+    )
+    consulting_workflow.context_manager = AsyncMock()
+    unchanged = [SourceNode(node_id="n1", content_hash="h1")]
+    changed = [SourceNode(node_id="n2", content_hash="h2")]
+    engine = MagicMock()
+    engine.aretrieve_sources = AsyncMock(side_effect=lambda sub_q: unchanged if sub_q.sub_question == "A" else [SourceNode(node_id="n2", content_hash="h3")])
+    engine.aanswer_sub_question = AsyncMock(return_value=MagicMock(
+        node=MagicMock(text="Sub question: B\nResponse: New answer", metadata={"tool_name": "problem_context", "sources": [{"node_id": "n2", "content_hash": "h3"}]})
+    ))
+    engine.asynthesize = AsyncMock(return_value="New final response")
+    consulting_workflow.sub_question_engine = engine
+    previous = {
+        "steps": [
+            AnalysisStep(query="A", response="Old answer", structured_output=segment_output, tool_name="problem_context", sources=unchanged).dict(),
+            AnalysisStep(query="B", response="Old answer", structured_output=segment_output, tool_name="problem_context", sources=changed).dict(),
+        ],
+        "final_response": "Old final response",
+    }
+
+    result = await consulting_workflow.arun_reanalysis("Test query", previous)
+
+    assert result["rerun_steps"] == [1]
+    assert [step["response"] for step in result["steps"]] == ["Old answer", "New answer"]
+    assert result["final_response"] == "New final response"
+    engine.aanswer_sub_question.assert_awaited_once()
+
+@pytest.mark.asyncio
+@patch.object(ConsultingWorkflow, 'perform_meta_analysis_internal', new_callable=AsyncMock)
+@patch.object(ConsultingWorkflow, 'generate_structured_output_async', new_callable=AsyncMock)
+async def test_reanalysis_reruns_steps_without_a_tool_and_stops_at_the_deadline(mock_generate_structured_output_async, mock_meta_analysis, consulting_workflow):
+    segment_output = SegmentOutput(
+        key_findings=["Test finding"],
+        relevant_data={},
+        next_steps=["Test step"],
+        confidence_score=0.8,
+        critical_assumptions=[],
+        required_data=[],
+        external_review_required=False
+    )
+    mock_generate_structured_output_async.return_value = segment_output
+    consulting_workflow.context_manager = AsyncMock()
+    answered = []
+
+    async def answer(sub_q, use_cache=None):
+        answered.append(sub_q.tool_name)
+        if sub_q.sub_question == "Slow":
+            await asyncio.sleep(10)
+        return MagicMock(node=MagicMock(text=f"Sub question: {sub_q.sub_question}\nResponse: New answer", metadata={"tool_name": sub_q.tool_name}))
+
+    engine = MagicMock()
+    engine.aanswer_sub_question = AsyncMock(side_effect=answer)
+    consulting_workflow.sub_question_engine = engine
+    previous = {
+        "steps": [
+            AnalysisStep(query="Old", response="Old answer", structured_output=segment_output).dict(),
+            AnalysisStep(query="Slow", response="Old answer", structured_output=segment_output).dict(),
+        ],
+        "final_response": "Old final response",
+        "meta_analysis": {"coherence_score": 0.5},
+    }
+
+    result = await consulting_workflow.arun_reanalysis("Test query", previous, deadline=deadline_after(0.2))
+
+    assert answered == ["problem_context", "problem_context"]
+    assert result["truncated"] is True
+    assert result["rerun_steps"] == [0]
+    assert [step["response"] for step in result["steps"]] == ["New answer", "Old answer"]
+    assert result["meta_analysis"] == {"coherence_score": 0.5}
+    mock_meta_analysis.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_every_llm_call_goes_through_the_executor(consulting_workflow, fake_models):
+    kinds = []
+    acomplete = llm_executor._acomplete
+
+    async def record(llm, prompt, **kwargs):
+        kinds.append(prompt_kind(prompt))
+        return await acomplete(llm, prompt, **kwargs)
+
+    with patch.object(llm_executor, "_acomplete", side_effect=record):
+        await consulting_workflow.arun_analysis("How can we reduce costs?", use_cache=False)
+
+    assert {"sub_questions", "answer", "structured_output"} <= set(kinds)
+    assert len(kinds) == sum(fake_models.calls.values())
+
+@pytest.mark.asyncio
+async def test_synthesis_packs_answers_into_one_call_within_budget(consulting_workflow):
+    engine = consulting_workflow.sub_question_engine
+    engine._synthesis_budget = 600
+    nodes = [_sub_question_node(SubQuestion(sub_question=f"Q{i}", tool_name="problem_context"), "word " * 2000, []) for i in range(3)]
+    prompts = []
+    acomplete = llm_executor._acomplete
+
+    async def record(llm, prompt, **kwargs):
+        prompts.append(prompt)
+        return await acomplete(llm, prompt, **kwargs)
+
+    with patch.object(llm_executor, "_acomplete", side_effect=record):
+        response = await engine.asynthesize(QueryBundle("How can we reduce costs?"), nodes)
+
+    assert len(prompts) == 1
+    assert prompt_packer.count_tokens(prompts[0]) <= 600
+    assert [node.node.text for node in response.source_nodes] == [node.node.text for node in nodes]
+
+@pytest.mark.asyncio
+async def test_generate_structured_output_async_success(consulting_workflow, fake_models):
     response = "Optimize routes and use multi-modal transportation to reduce costs."
 
-    with patch.object(consulting_workflow.llm, 'acomplete', new_callable=AsyncMock) as mock_acomplete:
-        mock_acomplete.return_value.text = '{"key_findings": ["Test finding"], "next_steps": ["Test step"], "confidence_score": 0.8}'
+    with patch.object(llm_executor, 'acomplete', new_callable=AsyncMock) as mock_acomplete:
+        mock_acomplete.return_value = (
+            '{"key_findings": ["Test finding"], "relevant_data": {}, "next_steps": ["Test step"], "confidence_score": 0.8, '
+            '"critical_assumptions": [], "required_data": [], "external_review_required": false}'
+        )
         result = await consulting_workflow.generate_structured_output_async(response)
 
+    assert mock_acomplete.await_args.args[0] is fake_models
+
     assert isinstance(result, SegmentOutput)
     assert len(result.key_findings) > 0
     assert len(result.next_steps) > 0
     assert result.confidence_score > 0
 
 @pytest.mark.asyncio
-async def test_meta_analysis_success(consulting_workflow):
+async def test_meta_analysis_prompt_leaves_out_step_bookkeeping(consulting_workflow):
+    segment_output = SegmentOutput(
+        key_findings=["Test finding"], relevant_data={}, next_steps=["Test step"], confidence_score=0.8,
+        critical_assumptions=[], required_data=[], external_review_required=False
+    )
+    step = AnalysisStep(
+        query="A", response="Answer", structured_output=segment_output,
+        tool_name="problem_context", sources=[SourceNode(node_id="n1", content_hash="f" * 64)],
+    )
+
+    with patch.object(consulting_workflow, '_acomplete_structured', new_callable=AsyncMock) as mock_complete:
+        await consulting_workflow.perform_meta_analysis_internal([step], "Final")
+
+    prompt = mock_complete.await_args.args[2]
+    assert "Test finding" in prompt
+    assert "f" * 64 not in prompt and "problem_context" not in prompt
+
+@pytest.mark.asyncio
+async def test_meta_analysis_success(consulting_workflow, fake_models):
     steps = [
         AnalysisStep(
             query="How to reduce transportation costs?",
@@ -142,9 +398,11 @@ async def test_meta_analysis_success(consulting_workflow):
         )
     ]
 
-    with patch.object(consulting_workflow.llm, 'acomplete', new_callable=AsyncMock) as mock_acomplete:
-        mock_acomplete.return_value.text = '{"coherence_score": 0.9, "consistency_score": 0.8, "quality_score": 0.85, "improvement_suggestions": ["Test suggestion"], "critical_path": ["Test critical step"]}'
-        result = await consulting_workflow.meta_analysis(steps)
+    with patch.object(llm_executor, 'acomplete', new_callable=AsyncMock) as mock_acomplete:
+        mock_acomplete.return_value = '{"coherence_score": 0.9, "consistency_score": 0.8, "quality_score": 0.85, "improvement_suggestions": ["Test suggestion"], "critical_path": ["Test critical step"]}'
+        result = await consulting_workflow.perform_meta_analysis_internal(steps, "Final response")
+
+    assert mock_acomplete.await_args.args[0] is fake_models
 
     assert isinstance(result, MetaAnalysis)
     assert result.coherence_score > 0
@@ -0,0 +1,75 @@
+import pytest
+from types import SimpleNamespace
+from app.ai.prompt_packing import PromptPacker, TRUNCATION_MARKER
+
+TEMPLATE = "Steps:\n{steps}\n\nFinal Response:\n{final_response}"
+
+def make_step(i, response="short answer"):
+    return {
+        "query": f"question {i}",
+        "response": response,
+        "structured_output": {
+            "key_findings": [f"finding {i}"],
+            "relevant_data": {"table": list(range(50))},
+            "next_steps": ["next"],
+            "confidence_score": 0.5,
+            "critical_assumptions": ["assumption"],
+            "required_data": ["data"],
+            "external_review_required": False,
+        },
+    }
+
+@pytest.fixture
+def packer():
+    return PromptPacker()
+
+def test_compact_serialisation_saves_tokens_without_dropping_fields(packer):
+    packed = packer.pack_steps(TEMPLATE, [make_step(i) for i in range(3)], "final", budget=10_000)
+
+    assert packed.tokens_saved > 0
+    assert '"relevant_data"' in packed.text
+    assert "\n  " not in packed.text
+    assert packer.stats() == {"prompts_packed": 1, "prompts_reduced": 0, "tokens_saved": packed.tokens_saved}
+
+def test_low_value_fields_go_first_and_prompt_fits_budget(packer):
+    steps = [make_step(i, response="word " * 2000) for i in range(5)]
+
+    packed = packer.pack_steps(TEMPLATE, steps, "final " * 3000, budget=1500)
+
+    assert packed.tokens <= 1500
+    assert packer.count_tokens(packed.text) == packed.tokens
+    assert '"relevant_data"' not in packed.text
+    assert "finding 4" in packed.text
+    assert TRUNCATION_MARKER in packed.text
+    assert packer.stats()["prompts_reduced"] == 1
+
+def test_budget_comes_from_model_context_window(packer, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "PROMPT_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(settings, "PROMPT_OUTPUT_RESERVE_TOKENS", 1000)
+
+    llm = SimpleNamespace(metadata=SimpleNamespace(context_window=8192))
+
+    assert packer.budget_for(llm) == 7192
+    monkeypatch.setattr(settings, "PROMPT_TOKEN_BUDGET", 4000)
+    assert packer.budget_for(llm) == 7192
+    assert packer.budget_for(SimpleNamespace()) == 4000
+
+def test_last_resort_cuts_packed_sections_not_instructions(packer):
+    template = TEMPLATE + "\n\nAnswer in JSON with the keys coherence_score and quality_score."
+    steps = [{"query": "q", "response": "r", "structured_output": {"key_findings": ["finding " * 400]}}]
+
+    packed = packer.pack_steps(template, steps, "final " * 3000, budget=300)
+
+    assert packed.tokens <= 300
+    assert packed.text.endswith("Answer in JSON with the keys coherence_score and quality_score.")
+
+def test_pack_texts_trims_the_longest_texts_first(packer):
+    texts = ["short answer", "word " * 1000, "word " * 400]
+
+    packed = packer.pack_texts(texts, budget=600)
+
+    assert packed[0] == "short answer"
+    assert sum(packer.count_tokens(text) for text in packed) <= 600
+    assert all(text.endswith(TRUNCATION_MARKER) for text in packed[1:])
+    assert packer.stats()["prompts_reduced"] == 1
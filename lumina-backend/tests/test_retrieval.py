@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.question_gen.types import SubQuestion
+from llama_index.core.tools import QueryEngineTool
+
+from app.ai.index_store import ProblemIndexStore
+from app.ai.multi_step_engine import SubQuestionQueryEngine
+from app.ai.retrieval import BM25Index, reciprocal_rank_fusion, retrieval_stats
+from app.ai.sub_question_memo import SubQuestionMemo
+
+class CountingEmbedding(MockEmbedding):
+    queries: list = []
+
+    def _get_query_embedding(self, query):
+        self.queries.append(query)
+        return super()._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+def make_review(review_id, content, problem_id=1):
+    return SimpleNamespace(id=review_id, problem_id=problem_id, title=f"Review {review_id}", content=content, document_id=review_id)
+
+def test_bm25_ranks_by_term_rarity_and_respects_access():
+    bm25 = BM25Index()
+    bm25.add("a", "Freight rates rose as rail capacity tightened", ["doc-1"])
+    bm25.add("b", "Freight and warehousing costs", ["doc-2"])
+    bm25.add("c", "Warehousing automation", ["doc-2"])
+
+    assert [node_id for node_id, _, _ in bm25.search("rail freight", top_k=3)] == ["a", "b"]
+    assert [node_id for node_id, _, _ in bm25.search("rail freight", top_k=3, allowed={"doc-2"})] == ["b"]
+    bm25.remove("a")
+    bm25.add("b", "Only warehousing now", ["doc-2"])
+    assert bm25.search("freight", top_k=3) == []
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]], k=60)
+    assert [node_id for node_id, _ in fused] == ["b", "a", "c"]
+
+@pytest.fixture
+def problem_index(tmp_path):
+    embed_model = CountingEmbedding(embed_dim=4, queries=[])
+    problem = SimpleNamespace(
+        id=1,
+        description="Reduce logistics costs",
+        literature_reviews=[make_review(1, "Cross-docking at the Rotterdam hub"), make_review(2, "Multi-modal freight pricing")],
+    )
+    return ProblemIndexStore(str(tmp_path), embed_model=embed_model).load(problem), embed_model
+
+def test_keyword_queries_skip_the_query_embedding(problem_index):
+    index, embed_model = problem_index
+    lexical_before = retrieval_stats.lexical
+    nodes = index.as_retriever().retrieve("Rotterdam cross-docking")
+
+    assert nodes[0].node.text == "Cross-docking at the Rotterdam hub"
+    assert embed_model.queries == []
+    assert retrieval_stats.lexical == lexical_before + 1
+
+@pytest.mark.asyncio
+async def test_questions_fuse_lexical_and_dense_results(problem_index):
+    index, embed_model = problem_index
+    nodes = await index.as_retriever(similarity_top_k=3).aretrieve("How is multi-modal freight priced in practice?")
+
+    assert nodes[0].node.text == "Multi-modal freight pricing"
+    assert len(nodes) == 3
+    assert embed_model.queries == ["How is multi-modal freight priced in practice?"]
+
+@pytest.mark.asyncio
+async def test_sub_questions_are_embedded_once_and_only_for_dense_retrieval(problem_index, tmp_path):
+    index, embed_model = problem_index
+    engine = SubQuestionQueryEngine(
+        question_gen=MagicMock(),
+        response_synthesizer=MagicMock(),
+        query_engine_tools=[QueryEngineTool.from_defaults(index.as_query_engine(llm=MockLLM()), name="problem_context")],
+        verbose=False,
+        memo=SubQuestionMemo(str(tmp_path / "memo.sqlite3"), ttl_seconds=60, similarity_threshold=0.95),
+        problem_id=1,
+        embed_model=embed_model,
+    )
+
+    await engine.aanswer_sub_question(SubQuestion(sub_question="Rotterdam cross-docking", tool_name="problem_context"), use_cache=True)
+    assert embed_model.queries == []
+
+    question = "How is multi-modal freight priced in practice?"
+    await engine.aanswer_sub_question(SubQuestion(sub_question=question, tool_name="problem_context"), use_cache=True)
+    assert embed_model.queries == [question]
@@ -0,0 +1,66 @@
+import json
+import pytest
+from types import SimpleNamespace
+from app.api.streaming import sse_event, stream_workflow_events
+
+class FakeWorkflow:
+    def __init__(self, events, error=None):
+        self.problem = SimpleNamespace(id=1)
+        self.events = events
+        self.error = error
+
+    async def astream_analysis(self, query, use_cache=True, deadline=None):
+        for event in self.events:
+            yield event
+        if self.error:
+            raise self.error
+
+def parse(message):
+    event_line, data_line = message.strip().split("\n")
+    return event_line.replace("event: ", ""), json.loads(data_line.replace("data: ", ""))
+
+def test_sse_event_format():
+    assert sse_event("step", {"index": 0}) == 'event: step\ndata: {"index": 0}\n\n'
+
+@pytest.mark.asyncio
+async def test_stream_relays_events_and_reports_completion():
+    completed = []
+
+    async def on_complete(result):
+        completed.append(result)
+
+    workflow = FakeWorkflow([
+        {"event": "sub_question", "data": {"index": 0, "sub_question": "Q"}},
+        {"event": "step", "data": {"index": 1, "query": "B"}},
+        {"event": "step", "data": {"index": 0, "query": "A"}},
+        {"event": "meta_analysis", "data": {"critical_path": ["A"]}},
+    ])
+    messages = [parse(m) async for m in stream_workflow_events(workflow, "query", on_complete=on_complete)]
+
+    assert [event for event, _ in messages] == ["sub_question", "step", "step", "meta_analysis", "done"]
+    assert [step["query"] for step in completed[0]["steps"]] == ["A", "B"]
+    assert completed[0]["meta_analysis"] == {"critical_path": ["A"]}
+
+@pytest.mark.asyncio
+async def test_stream_reports_truncated_runs():
+    completed = []
+
+    async def on_complete(result):
+        completed.append(result)
+
+    workflow = FakeWorkflow([
+        {"event": "step", "data": {"index": 0, "query": "A"}},
+        {"event": "truncated", "data": {"completed_steps": 1, "sub_questions": 2}},
+    ])
+    messages = [parse(m) async for m in stream_workflow_events(workflow, "query", on_complete=on_complete)]
+
+    assert [event for event, _ in messages] == ["step", "truncated", "done"]
+    assert completed[0]["truncated"] is True
+    assert completed[0]["meta_analysis"] is None
+
+@pytest.mark.asyncio
+async def test_stream_ends_with_error_event_on_failure():
+    workflow = FakeWorkflow([{"event": "sub_question", "data": {}}], error=RuntimeError("boom"))
+    messages = [parse(m) async for m in stream_workflow_events(workflow, "query")]
+
+    assert messages[-1] == ("error", {"detail": "An error occurred during analysis"})
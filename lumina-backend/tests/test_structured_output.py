@@ -0,0 +1,53 @@
+import pytest
+from typing import Any, Dict, List
+from pydantic import BaseModel, Field
+from app.ai.structured_output import (
+    fields_schema,
+    merge_fields,
+    parse_structured,
+    repair_json,
+    response_format_kwargs,
+)
+
+class Output(BaseModel):
+    key_findings: List[str] = Field(...)
+    relevant_data: Dict[str, Any] = Field(...)
+    confidence_score: float = Field(..., ge=0, le=1)
+
+@pytest.mark.parametrize("text", [
+    'Here you go:\n```json\n{"a": [1, 2,], "b": "x",}\n```',
+    "{'a': [1, 2], 'b': 'x'}",
+    '{"a": [1, 2], "b": "x", "c": True, "d": None}',
+    '{"a": [1, 2], "b": "x',
+    '{"a": [1, 2], "b": "x", "c":',
+])
+def test_repair_json_fixes_common_defects(text):
+    repaired = repair_json(text)
+    assert repaired["a"] == [1, 2]
+    assert repaired["b"] == "x"
+
+def test_repair_json_gives_up_on_non_json():
+    assert repair_json("I cannot answer that.") is None
+
+def test_valid_fields_survive_and_bad_ones_are_reported():
+    result = parse_structured('{"key_findings": "one finding", "relevant_data": {}, "confidence_score": 7,}', Output)
+
+    assert result.output is None
+    assert result.repaired
+    assert result.data["key_findings"] == ["one finding"]
+    assert result.missing == ["confidence_score"]
+
+def test_missing_fields_are_merged_without_touching_valid_ones():
+    result = parse_structured('{"key_findings": ["a"]}', Output)
+    assert result.missing == ["relevant_data", "confidence_score"]
+
+    merged = merge_fields(result, '{"relevant_data": {"x": 1}, "confidence_score": 0.5, "key_findings": ["b"]}', Output)
+
+    assert merged.output == Output(key_findings=["a"], relevant_data={"x": 1}, confidence_score=0.5)
+
+def test_schema_mode_only_for_supporting_models():
+    schema = fields_schema(Output, ["confidence_score"])
+    assert list(schema["properties"]) == ["confidence_score"]
+
+    assert response_format_kwargs("gpt-4o-mini", "Output", schema)["response_format"]["type"] == "json_schema"
+    assert response_format_kwargs("gpt-4", "Output", schema) == {}
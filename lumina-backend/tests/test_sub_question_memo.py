@@ -0,0 +1,44 @@
+import pytest
+from app.ai.sub_question_memo import SubQuestionMemo, normalise_question
+
+@pytest.fixture
+def memo(tmp_path):
+    return SubQuestionMemo(str(tmp_path / "memo.sqlite3"), ttl_seconds=60, similarity_threshold=0.95)
+
+def test_normalise_question_ignores_case_and_punctuation():
+    assert normalise_question("What  drives costs?") == normalise_question("what drives COSTS")
+    assert SubQuestionMemo.make_key("What drives costs?") == SubQuestionMemo.make_key("what drives costs")
+
+def test_exact_answers_are_scoped_to_problem_version_and_tool(memo):
+    memo.put(1, "v1", "problem_context", "What drives costs?", "Freight.")
+
+    assert memo.get(1, "v1", "problem_context", "what drives costs") == "Freight."
+    assert memo.get(1, "v2", "problem_context", "What drives costs?") is None
+    assert memo.get(2, "v1", "problem_context", "What drives costs?") is None
+    assert memo.get(1, "v1", "other_tool", "What drives costs?") is None
+
+def test_similar_questions_match_by_embedding(memo):
+    memo.put(1, "v1", "problem_context", "What drives costs?", "Freight.", embedding=[1.0, 0.0, 0.0])
+
+    assert memo.get_similar(1, "v1", "problem_context", [0.99, 0.05, 0.0]) == "Freight."
+    assert memo.get_similar(1, "v1", "problem_context", [0.5, 0.5, 0.0]) is None
+    assert memo.stats() == {"hits": 1, "similar_hits": 1, "misses": 1}
+
+def test_new_version_and_invalidation_drop_entries(tmp_path, memo):
+    memo.put(1, "v1", "problem_context", "What drives costs?", "Freight.", embedding=[1.0, 0.0])
+    memo.put(2, "v1", "problem_context", "What drives costs?", "Labour.", embedding=[1.0, 0.0])
+    memo.put(1, "v2", "problem_context", "Who are the suppliers?", "Three carriers.")
+
+    reopened = SubQuestionMemo(str(tmp_path / "memo.sqlite3"), ttl_seconds=60)
+    assert reopened.get(1, "v1", "problem_context", "What drives costs?") is None
+    assert reopened.get(1, "v2", "problem_context", "Who are the suppliers?") == "Three carriers."
+
+    assert memo.invalidate(2) == 1
+    assert memo.get_similar(2, "v1", "problem_context", [1.0, 0.0]) is None
+
+def test_expired_answers_are_not_reused(tmp_path):
+    memo = SubQuestionMemo(str(tmp_path / "memo.sqlite3"), ttl_seconds=-1)
+    memo.put(1, "v1", "problem_context", "What drives costs?", "Freight.", embedding=[1.0, 0.0])
+
+    assert memo.get(1, "v1", "problem_context", "What drives costs?") is None
+    assert memo.get_similar(1, "v1", "problem_context", [1.0, 0.0]) is None
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+from llama_index.core.callbacks import CBEventType, EventPayload
+
+from app.ai.tracing_callbacks import TracingCallbackHandler
+from app.core.tracing import MetricsRegistry, Tracer
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    return Tracer(MetricsRegistry(), trace_dir=str(tmp_path))
+
+
+def test_spans_nest_and_are_written_with_their_trace(tracer, tmp_path):
+    with tracer.trace("POST /analyze") as trace:
+        with tracer.span("analysis", "workflow") as outer:
+            with tracer.span("complete", "llm", model="gpt-4o"):
+                tracer.record_tokens("gpt-4o", 120, 30)
+            tracer.record_cache("llm", hits=1)
+
+    with open(os.path.join(tmp_path, f"{trace.trace_id}.json")) as f:
+        written = json.load(f)
+    spans = {span["name"]: span for span in written["spans"]}
+    assert spans["complete"]["parent_id"] == outer.span_id
+    assert spans["complete"]["attributes"] == {"model": "gpt-4o", "prompt_tokens": 120, "completion_tokens": 30}
+    assert spans["analysis"]["attributes"]["llm_cache_hits"] == 1
+
+
+def test_metrics_render_histograms_errors_and_tokens(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("meta_analysis", "step"):
+            raise ValueError("bad output")
+    tracer.record("query", "db", 0.02)
+    tracer.record_tokens("gpt-4o", 10, 5)
+
+    text = tracer.registry.render()
+    assert 'lumina_span_duration_seconds_bucket{kind="db",name="query",le="0.025"} 1' in text
+    assert 'lumina_span_duration_seconds_bucket{kind="db",name="query",le="0.01"} 0' in text
+    assert 'lumina_span_duration_seconds_count{kind="step",name="meta_analysis"} 1' in text
+    assert 'lumina_span_errors_total{kind="step",name="meta_analysis"} 1' in text
+    assert 'lumina_llm_tokens_total{model="gpt-4o",type="prompt"} 10' in text
+
+
+def test_collectors_are_exported_as_gauges(tracer):
+    tracer.registry.register_collector("lumina_workflow_pool", lambda: {"hits": 3, "misses": 1})
+    assert "lumina_workflow_pool_hits 3" in tracer.registry.render()
+
+
+def test_callback_handler_skips_llm_events_inside_an_executor_span(tracer):
+    handler = TracingCallbackHandler(tracer, usage=lambda response, prompt: (7, 3))
+    start = {EventPayload.SERIALIZED: {"model": "gpt-4"}, EventPayload.PROMPT: "p"}
+    end = {EventPayload.PROMPT: "p", EventPayload.COMPLETION: "c"}
+
+    handler.on_event_start(CBEventType.LLM, start, event_id="a")
+    handler.on_event_end(CBEventType.LLM, end, event_id="a")
+    with tracer.span("complete", "llm"):
+        handler.on_event_start(CBEventType.LLM, start, event_id="b")
+        handler.on_event_end(CBEventType.LLM, end, event_id="b")
+
+    text = tracer.registry.render()
+    assert 'lumina_span_duration_seconds_count{kind="llm",name="complete"} 2' in text
+    assert 'lumina_llm_tokens_total{model="gpt-4",type="prompt"} 7' in text
+
+
+def test_callback_handler_records_failed_llm_events_as_errors(tracer):
+    handler = TracingCallbackHandler(tracer, usage=lambda response, prompt: (7, 3))
+
+    handler.on_event_start(CBEventType.LLM, {EventPayload.SERIALIZED: {"model": "gpt-4"}}, event_id="a")
+    handler.on_event_end(CBEventType.LLM, {EventPayload.EXCEPTION: TimeoutError()}, event_id="a")
+
+    text = tracer.registry.render()
+    assert 'lumina_span_errors_total{kind="llm",name="complete"} 1' in text
+    assert 'lumina_llm_tokens_total{model="gpt-4"' not in text
@@ -0,0 +1,125 @@
+import numpy as np
+from llama_index.core import Document, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import (
+    ExactMatchFilter,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+)
+
+from app.ai.vector_store import FILTER_OPERATORS, NumpyVectorStore
+
+
+def _store(vectors, **kwargs):
+    store = NumpyVectorStore()
+    store.add_vectors([f"n{i}" for i in range(len(vectors))], vectors, **kwargs)
+    return store
+
+
+def test_top_k_matches_brute_force_cosine_similarity():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    query = rng.normal(size=16)
+    store = NumpyVectorStore()
+    # Added in several chunks to exercise in-place growth.
+    for start in range(0, 500, 70):
+        store.add_vectors([f"n{i}" for i in range(start, min(start + 70, 500))], vectors[start:start + 70])
+
+    result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5))
+
+    cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = np.argsort(-cosine)[:5]
+    assert result.ids == [f"n{i}" for i in expected]
+    np.testing.assert_allclose(result.similarities, cosine[expected], rtol=1e-5)
+
+
+def test_batched_queries_match_single_queries():
+    rng = np.random.default_rng(1)
+    store = _store(rng.normal(size=(200, 8)))
+    queries = rng.normal(size=(3, 8))
+
+    batched = store.query_batch(queries, similarity_top_k=4)
+
+    for query, result in zip(queries, batched):
+        assert result.ids == store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=4)).ids
+
+
+def test_filters_and_deletes_by_ref_doc():
+    store = _store(
+        np.eye(4),
+        ref_doc_ids=["a", "a", "b", "b"],
+        metadata=[{"problem_id": 1}, {"problem_id": 2}, {"problem_id": 1}, {"problem_id": 2}],
+    )
+    filters = MetadataFilters(filters=[ExactMatchFilter(key="problem_id", value=1)])
+    result = store.query(VectorStoreQuery(query_embedding=[1, 1, 1, 1], similarity_top_k=4, filters=filters))
+    assert sorted(result.ids) == ["n0", "n2"]
+
+    store.delete("a")
+    result = store.query(VectorStoreQuery(query_embedding=[1, 0, 0, 0], similarity_top_k=4))
+    assert sorted(result.ids) == ["n2", "n3"]
+
+
+def test_indexed_filters_match_a_scan_of_every_row():
+    rng = np.random.default_rng(2)
+    metadata = [{"document_ids": [f"d{j}" for j in rng.choice(6, 2)], "year": int(rng.integers(2000, 2004))} for _ in range(50)]
+    store = _store(rng.normal(size=(50, 4)), ref_doc_ids=[f"r{i % 5}" for i in range(50)], metadata=metadata)
+    store.update_metadata("n3", {"document_ids": ["d9"], "year": 1999})
+    store.delete("r1")
+    filters = MetadataFilters(
+        filters=[
+            MetadataFilter(key="document_ids", value=["d1", "d9"], operator=FilterOperator.ANY),
+            MetadataFilters(
+                filters=[
+                    MetadataFilter(key="year", value=[2001, 1999], operator=FilterOperator.IN),
+                    MetadataFilter(key="year", value=2003, operator=FilterOperator.GTE),
+                ],
+                condition=FilterCondition.OR,
+            ),
+        ]
+    )
+
+    def matches(meta, filters):
+        results = [
+            matches(meta, f) if isinstance(f, MetadataFilters) else FILTER_OPERATORS[f.operator](meta.get(f.key), f.value)
+            for f in filters.filters
+        ]
+        return any(results) if filters.condition == FilterCondition.OR else all(results)
+
+    expected = [store._ids[row] for row in range(store._size) if matches(store._metadata[row], filters)]
+    assert expected
+    assert [store._ids[row] for row in np.flatnonzero(store._mask(filters=filters))] == expected
+    assert [store._ids[row] for row in np.flatnonzero(store._mask(doc_ids=["r2"]))] == [f"n{i}" for i in range(2, 50, 5)]
+
+
+def test_persists_as_npz_and_converts_json_stores(tmp_path):
+    store = _store(np.eye(3), ref_doc_ids=["a", None, "c"], metadata=[{"k": 1}, {}, {}])
+    path = str(tmp_path / "default__vector_store.json")
+    store.persist(path)
+    loaded = NumpyVectorStore.from_persist_path(path)
+    np.testing.assert_array_equal(loaded.embeddings, store.embeddings)
+    assert loaded.query(VectorStoreQuery(query_embedding=[0, 0, 1], similarity_top_k=1)).ids == ["n2"]
+
+    simple = SimpleVectorStore()
+    simple.add([TextNode(id_="x", text="x", embedding=[3.0, 4.0])])
+    simple.persist(path)
+    converted = NumpyVectorStore.from_persist_path(path)
+    np.testing.assert_allclose(converted.get("x"), [0.6, 0.8])
+
+
+def test_backs_a_vector_store_index():
+    storage_context = StorageContext.from_defaults(vector_store=NumpyVectorStore())
+    index = VectorStoreIndex.from_documents(
+        [Document(id_="doc", text="alpha"), Document(id_="other", text="beta")],
+        storage_context=storage_context,
+        embed_model=MockEmbedding(embed_dim=4),
+    )
+    assert len(index.as_retriever(similarity_top_k=2).retrieve("alpha")) == 2
+
+    index.delete_ref_doc("doc", delete_from_docstore=True)
+    nodes = index.as_retriever(similarity_top_k=2).retrieve("alpha")
+    assert [node.node.ref_doc_id for node in nodes] == ["other"]
@@ -0,0 +1,84 @@
+import pytest
+from types import SimpleNamespace
+from app.ai.workflow_pool import WorkflowPool
+
+class FakeWorkflow:
+    def __init__(self, problem):
+        self.problem = problem
+        self.setups = 0
+        self.routings = 0
+        self.resets = 0
+
+    async def setup_engines(self):
+        self.setups += 1
+
+    def route_models(self):
+        self.routings += 1
+
+    def reset_context(self):
+        self.resets += 1
+
+def problem(problem_id):
+    return SimpleNamespace(id=problem_id)
+
+@pytest.fixture
+def pool():
+    return WorkflowPool(max_size=2, ttl_seconds=60, factory=FakeWorkflow)
+
+@pytest.mark.asyncio
+async def test_back_to_back_queries_reuse_a_warm_workflow(pool):
+    async with pool.lease(problem(1)) as first:
+        pass
+    latest = problem(1)
+    async with pool.lease(latest) as second:
+        pass
+
+    assert second is first
+    assert second.setups == 1
+    assert second.routings == 1
+    assert second.resets == 1
+    assert second.problem is latest
+    assert pool.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_leases_get_separate_workflows(pool):
+    first = await pool.acquire(problem(1))
+    second = await pool.acquire(problem(1))
+
+    assert first is not second
+    pool.release(first)
+    pool.release(second)
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_idle_and_leased_workflows(pool):
+    idle = await pool.acquire(problem(1))
+    pool.release(idle)
+    pool.invalidate(1)
+    leased = await pool.acquire(problem(1))
+    assert leased is not idle
+
+    pool.invalidate(1)
+    pool.release(leased)
+    assert await pool.acquire(problem(1)) is not leased
+
+@pytest.mark.asyncio
+async def test_failed_analyses_and_expired_entries_are_not_reused(pool):
+    with pytest.raises(RuntimeError):
+        async with pool.lease(problem(1)) as failed:
+            raise RuntimeError("boom")
+    assert await pool.acquire(problem(1)) is not failed
+
+    pool.ttl_seconds = 0
+    stale = await pool.acquire(problem(2))
+    pool.release(stale)
+    assert await pool.acquire(problem(2)) is not stale
+
+@pytest.mark.asyncio
+async def test_least_recently_released_workflow_is_evicted(pool):
+    workflows = {problem_id: await pool.acquire(problem(problem_id)) for problem_id in (1, 2, 3)}
+    for problem_id in (1, 2, 3):
+        pool.release(workflows[problem_id])
+
+    assert pool.stats()["idle"] == 2
+    assert await pool.acquire(problem(1)) is not workflows[1]
+    assert await pool.acquire(problem(3)) is workflows[3]